@@ -3,19 +3,29 @@
 import dash 
 import dash_core_components as dcc
 import dash_html_components as html
-import pandas as pd
+import dash_table
 import plotly.express as px
-from dash.dependencies import Output, Input
+from dash.dependencies import Output, Input, State
+from dash.exceptions import PreventUpdate
 
 from src.aux_functions import *
+from src.data_store import latest_version
+from src.loader import start_loader, status
+from src.series_index import (get_analytics_records, get_series_index, get_source_options,
+                              get_trending, get_ts_figure, load_view, make_view)
+
+
+# interval of data updates, faster while waiting for first snapshot
+UPDATE_INTERVAL = 2*60*1000
+LOADING_INTERVAL = 2*1000
 
 
 # define app
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
-# get dash data
-df, tickers = get_dash_data() 
+# load data in background, layout is served right away
+start_loader()
 
 # app layout
 app.layout = html.Div([
@@ -29,13 +39,53 @@ app.layout = html.Div([
 	# Position 1, descritpion
         ]),
 
+    # loading state until first data snapshot
+    html.Div(id="load-status", children="Loading data...",
+             style={"text-align": "center", 'width':'100%', "color":"grey"}),
+
+    # trending tickers kept by data collector
+    html.Div([
+        html.Label(['Trending tickers:'], style={'font-weight': 'bold'}),
+        dcc.RadioItems(
+            id="trending-window",
+            options=[
+                     {'label': 'Last hour', 'value': '1h'},
+                     {'label': 'Last 24h', 'value': '24h'},
+                     {'label': 'Last 7 days', 'value': '7d'},
+            ],
+            value='24h',
+            labelStyle={'display': 'inline-block'}
+        ),
+        html.Div(id="trending-list", children=""),
+    ]),
+
+    # date range and source filters -> applied in db query
+    html.Div([
+        html.Label(['Date range:'], style={'font-weight': 'bold'}),
+        dcc.DatePickerRange(
+            id="date-range",
+            display_format="YYYY-MM-DD",
+            clearable=True,
+        ),
+        html.Label(['Sources:'], style={'font-weight': 'bold'}),
+        dcc.Dropdown(
+            id="source-dropdown",
+            options=[],
+            value=[],
+            placeholder="All sources",
+            multi=True,
+            style={"width": "75%"}
+        ),
+    ]),
+
     # dropdown menu for ticker selection
     html.Div([
         html.Label(['Ticker selection (top 10):'], style={'font-weight': 'bold'}),
         dcc.Dropdown(
             id="dropdown",
-            options=[{"label": x, "value": x} for x in tickers],
-            value=tickers,
+            options=[],
+            value=[],
+            placeholder="Loading tickers...",
             multi=True,
             style={"width": "75%"}
         ),
@@ -62,7 +112,7 @@ app.layout = html.Div([
         dcc.Interval(
                     id='my_interval',
                     disabled=False,         # if True, the counter will no longer update
-                    interval=2*60*1000,     # increment the counter n_intervals every interval milliseconds
+                    interval=LOADING_INTERVAL,  # increment the counter n_intervals every interval milliseconds
                     n_intervals=0,          # number of times the interval has passed
                     max_intervals=-1,       # number of times the interval will be fired.
                                             # if -1, then the interval has no limit (the default)
@@ -83,7 +133,29 @@ app.layout = html.Div([
         dcc.Graph(id='ts-graph', figure={}, className='ticker count')        # timeseries with count per date
     ]),
     
-    # hidden section for data update
+    # daily mention vs price analytics from data collector
+    html.Div([
+        html.Label(['Hype vs price (daily, last 30 days):'], style={'font-weight': 'bold'}),
+        dash_table.DataTable(
+            id="analytics-table",
+            columns=[
+                {"name": "Ticker", "id": "ticker"},
+                {"name": "Company", "id": "company_name"},
+                {"name": "Mentions", "id": "mentions"},
+                {"name": "Spikes", "id": "spikes"},
+                {"name": "Return 1h after spike (%)", "id": "return_after_spike_hour"},
+                {"name": "Return 1d after spike (%)", "id": "return_after_spike_day"},
+                {"name": "Volume weighted hype", "id": "vw_hype_score"},
+                {"name": "Best lag (h)", "id": "best_lag"},
+                {"name": "Correlation", "id": "best_correlation"},
+            ],
+            data=[],
+            sort_action="native",
+            page_size=10,
+        ),
+    ]),
+
+    # hidden section for data update -> version token of server-side snapshot
     html.Div(id="last-update", style={"display": "none"})
 ])
 
@@ -92,11 +164,16 @@ app.layout = html.Div([
     Output(component_id='bar-graph', component_property='figure'),
     Input(component_id='dropdown', component_property='value'),
     Input(component_id='yaxis_raditem', component_property='value'),
-    Input(component_id='last-update', component_property='children')
+    Input(component_id='last-update', component_property='children'),
+    Input(component_id='date-range', component_property='start_date'),
+    Input(component_id='date-range', component_property='end_date'),
+    Input(component_id='source-dropdown', component_property='value')
 )
-def update_bar_chart(tickers, y_axis, jsonified_data):
-    """Filter aggregate bar chart for selected tickers and y-axis."""
-    df = pd.read_json(jsonified_data, orient='split')
+def update_bar_chart(tickers, y_axis, version, start_date, end_date, source_ids):
+    """Filter aggregate bar chart for selected tickers, y-axis, date range and sources."""
+    if version is None:
+        raise PreventUpdate
+    df = load_view(make_view(version, start_date, end_date, source_ids))
     dff = df[df["ticker"].isin(tickers)]
     dff = dff.groupby(["company_name", "ticker"])[y_axis].sum().nlargest(10).reset_index()
     fig = px.bar(dff, x="company_name", y=y_axis, color="ticker")
@@ -108,46 +185,103 @@ def update_bar_chart(tickers, y_axis, jsonified_data):
     Input(component_id='bar-graph', component_property='hoverData'),
     Input(component_id='bar-graph', component_property='clickData'),
     Input(component_id='yaxis_raditem', component_property='value'),
-    Input(component_id='last-update', component_property='children')
+    Input(component_id='last-update', component_property='children'),
+    Input(component_id='date-range', component_property='start_date'),
+    Input(component_id='date-range', component_property='end_date'),
+    Input(component_id='source-dropdown', component_property='value')
 )
-def update_ts_graph(hov_data, clk_data, y_axis, jsonified_data):
-    """Filter datetime bar chart for selected ticker and y-axis."""
-    df = pd.read_json(jsonified_data, orient='split')
+def update_ts_graph(hov_data, clk_data, y_axis, version, start_date, end_date, source_ids):
+    """Datetime bar chart for hovered company, or top ticker, and y-axis."""
+    if version is None:
+        raise PreventUpdate
+    # figures are memoized per view, y-axis and company
+    view = make_view(version, start_date, end_date, source_ids)
     if hov_data is None:
-        dff2 = df[df["ticker"] == tickers[0]]
-        fig2 = px.bar(dff2, x="date_hour", y=y_axis, color="ticker", 
-                      title=f'Mentions {y_axis} per date_hour for {tickers[0]}')
-        return fig2
-    else:
-        hov_name = hov_data['points'][0]['x']
-        dff2 = df[df.company_name == hov_name]
-        fig2 = px.bar(dff2,  x="date_hour", y=y_axis, color="ticker", 
-                      color_discrete_sequence=px.colors.qualitative.G10,
-                      title=f'Mentions {y_axis} per date_hour for {hov_name}')
-        return fig2
+        return get_ts_figure(view, y_axis)
+    hov_name = hov_data['points'][0]['x']
+    return get_ts_figure(view, y_axis, hov_name)
 
 # callback for new reddit data
 @app.callback(
     Output(component_id='last-update', component_property='children'),
+    Output(component_id='my_interval', component_property='interval'),
+    Output(component_id='load-status', component_property='children'),
     Input(component_id='my_interval', component_property='n_intervals')
 )
 def refresh_data(value):
-    """Update data for graphs."""
-    df = get_dash_dataframe()
-    print(f"Data updated. Nr of rows: {len(df)}")
-    j_df = df.to_json(date_format='iso', orient='split')
-    return j_df
+    """
+    Update data for graphs with newest snapshot from background loader,
+    only version token of snapshot is sent to browser.
+    """
+    version = latest_version()
+    if version is None:
+        message = "Loading data..."
+        if status["error"] is not None:
+            message = f"Database not available, retrying in {status['retry_in']} sec..."
+        return dash.no_update, LOADING_INTERVAL, message
+    return version, UPDATE_INTERVAL, ""
 
 # callback for updating ticker dropdown
 @app.callback(
     Output(component_id='dropdown', component_property='options'),
+    Output(component_id='dropdown', component_property='value'),
+    Input(component_id='last-update', component_property='children'),
+    Input(component_id='date-range', component_property='start_date'),
+    Input(component_id='date-range', component_property='end_date'),
+    Input(component_id='source-dropdown', component_property='value'),
+    State(component_id='dropdown', component_property='value')
+)
+def update_ticker_dropdown(version, start_date, end_date, source_ids, selected):
+    """
+    Update options for ticker dropdown after data update or filter change,
+    select all on first load.
+    """
+    if version is None:
+        raise PreventUpdate
+    view = make_view(version, start_date, end_date, source_ids)
+    tickers = get_series_index(view)["top_tickers"]
+    options = [{"label": x, "value": x} for x in tickers]
+    if selected:
+        return options, dash.no_update
+    return options, tickers
+
+# callback for trending tickers
+@app.callback(
+    Output(component_id='trending-list', component_property='children'),
+    Input(component_id='trending-window', component_property='value'),
+    Input(component_id='last-update', component_property='children')
+)
+def update_trending_list(time_window, version):
+    """Show top tickers of selected window after data update."""
+    if version is None:
+        raise PreventUpdate
+    trending = get_trending(version, time_window)
+    if not trending:
+        return "No mentions in window."
+    return ", ".join(f"{rank}. {ticker} ({count})"
+                     for rank, (ticker, _, count) in enumerate(trending, start=1))
+
+# callback for analytics table
+@app.callback(
+    Output(component_id='analytics-table', component_property='data'),
+    Input(component_id='last-update', component_property='children')
+)
+def update_analytics_table(version):
+    """Show newest daily analytics after data update."""
+    if version is None:
+        raise PreventUpdate
+    return get_analytics_records(version)
+
+# callback for updating source dropdown
+@app.callback(
+    Output(component_id='source-dropdown', component_property='options'),
     Input(component_id='last-update', component_property='children')
 )
-def update_ticker_dropdown(jsonified_data):
-    """Update options for ticker dropdown after data update."""
-    df = pd.read_json(jsonified_data, orient='split')
-    tickers = get_dropdown_tickers(df)
-    return [{"label": x, "value": x} for x in tickers]
+def update_source_dropdown(version):
+    """Update options for source dropdown after data update."""
+    if version is None:
+        raise PreventUpdate
+    return get_source_options(version)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,66 @@
 """Supporting functions for dash app."""
 
+from datetime import timedelta
+
 import pandas as pd
 
-from src.db_functions import get_tickers_per_date_hour
+from src.db_functions import get_config_section, get_tickers_per_date_hour
 
 
-def get_dash_dataframe():
-    """Get data from database and convert to pandas dataframe."""
-    data = get_tickers_per_date_hour()
-    columns = ["ticker", "company_name", "total_count", 
+def to_dash_dataframe(data):
+    """Convert rows from get_tickers_per_date_hour to pandas dataframe."""
+    columns = ["ticker", "company_name", "total_count",
                "total_score", "date", "hour"]
     df = pd.DataFrame(data, columns=columns)
-    df["date_hour"] = pd.to_datetime(df["date"]) + pd.to_timedelta(df["hour"], unit='h')
+    df = df.astype({"total_count": "int64", "total_score": "int64", "hour": "int64"})
+    df["date"] = pd.to_datetime(df["date"])
+    df["date_hour"] = df["date"] + pd.to_timedelta(df["hour"], unit='h')
     return df
 
 
+def get_dash_dataframe():
+    """Get data from database and convert to pandas dataframe."""
+    data, _ = get_tickers_per_date_hour()
+    return to_dash_dataframe(data)
+
+
+def update_dash_dataframe(dash_df=None, watermark=None):
+    """
+    Update dashboard dataframe with rows changed in db since last read.
+    Without cached dataframe all data is read.
+    Return tuple with (dataframe, watermark for next update).
+
+    :param dash_df: Cached dashboard dataframe or None.
+    :param watermark: Db time of last read or None.
+    """
+    if dash_df is None or watermark is None:
+        data, read_time = get_tickers_per_date_hour()
+        return to_dash_dataframe(data), read_time
+
+    # look back to catch rollup writes committed after last read started
+    lookback = int(get_config_section("data_store").get("lookback_seconds", 300))
+    data, read_time = get_tickers_per_date_hour(watermark - timedelta(seconds=lookback))
+    if len(data) == 0:
+        return dash_df, read_time
+    # changed date hour groups replace cached rows
+    df = pd.concat([dash_df, to_dash_dataframe(data)], ignore_index=True)
+    df = df.drop_duplicates(subset=["ticker", "date", "hour"], keep="last", ignore_index=True)
+    return df, read_time
+
+
+def get_filtered_dataframe(start_date=None, end_date=None, source_ids=None):
+    """
+    Get dashboard data for local date window and sources, filtered in db.
+
+    :param start_date: First local date as 'YYYY-MM-DD' or None.
+    :param end_date: Last local date as 'YYYY-MM-DD' or None.
+    :param source_ids: List of source ids or None for all sources.
+    """
+    data, _ = get_tickers_per_date_hour(start_date=start_date, end_date=end_date,
+                                        source_ids=source_ids)
+    return to_dash_dataframe(data)
+
+
 def get_dropdown_tickers(dash_df):
     """Get top 10 most mentioned tickers."""
     top_10_tickers = dash_df.groupby(["ticker"])["total_count"].sum().nlargest(10).reset_index()      
@@ -0,0 +1,111 @@
+"""Server-side store of dashboard data snapshots shared by callbacks and workers."""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from src.db_functions import get_config_section
+
+
+def get_store_dir():
+    """Return snapshot directory from config, create it if missing."""
+    config = get_config_section("data_store")
+    store_dir = Path(config.get("path") or Path(tempfile.gettempdir()) / "wsb-dashboard-store")
+    store_dir.mkdir(parents=True, exist_ok=True)
+    return store_dir
+
+
+def get_store_config():
+    """Read snapshot expiry settings from config file."""
+    config = get_config_section("data_store")
+    return {
+        "max_age_seconds": int(config.get("max_age_seconds", 600)),
+        "keep_versions": int(config.get("keep_versions", 3)),
+        "refresh_seconds": int(config.get("refresh_seconds", 110)),
+    }
+
+
+def save_snapshot(df, watermark=None):
+    """
+    Write dataframe as parquet snapshot and return its version token.
+    File is written under a temporary name and renamed so readers never see partial files.
+
+    Args:
+    :df: dashboard dataframe
+    :watermark: db time of read the snapshot is up to date with or None
+    """
+    store_dir = get_store_dir()
+    version = str(time.time_ns())
+    if watermark is not None:
+        (store_dir / f"{version}.watermark").write_text(watermark.isoformat())
+    tmp_path = store_dir / f".{version}.parquet.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, store_dir / f"{version}.parquet")
+    expire_snapshots()
+    return version
+
+
+@lru_cache(maxsize=4)
+def load_snapshot(version):
+    """
+    Return dataframe of snapshot version, read from disk once per process.
+    Returned dataframe is shared, callbacks must not modify it in place.
+
+    Args:
+    :version: version token from save_snapshot
+    """
+    path = get_store_dir() / f"{version}.parquet"
+    # expired token of an idle browser tab -> newest snapshot
+    if not path.exists():
+        path = get_store_dir() / f"{latest_version()}.parquet"
+    return pd.read_parquet(path)
+
+
+def load_watermark(version):
+    """Return watermark saved with snapshot version or None."""
+    path = get_store_dir() / f"{version}.watermark"
+    if not path.exists():
+        return None
+    return datetime.fromisoformat(path.read_text())
+
+
+def refresh_snapshot(update_dataframe):
+    """
+    Return version of newest snapshot, take a new one with update_dataframe
+    if newest is older than refresh_seconds. Clients and workers refreshing
+    within refresh_seconds share one db query and snapshot.
+
+    Args:
+    :update_dataframe: function taking newest dataframe and watermark, or None
+                       for both, returning tuple with updated dataframe and watermark
+    """
+    version = latest_version()
+    df, watermark = None, None
+    if version is not None:
+        age = time.time() - int(version) / 1e9
+        if age < get_store_config()["refresh_seconds"]:
+            return version
+        df, watermark = load_snapshot(version), load_watermark(version)
+    return save_snapshot(*update_dataframe(df, watermark))
+
+
+def latest_version():
+    """Return newest snapshot version in store or None if empty."""
+    versions = sorted(path.stem for path in get_store_dir().glob("*.parquet"))
+    return versions[-1] if versions else None
+
+
+def expire_snapshots():
+    """Delete snapshots older than max age, always keep newest versions."""
+    config = get_store_config()
+    paths = sorted(get_store_dir().glob("*.parquet"), key=lambda path: path.stem)
+    expired_before = time.time() - config["max_age_seconds"]
+    for path in paths[:-config["keep_versions"]]:
+        if path.stat().st_mtime < expired_before:
+            path.unlink(missing_ok=True)
+            path.with_suffix(".watermark").unlink(missing_ok=True)
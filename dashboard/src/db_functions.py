@@ -43,35 +43,207 @@ def get_db_connection():
     return conn
 
 
-def get_tickers_per_date_hour():
-    """
-    Get main data for dashboard. 
-    Groupby by ticker_id, date and hour.
-    """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    sql = """
+# sql of dashboard reads, also explained by query plans of data collector
+# rollup rows changed since last read
+CHANGED_CTE = """
+    WITH changed AS (
+        SELECT
+            ticker_id,
+            hour,
+            (hour AT TIME ZONE 'Europe/Stockholm')::date as comment_date,
+            EXTRACT(hour FROM hour AT TIME ZONE 'Europe/Stockholm') as comment_hour
+        FROM
+            ticker_mention_hourly
+        WHERE
+            updated_at >= %(changed_since)s
+    )"""
+
+# range on hour index, then groups with changed rows
+CHANGED_CONDITION = """h.hour >= (SELECT min(hour) FROM changed) - interval '1 hour'
+        AND (h.ticker_id,
+             (h.hour AT TIME ZONE 'Europe/Stockholm')::date,
+             EXTRACT(hour FROM h.hour AT TIME ZONE 'Europe/Stockholm'))
+            IN (SELECT ticker_id, comment_date, comment_hour FROM changed)"""
+
+# local dates to hour range so hour index is used
+START_DATE_CONDITION = ("h.hour >= %(start_date)s::date::timestamp "
+                        "AT TIME ZONE 'Europe/Stockholm'")
+END_DATE_CONDITION = ("h.hour < (%(end_date)s::date + 1)::timestamp "
+                      "AT TIME ZONE 'Europe/Stockholm'")
+SOURCES_CONDITION = "h.source_id = ANY(%(source_ids)s)"
+
+TICKERS_PER_DATE_HOUR_SQL = """{changed}
     SELECT
         t.ticker_id,
         t.company_name,
-        COUNT(tm.ticker_id) as total_count,
-        SUM(c.score) as total_score,
-        (c.timestamp AT TIME ZONE 'Europe/Stockholm')::date as comment_date,
-        EXTRACT(hour FROM c.timestamp AT TIME ZONE 'Europe/Stockholm') as comment_hour
-    FROM 
-        ticker_mention tm
-    INNER JOIN 
-        comment c USING(comment_id)
-    INNER JOIN 
-        ticker t USING(ticker_id)
+        SUM(h.mention_count) as total_count,
+        SUM(h.score_sum) as total_score,
+        (h.hour AT TIME ZONE 'Europe/Stockholm')::date as comment_date,
+        EXTRACT(hour FROM h.hour AT TIME ZONE 'Europe/Stockholm') as comment_hour
+    FROM
+        ticker_mention_hourly h
+    INNER JOIN
+        ticker t USING(ticker_id){where}
     GROUP BY
         t.ticker_id,
-        (c.timestamp AT TIME ZONE 'Europe/Stockholm')::date,
-        EXTRACT(hour FROM c.timestamp AT TIME ZONE 'Europe/Stockholm')
+        (h.hour AT TIME ZONE 'Europe/Stockholm')::date,
+        EXTRACT(hour FROM h.hour AT TIME ZONE 'Europe/Stockholm')
     ORDER BY
-        COUNT(tm.ticker_id),
+        SUM(h.mention_count),
         t.ticker_id
     ;
     """
-    cur.execute(sql)
-    return cur.fetchall()
\ No newline at end of file
+
+SOURCES_SQL = """
+    SELECT source_id, COALESCE('r/' || display_name, source) AS name
+    FROM source
+    ORDER BY name
+    ;
+    """
+
+TRENDING_TICKERS_SQL = """
+    SELECT
+        t.ticker_id,
+        t.company_name,
+        tt.mention_count
+    FROM
+        trending_ticker tt
+    INNER JOIN
+        ticker t USING(ticker_id)
+    WHERE
+        tt.time_window = %s
+    ORDER BY
+        tt.rank
+    ;
+    """
+
+TICKER_ANALYTICS_SQL = """
+    SELECT
+        a.ticker_id AS ticker,
+        t.company_name,
+        a.mentions,
+        a.spikes,
+        a.return_after_spike_hour,
+        a.return_after_spike_day,
+        a.vw_hype_score,
+        a.best_lag,
+        a.best_correlation
+    FROM
+        ticker_analytics a
+    INNER JOIN
+        ticker t USING(ticker_id)
+    WHERE
+        a.analytics_date = (SELECT max(analytics_date) FROM ticker_analytics)
+    ORDER BY
+        a.mentions DESC
+    ;
+    """
+
+
+def get_tickers_per_date_hour_sql(changed_since=None, start_date=None, end_date=None,
+                                  source_ids=None):
+    """
+    Build sql of get_tickers_per_date_hour with the filters of given arguments.
+    Parameters are named, see get_tickers_per_date_hour.
+
+    :param changed_since: Add changed rows filter if not None.
+    :param start_date: Add start date filter if not None.
+    :param end_date: Add end date filter if not None.
+    :param source_ids: Add sources filter if not empty.
+    """
+    changed, conditions = "", []
+    if changed_since is not None:
+        changed = CHANGED_CTE
+        conditions.append(CHANGED_CONDITION)
+    if start_date is not None:
+        conditions.append(START_DATE_CONDITION)
+    if end_date is not None:
+        conditions.append(END_DATE_CONDITION)
+    if source_ids:
+        conditions.append(SOURCES_CONDITION)
+    where = ""
+    if conditions:
+        where = "\n    WHERE\n        " + "\n        AND ".join(conditions)
+    return TICKERS_PER_DATE_HOUR_SQL.format(changed=changed, where=where)
+
+
+def get_tickers_per_date_hour(changed_since=None, start_date=None, end_date=None,
+                              source_ids=None):
+    """
+    Get main data for dashboard.
+    Read from hourly rollup maintained by data collector,
+    sum over sources and convert hour to local date and hour.
+    Filters are applied in db so only rows in window and sources are read.
+    Return tuple with (rows, db time of read to use as next changed_since).
+
+    :param changed_since: Only return date and hour groups with rollup rows
+                          changed at or after this time. All groups if None.
+    :param start_date: First local date to include as 'YYYY-MM-DD' or None.
+    :param end_date: Last local date to include as 'YYYY-MM-DD' or None.
+    :param source_ids: List of source ids to include, all sources if None or empty.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("No database connection")
+    cur = conn.cursor()
+    sql = get_tickers_per_date_hour_sql(changed_since, start_date, end_date, source_ids)
+    params = {"changed_since": changed_since, "start_date": start_date,
+              "end_date": end_date, "source_ids": list(source_ids or [])}
+    cur.execute("SELECT now();")
+    read_time = cur.fetchone()[0]
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows, read_time
+
+
+def get_sources():
+    """
+    Get list of (source_id, name) of all sources, ordered by name.
+    Name is r/<subreddit display name>, the stored source id if the name is unknown.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("No database connection")
+    cur = conn.cursor()
+    cur.execute(SOURCES_SQL)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def get_trending_tickers(time_window):
+    """
+    Get top tickers of sliding window kept by data collector, best first.
+    Return list of (ticker_id, company_name, mention_count).
+
+    :param time_window: Window name, 1h, 24h or 7d.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("No database connection")
+    cur = conn.cursor()
+    cur.execute(TRENDING_TICKERS_SQL, (time_window, ))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def get_ticker_analytics():
+    """
+    Get newest daily mention vs price analytics of data collector, most mentioned first.
+    Return tuple with (rows, column names).
+    """
+    conn = get_db_connection()
+    if conn is None:
+        raise ConnectionError("No database connection")
+    cur = conn.cursor()
+    cur.execute(TICKER_ANALYTICS_SQL)
+    rows = cur.fetchall()
+    columns = [column[0] for column in cur.description]
+    cur.close()
+    conn.close()
+    return rows, columns
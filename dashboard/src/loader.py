@@ -0,0 +1,41 @@
+"""Background loading of dashboard snapshots with retry and backoff."""
+
+import threading
+import time
+
+from src.aux_functions import update_dash_dataframe
+from src.data_store import get_store_config, refresh_snapshot
+
+
+# state of loader thread of this process, read by callbacks
+status = {"error": None, "retry_in": None}
+
+
+def load_forever(min_backoff=1, max_backoff=60):
+    """
+    Refresh snapshot every refresh_seconds, blocks forever.
+    Failed loads, i.e. db not ready yet, are retried with exponential backoff.
+
+    :param min_backoff: Seconds to wait after first failure.
+    :param max_backoff: Max seconds to wait between retries.
+    """
+    backoff = min_backoff
+    while True:
+        try:
+            version = refresh_snapshot(update_dash_dataframe)
+            print(f"Data updated. Snapshot version: {version}")
+            status.update(error=None, retry_in=None)
+            backoff = min_backoff
+            time.sleep(get_store_config()["refresh_seconds"])
+        except Exception as error:
+            print(f"Couldn't load dashboard data: {error}. Retrying in {backoff} sec...")
+            status.update(error=str(error), retry_in=backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, max_backoff)
+
+
+def start_loader():
+    """Start loader thread in background and return it."""
+    thread = threading.Thread(target=load_forever, name="snapshot-loader", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,108 @@
+"""Per-ticker time series of a data view and memoized time series figures."""
+
+from functools import lru_cache
+
+import pandas as pd
+import plotly.express as px
+
+from src.aux_functions import get_dropdown_tickers, get_filtered_dataframe
+from src.data_store import load_snapshot
+from src.db_functions import get_sources, get_ticker_analytics, get_trending_tickers
+
+
+def make_view(version, start_date=None, end_date=None, source_ids=None):
+    """
+    Return hashable key of data shown for snapshot version and filters,
+    used as cache key of data, series and figures.
+
+    :param version: Version token of snapshot.
+    :param start_date: First local date as 'YYYY-MM-DD' or None.
+    :param end_date: Last local date as 'YYYY-MM-DD' or None.
+    :param source_ids: List of selected source ids or None.
+    """
+    return (version, start_date, end_date, tuple(sorted(source_ids or [])))
+
+
+@lru_cache(maxsize=16)
+def load_view(view):
+    """
+    Return dataframe of view. Unfiltered views are the snapshot itself,
+    filtered views are read with filters applied in db, once per snapshot version.
+    Returned dataframe is shared, callbacks must not modify it in place.
+
+    :param view: Key from make_view.
+    """
+    version, start_date, end_date, source_ids = view
+    if start_date is None and end_date is None and not source_ids:
+        return load_snapshot(version)
+    return get_filtered_dataframe(start_date, end_date, list(source_ids) or None)
+
+
+@lru_cache(maxsize=4)
+def get_source_options(version):
+    """Return source dropdown options, read once per snapshot version."""
+    return [{"label": name, "value": source_id} for source_id, name in get_sources()]
+
+
+@lru_cache(maxsize=12)
+def get_trending(version, time_window):
+    """Return trending tickers of window, read once per snapshot version."""
+    return get_trending_tickers(time_window)
+
+
+@lru_cache(maxsize=4)
+def get_analytics_records(version):
+    """
+    Return daily ticker analytics as table records, read once per snapshot version.
+    Analytics are computed once per day by data collector.
+    """
+    rows, columns = get_ticker_analytics()
+    df = pd.DataFrame(rows, columns=columns)
+    # returns in percent, scores rounded for display
+    for column in ["return_after_spike_hour", "return_after_spike_day"]:
+        df[column] = (df[column].astype(float) * 100).round(2)
+    df["vw_hype_score"] = df["vw_hype_score"].astype(float).round(2)
+    df["best_correlation"] = df["best_correlation"].astype(float).round(3)
+    return df.to_dict("records")
+
+
+@lru_cache(maxsize=16)
+def get_series_index(view):
+    """
+    Split view into ready to plot time series, built once per view.
+    Return dictionary with series per ticker, series per company name
+    and top tickers of view.
+
+    :param view: Key from make_view.
+    """
+    df = load_view(view).sort_values("date_hour")
+    return {
+        "ticker": {ticker: group for ticker, group in df.groupby("ticker", sort=False)},
+        "company": {name: group for name, group in df.groupby("company_name", sort=False)},
+        "top_tickers": list(get_dropdown_tickers(df)),
+    }
+
+
+@lru_cache(maxsize=256)
+def get_ts_figure(view, y_axis, company_name=None):
+    """
+    Return time series bar chart of y-axis for company name,
+    or for top ticker of view if no company name is given.
+
+    :param view: Key from make_view.
+    :param y_axis: Column to plot, total_count or total_score.
+    :param company_name: Company name from hovered bar or None.
+    """
+    index = get_series_index(view)
+    if company_name is None:
+        if len(index["top_tickers"]) == 0:
+            return {}
+        ticker = index["top_tickers"][0]
+        return px.bar(index["ticker"][ticker], x="date_hour", y=y_axis, color="ticker",
+                      title=f'Mentions {y_axis} per date_hour for {ticker}')
+    dff = index["company"].get(company_name)
+    if dff is None:
+        return {}
+    return px.bar(dff, x="date_hour", y=y_axis, color="ticker",
+                  color_discrete_sequence=px.colors.qualitative.G10,
+                  title=f'Mentions {y_axis} per date_hour for {company_name}')
@@ -0,0 +1,101 @@
+"""Backfill historical data and refresh ticker universe from the command line."""
+
+import argparse
+import tempfile
+
+import pandas as pd
+
+from src.database.models import create_db
+from src.database.bulk_loads import backfill_from_file
+from src.database.rollups import rebuild_ticker_mention_hourly
+from src.database.queries import get_all_control_tickers
+from src.aux_functions import get_config_section
+from src.iex_collector import IEXCollector
+from src.ticker_matcher import TickerMatcher
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--refresh-tickers", action="store_true",
+                        help="reload ticker universe from IEX Cloud")
+    parser.add_argument("--submissions",
+                        help="csv: submission_id,timestamp,score,nr_comments,author_id,source")
+    parser.add_argument("--comments",
+                        help="csv: comment_id,timestamp,score,submission_id,author_id")
+    parser.add_argument("--mentions",
+                        help="csv: ticker_id,comment_id")
+    parser.add_argument("--rescore",
+                        help="csv archive: comment_id,body -> re-extract ticker mentions")
+    parser.add_argument("--rebuild-rollup", action="store_true",
+                        help="recompute hourly ticker mention rollup from all mentions")
+    parser.add_argument("--chunksize", type=int, default=100000,
+                        help="rows per chunk when re-scoring archive")
+    return parser.parse_args()
+
+
+def rescore_archive(archive_path, output_path, chunksize):
+    """
+    Extract ticker mentions from archived comment bodies with current tickers.
+    Write mentions csv (ticker_id, comment_id) ready for backfill.
+    Return number of mentions found.
+
+    Args:
+    :archive_path: csv file with columns comment_id, body
+    :output_path: csv file to write mentions to
+    :chunksize: number of archive rows per chunk
+    """
+    matcher = TickerMatcher(get_all_control_tickers())
+    mentions = 0
+    header = True
+    chunks = pd.read_csv(archive_path, usecols=["comment_id", "body"],
+                         dtype=str, chunksize=chunksize)
+    for chunk in chunks:
+        matches = matcher.match_frame(chunk)
+        matches[["ticker", "comment_id"]].to_csv(output_path, mode="w" if header else "a",
+                                                  header=["ticker_id", "comment_id"] if header else False,
+                                                  index=False)
+        header = False
+        mentions += len(matches)
+    return mentions
+
+
+def main():
+    """Run requested backfills in reference order."""
+    args = parse_args()
+    create_db()
+
+    if args.refresh_tickers:
+        config = get_config_section("iexfinance")
+        iex = IEXCollector(**config)
+        iex.update_database(refresh=True)
+
+    # parents before children so references exist
+    for table, file_path in [("submission", args.submissions),
+                             ("comment", args.comments),
+                             ("ticker_mention", args.mentions)]:
+        if file_path is None:
+            continue
+        print(f"Backfilling {table} from {file_path}...")
+        result = backfill_from_file(table, file_path)
+        if result is not None:
+            print(f"Rows in file: {result['staged']}, new rows: {result['new']}")
+
+    if args.rescore:
+        print(f"Re-scoring comment archive {args.rescore}...")
+        with tempfile.NamedTemporaryFile(suffix=".csv") as mentions_file:
+            mentions = rescore_archive(args.rescore, mentions_file.name, args.chunksize)
+            print(f"Ticker mentions found: {mentions}")
+            result = backfill_from_file("ticker_mention", mentions_file.name)
+            if result is not None:
+                print(f"New ticker mentions: {result['new']}")
+
+    if args.rebuild_rollup:
+        print("Rebuilding hourly ticker mention rollup...")
+        rows = rebuild_ticker_mention_hourly()
+        if rows is not None:
+            print(f"Hourly rollup rows: {rows}")
+
+
+if __name__ == "__main__":
+    main()
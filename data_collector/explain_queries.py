@@ -0,0 +1,64 @@
+"""Explain shipped queries and report plan regressions against a saved baseline."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from src.database.models import create_db
+from src.database.migrations import get_schema_version
+from src.database.query_plans import QUERY_PLANS, find_regressions, run_query_plans
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baseline", default="query_plans.json",
+                        help="json file with baseline plan summaries")
+    parser.add_argument("--save", action="store_true",
+                        help="save current plan summaries as baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed relative increase of buffers and execution time")
+    parser.add_argument("--query", action="append", choices=list(QUERY_PLANS),
+                        help="only explain this query, can be repeated")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print full text plans")
+    return parser.parse_args()
+
+
+def main():
+    """Explain queries, compare with baseline and exit with 1 on regressions."""
+    args = parse_args()
+    create_db()
+    print(f"Schema version: {get_schema_version()}")
+
+    results = run_query_plans(args.query, text=args.verbose)
+    for name, summary in results.items():
+        scans = ", ".join(summary["seq_scans"]) or "-"
+        print(f"{name:35} {summary['execution_ms']:>10.3f} ms {summary['buffers']:>8} buffers"
+              f"  seq scans: {scans}")
+        if args.verbose:
+            print(summary["plan"])
+
+    baseline_path = Path(args.baseline)
+    if args.save:
+        for summary in results.values():
+            summary.pop("plan", None)
+        baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Baseline saved to {baseline_path}")
+        return
+
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}, run with --save to create one.")
+        return
+    regressions = find_regressions(results, json.loads(baseline_path.read_text()),
+                                   args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No plan regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 """Main data collector and db updater for project."""
 
-import time
+import asyncio
+import threading
 
+from src.database.analytics import compute_analytics_forever, get_analytics_config
+from src.database.cache import warm_caches
+from src.database.listeners import add_mention_listener
 from src.database.models import create_db
+from src.database.partitions import get_partition_config, maintain_partitions_forever
+from src.alert_engine import create_alert_engine, get_alert_config
 from src.aux_functions import get_config_section
 from src.iex_collector import IEXCollector
+from src.price_collector import PriceCollector, get_price_config
 from src.reddit_collector import RedditCollector
+from src.async_reddit_collector import run_async_collector
+from src.scheduler import SubredditScheduler
+from src.stream_collector import StreamCollector
+from src.trending import TrendingTracker, get_trending_config
 
 
 def get_ticker_data():
@@ -15,9 +26,31 @@ def get_ticker_data():
     iex = IEXCollector(**config)
     iex.update_database()
 
-    # call iex api to get prices
-    # iex.update_prices()
-    # TODO!
+
+def get_subreddit_configs():
+    """
+    Read list of subreddits and their collection settings from config file.
+    Return dictionary with subreddit name as key.
+    """
+    names = get_config_section("subreddits")["names"].split(",")
+    subreddit_configs = {}
+    for name in [n.strip() for n in names if n.strip()]:
+        config = get_config_section(f"subreddit_{name}")
+        subreddit_configs[name] = {
+            "subreddit_params": {
+                "subreddit_sorting": config["subreddit_sorting"],
+                "limit": int(config["limit"]),
+            },
+            "comment_params": {
+                "limit": int(config["comment_limit"]),
+                # 0 -> no time budget
+                "time_budget": float(config.get("comment_time_budget", 0)) or None,
+            },
+            # concurrent expansions of async collector
+            "comment_workers": int(config.get("comment_workers", 4)),
+            "interval_minutes": float(config["interval_minutes"]),
+        }
+    return subreddit_configs
 
 
 def main():
@@ -25,27 +58,100 @@ def main():
     # create database
     create_db()
 
+    # create coming partitions and apply retention in background
+    partition_config = get_partition_config()
+    if partition_config["partitioned"]:
+        threading.Thread(target=maintain_partitions_forever,
+                         args=(partition_config["maintenance_hours"], ),
+                         name="partition-maintenance", daemon=True).start()
+
     # ticker data
     get_ticker_data()
 
-    # create reddit object
-    config = get_config_section("reddit")
-    reddit = RedditCollector(**config)
-
-    # update data every with 5min sleep
-    while True:
-        reddit.get_new_data(subreddit_name="wallstreetbets",
-                            subreddit_params={
-                                "subreddit_sorting": "hot",
-                                "limit": 1
-                                },
-                            comment_params={
-                                "limit": 1
-                                }
-                            )
-        timer_min = 1
-        print(f"Waiting for next call: {timer_min} min.")
-        time.sleep(60*timer_min)
+    # prices of mentioned tickers on own thread and schedule
+    price_config = get_price_config()
+    if price_config["enabled"]:
+        prices = PriceCollector(get_config_section("iexfinance")["token"],
+                                base_url=price_config["base_url"],
+                                batch_size=price_config["batch_size"],
+                                lookback_days=price_config["lookback_days"],
+                                mention_hours=price_config["mention_hours"],
+                                requests_per_minute=price_config["requests_per_minute"],
+                                timeout=price_config["timeout"],
+                                cache_size=price_config["cache_size"])
+        threading.Thread(target=prices.run_forever,
+                         args=(price_config["interval_minutes"], ),
+                         name="price-collector", daemon=True).start()
+
+    # mention vs price analytics, computed once per day
+    analytics_config = get_analytics_config()
+    if analytics_config["enabled"]:
+        threading.Thread(target=compute_analytics_forever, args=(analytics_config, ),
+                         name="analytics", daemon=True).start()
+
+    # top tickers per sliding window, updated with every mention write
+    trending = None
+    trending_config = get_trending_config()
+    if trending_config["enabled"]:
+        trending = TrendingTracker(top_k=trending_config["top_k"],
+                                   bucket_minutes=trending_config["bucket_minutes"])
+        add_mention_listener(trending.add)
+        trending.warm_up()
+        threading.Thread(target=trending.run_forever,
+                         args=(trending_config["interval_seconds"], ),
+                         name="trending", daemon=True).start()
+
+    # alert on hype spikes of new mentions in background
+    alert_config = get_alert_config()
+    if alert_config["enabled"]:
+        alert_engine = create_alert_engine(alert_config, trending=trending)
+        threading.Thread(target=alert_engine.run_forever,
+                         args=(alert_config["interval_seconds"], ),
+                         name="alert-engine", daemon=True).start()
+
+    # ids already in db, so known rows are not written again
+    cache_config = get_config_section("cache")
+    warm_caches(sources=int(cache_config["sources"]),
+                authors=int(cache_config["authors"]),
+                submissions=int(cache_config["submissions"]))
+
+    reddit_config = get_config_section("reddit")
+    subreddit_configs = get_subreddit_configs()
+    requests_per_minute = int(get_config_section("subreddits")["requests_per_minute"])
+
+    # poll: fetch, parse and write on collection thread
+    # pipeline: fetch, parse and write as concurrent stages with worker processes
+    # stream: follow new comments as they are posted, write in micro-batches
+    # async: asyncpraw and asyncpg on one event loop, submissions processed concurrently
+    collector_config = get_config_section("collector")
+    if collector_config["mode"] == "async":
+        asyncio.run(run_async_collector(reddit_config, subreddit_configs,
+                                        concurrency=int(collector_config["async_concurrency"]),
+                                        max_writes=int(collector_config.get("async_max_writes", 2))))
+        return
+
+    if collector_config["mode"] == "stream":
+        reddit = RedditCollector(**reddit_config)
+        stream = StreamCollector(reddit,
+                                 batch_size=int(collector_config["stream_batch_size"]),
+                                 flush_seconds=int(collector_config["stream_flush_seconds"]))
+        # one combined stream for all subreddits -> r/a+b+c
+        stream.run("+".join(subreddit_configs))
+        return
+
+    pipeline_config = None
+    if collector_config["mode"] == "pipeline":
+        pipeline_config = {
+            "workers": int(collector_config["workers"]) or None,
+            "queue_size": int(collector_config["queue_size"]),
+            "chunk_size": int(collector_config["chunk_size"]),
+        }
+
+    # collect from all subreddits concurrently, each on its own interval
+    scheduler = SubredditScheduler(reddit_config, subreddit_configs,
+                                   requests_per_minute=requests_per_minute,
+                                   pipeline_config=pipeline_config)
+    scheduler.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+"""Hype alert engine on incremental reads of the hourly mention rollup."""
+
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.aux_functions import get_config_section
+from src.database.alerts import get_changed_hourly_counts, get_hourly_counts, insert_alerts
+from src.notifiers import get_notifier
+
+
+HOUR = timedelta(hours=1)
+
+
+def get_alert_config():
+    """Read alert settings from config file."""
+    config = get_config_section("alerts")
+    return {
+        "enabled": config.get("enabled", "true").lower() == "true",
+        "interval_seconds": int(config.get("interval_seconds", 60)),
+        "alpha": float(config.get("alpha", 0.1)),
+        "z_threshold": float(config.get("z_threshold", 4)),
+        "min_mentions": int(config.get("min_mentions", 20)),
+        "min_hours": int(config.get("min_hours", 24)),
+        "min_std": float(config.get("min_std", 1)),
+        "settle_minutes": int(config.get("settle_minutes", 10)),
+        "warmup_hours": int(config.get("warmup_hours", 168)),
+        "lookback_seconds": int(config.get("lookback_seconds", 300)),
+        "webhook_url": config.get("webhook_url", ""),
+        "webhook_timeout": int(config.get("webhook_timeout", 5)),
+    }
+
+
+def current_hour():
+    """Return start of current UTC hour."""
+    return datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class Baseline:
+    """EWMA mean and variance of mentions per hour of one ticker."""
+    __slots__ = ("mean", "var", "hours", "last_hour")
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        # number of hours folded in, hours without mentions included
+        self.hours = 0
+        self.last_hour = None
+
+    def update(self, count, alpha):
+        """Fold count of next hour into mean and variance."""
+        if self.hours == 0:
+            self.mean = float(count)
+        else:
+            diff = count - self.mean
+            increment = alpha * diff
+            self.mean += increment
+            self.var = (1 - alpha) * (self.var + diff * increment)
+        self.hours += 1
+
+    def fold(self, hour, count, alpha, max_gap):
+        """
+        Fold count of hour, hours without mentions since last folded hour
+        are folded as zeros, at most max_gap of them.
+        """
+        if self.last_hour is not None:
+            gap = int((hour - self.last_hour) / HOUR) - 1
+            for _ in range(min(gap, max_gap)):
+                self.update(0, alpha)
+        self.update(count, alpha)
+        self.last_hour = hour
+
+
+class AlertEngine:
+    """
+    Keep per-ticker baselines of mentions per hour and alert on hype spikes.
+    Each run reads only ticker hours changed in the rollup since the previous run.
+    Counts of open hours are kept until the hour has settled and is folded into
+    the baseline, so memory is O(tickers) and history is never rescanned.
+    A ticker hour alerts once when its count reaches min_mentions and its
+    z-score against the baseline reaches z_threshold.
+    """
+    def __init__(self, notifier=None, alpha=0.1, z_threshold=4, min_mentions=20,
+                 min_hours=24, min_std=1, settle_minutes=10, warmup_hours=168,
+                 lookback_seconds=300, trending=None):
+        """
+        Args:
+        :notifier: object with notify(alerts), print notifier if None
+        :alpha: EWMA weight of newest hour
+        :z_threshold: z-score of hour count that fires an alert
+        :min_mentions: mentions per hour needed to fire an alert
+        :min_hours: hours of baseline needed before ticker can alert
+        :min_std: lower bound of baseline std, avoids huge z-scores of quiet tickers
+        :settle_minutes: minutes after end of hour before it is folded into baseline
+        :warmup_hours: hours of rollup read once on start to build baselines
+        :lookback_seconds: overlap of incremental reads, catches rows of
+                           transactions committed after previous read
+        :trending: TrendingTracker to add 1h trending rank to alerts, or None
+        """
+        self.notifier = notifier if notifier is not None else get_notifier()
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_mentions = min_mentions
+        self.min_hours = min_hours
+        self.min_std = min_std
+        self.settle = timedelta(minutes=settle_minutes)
+        self.warmup_hours = warmup_hours
+        self.lookback = timedelta(seconds=lookback_seconds)
+        # hours without mentions to fold at most, older history has decayed
+        self.max_gap = max(min_hours, int(5 / alpha))
+        self.baselines = {}
+        # ticker -> {hour: count} of hours not folded yet
+        self.open_hours = {}
+        self.alerted = set()
+        self.watermark = None
+        self.trending = trending
+
+    def warm_up(self):
+        """Build baselines from last warmup_hours of rollup."""
+        since_hour = current_hour() - self.warmup_hours * HOUR
+        read_time = datetime.now(timezone.utc)
+        rows = get_hourly_counts(since_hour)
+        self.add_counts(rows)
+        self.fold_settled()
+        self.watermark = read_time
+        print(f"Alert baselines built for {len(self.baselines)} tickers from {len(rows)} hours.")
+
+    def add_counts(self, rows):
+        """
+        Set counts of open ticker hours, hours already folded are skipped.
+        Return list of (ticker_id, hour) with new counts.
+        """
+        changed = []
+        for ticker_id, hour, count in rows:
+            baseline = self.baselines.get(ticker_id)
+            if baseline is not None and baseline.last_hour is not None \
+                    and hour <= baseline.last_hour:
+                continue
+            self.open_hours.setdefault(ticker_id, {})[hour] = int(count)
+            changed.append((ticker_id, hour))
+        return changed
+
+    def fold_settled(self):
+        """Fold counts of settled hours into baselines, oldest first."""
+        settled_before = datetime.now(timezone.utc) - self.settle - HOUR
+        for ticker_id in list(self.open_hours):
+            hours = self.open_hours[ticker_id]
+            baseline = self.baselines.get(ticker_id)
+            if baseline is None:
+                baseline = self.baselines[ticker_id] = Baseline()
+            for hour in sorted(h for h in hours if h <= settled_before):
+                baseline.fold(hour, hours.pop(hour), self.alpha, self.max_gap)
+                self.alerted.discard((ticker_id, hour))
+            if not hours:
+                del self.open_hours[ticker_id]
+
+    def evaluate(self, changed):
+        """
+        Return alerts of changed open ticker hours crossing thresholds.
+
+        Args:
+        :changed: list of (ticker_id, hour)
+        """
+        alerts = []
+        for ticker_id, hour in changed:
+            if (ticker_id, hour) in self.alerted:
+                continue
+            count = self.open_hours.get(ticker_id, {}).get(hour)
+            baseline = self.baselines.get(ticker_id)
+            if count is None or count < self.min_mentions:
+                continue
+            if baseline is None or baseline.hours < self.min_hours:
+                continue
+            # mean of hours folded before this one, gap hours had no mentions
+            gap = int((hour - baseline.last_hour) / HOUR) - 1
+            mean = baseline.mean * (1 - self.alpha) ** min(gap, self.max_gap)
+            std = max(math.sqrt(baseline.var), self.min_std)
+            z_score = (count - mean) / std
+            if z_score < self.z_threshold:
+                continue
+            alerts.append({
+                "ticker_id": ticker_id,
+                "hour": hour,
+                "mention_count": count,
+                "baseline_mean": round(mean, 3),
+                "baseline_std": round(std, 3),
+                "z_score": round(z_score, 3),
+            })
+            if self.trending is not None:
+                alerts[-1]["trending_rank"] = self.trending.rank(ticker_id, "1h")
+        return alerts
+
+    def run_once(self):
+        """
+        Read changed ticker hours, alert on spikes and fold settled hours.
+        Return list of new alerts.
+        """
+        if self.watermark is None:
+            self.warm_up()
+        rows, read_time = get_changed_hourly_counts(self.watermark - self.lookback)
+        changed = self.add_counts(rows)
+        alerts = self.evaluate(changed)
+        new_alerts = insert_alerts(alerts)
+        if new_alerts is None:
+            # retried next run
+            new_alerts = []
+        else:
+            self.alerted.update((a["ticker_id"], a["hour"]) for a in alerts)
+        if new_alerts:
+            self.notifier.notify(new_alerts)
+        self.fold_settled()
+        self.watermark = read_time
+        return new_alerts
+
+    def run_forever(self, interval_seconds=60):
+        """Run alert engine every interval_seconds, blocks forever."""
+        while True:
+            start = time.time()
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Couldn't evaluate alerts. Error: {e}")
+            time.sleep(max(0, interval_seconds - (time.time() - start)))
+
+
+def create_alert_engine(config=None, trending=None):
+    """
+    Return alert engine with settings and notifier from config.
+
+    Args:
+    :config: dictionary from get_alert_config, read from config file if None
+    :trending: TrendingTracker of collector or None
+    """
+    config = config if config is not None else get_alert_config()
+    notifier = get_notifier(config["webhook_url"], config["webhook_timeout"])
+    return AlertEngine(notifier=notifier, alpha=config["alpha"],
+                       z_threshold=config["z_threshold"],
+                       min_mentions=config["min_mentions"],
+                       min_hours=config["min_hours"], min_std=config["min_std"],
+                       settle_minutes=config["settle_minutes"],
+                       warmup_hours=config["warmup_hours"],
+                       lookback_seconds=config["lookback_seconds"],
+                       trending=trending)
@@ -0,0 +1,293 @@
+"""Asyncio Reddit collector using asyncpraw and asyncpg."""
+
+import asyncio
+from datetime import datetime, timezone
+
+import asyncpraw
+
+from src.comment_tree import AsyncCommentTree
+from src.database.async_db import (create_async_pool, get_submission_checkpoint,
+                                   insert_comment_batch, upsert_submission_checkpoint)
+from src.database.cache import format_cache_stats
+from src.database.queries import get_all_control_tickers
+from src.records import row_to_comment_record
+from src.ticker_matcher import TickerMatcher
+
+
+class AsyncRedditCollector:
+    """
+    Asyncio variant of RedditCollector.
+    Submissions are processed concurrently, so api calls, comment tree expansion
+    and db writes of different submissions overlap on one event loop.
+
+    Create with `await AsyncRedditCollector.create(**config)` and close with `await close()`.
+    Extra keyword arguments are passed to asyncpraw, i.e. oauth_url and reddit_url
+    to run against a local fake Reddit server.
+    """
+    def __init__(self, client_id, client_secret, user_agent, username, password,
+                 ticker_matcher=None, concurrency=4, batch_size=100, max_writes=2,
+                 **reddit_kwargs):
+        self.ticker_matcher = ticker_matcher or TickerMatcher(get_all_control_tickers())
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.batch_size = batch_size
+        # batch writes in flight per submission, bounds buffered ticker comments
+        self.max_writes = max_writes
+        self.pool = None
+        print("Creating async connection to Reddit...")
+        self.reddit = asyncpraw.Reddit(client_id=client_id,
+                                       client_secret=client_secret,
+                                       user_agent=user_agent,
+                                       username=username, password=password,
+                                       **reddit_kwargs)
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        """Create collector and its db connection pool."""
+        collector = cls(*args, **kwargs)
+        collector.pool = await create_async_pool()
+        return collector
+
+    async def close(self):
+        """Close reddit session and db connection pool."""
+        await self.reddit.close()
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def get_subreddit(self, subreddit_name):
+        """
+        Return reddit subreddit object.
+
+        Args:
+        :subreddit_name: name of subreddit -> r/{}.
+        """
+        print(f"Connecting to subreddit: r/{subreddit_name}...")
+        return await self.reddit.subreddit(subreddit_name)
+
+    def get_submissions(self, subreddit_obj, subreddit_sorting,
+                        top_sorting='all', limit=10):
+        """
+        Return async iterator of submissions from subreddit.
+
+        Args:
+        :subreddit_obj: asyncpraw subreddit object.
+        :subreddit_sorting: string -> hot/new/top.
+        :top_sorting: string when using top sorting -> all/year/month/day.
+        :limit: int nr of submissions to collect.
+        """
+        subred = subreddit_obj.display_name
+        print(f"Getting {limit} submissions from: r/{subred}/{subreddit_sorting}...")
+        if subreddit_sorting == "hot":
+            return subreddit_obj.hot(limit=limit)
+        elif subreddit_sorting == "new":
+            return subreddit_obj.new(limit=limit)
+        elif subreddit_sorting == "top":
+            return subreddit_obj.top(time_filter=top_sorting, limit=limit)
+        else:
+            print(f"Subreddit sorting type not recognized: {subreddit_sorting}")
+            raise ValueError
+
+    async def get_comments(self, submission_obj, limit=10, time_budget=None, workers=4):
+        """
+        Return comment tree of single submission object, an async iterable of comment
+        objects yielded as they arrive. MoreComments are expanded concurrently.
+        Check `complete` of the tree after iterating to see if comments were left unexpanded.
+
+        Args:
+        :submission_obj: asyncpraw single submission object.
+        :limit: int nr of MoreComments to expand, None for all.
+        :time_budget: seconds to spend on expanding comments, None for no limit.
+        :workers: nr of MoreComments expanded concurrently.
+        """
+        print(f"Getting comments from submission: {submission_obj.id}, "
+              f"expanding up to {limit} more comments")
+        await submission_obj.load()
+        return AsyncCommentTree(submission_obj, limit=limit, time_budget=time_budget,
+                                workers=workers)
+
+    def get_submission_data(self, submission_obj):
+        """
+        Return target datapoints for single submission as dictionary.
+        Ids are read from fullnames so no extra api calls are needed.
+
+        Args:
+        :submission_obj: asyncpraw single submission object.
+        """
+        data = None
+        try:
+            data = {
+                "submission_id": submission_obj.id,
+                "timestamp": datetime.fromtimestamp(int(submission_obj.created_utc)),
+                "score": submission_obj.score,
+                "nr_comments": submission_obj.num_comments,
+                "author_id": submission_obj.author_fullname[3:],
+                "source": submission_obj.subreddit_id,
+                "source_name": submission_obj.subreddit.display_name
+            }
+        except Exception as error:
+            print(f"Couldn't access submission data: {error}. On to the next one...")
+        return data
+
+    async def get_ticker_comments(self, comments, checkpoint, high_water):
+        """
+        Yield comment records of new comments that mention tickers.
+        Newest comment seen is tracked in high_water dictionary.
+
+        Args:
+        :comments: async iterator of asyncpraw comment objects.
+        :checkpoint: dictionary with submission checkpoint or None
+        :high_water: dictionary updated with created_utc and comment_id of newest comment
+        """
+        since = None
+        if checkpoint is not None and checkpoint["last_comment_timestamp"] is not None:
+            since = checkpoint["last_comment_timestamp"].timestamp()
+        async for comment in comments:
+            if comment.created_utc > high_water.get("created_utc", 0):
+                high_water["created_utc"] = comment.created_utc
+                high_water["comment_id"] = comment.id
+            if since is not None and comment.created_utc < since:
+                continue
+            author_fullname = getattr(comment, "author_fullname", None)
+            if author_fullname is None:
+                continue
+            tickers = self.ticker_matcher.match(comment.body)
+            if len(tickers) > 0:
+                comment_row = (comment.id, comment.created_utc, comment.score,
+                               comment.link_id[3:], author_fullname[3:], comment.body)
+                yield row_to_comment_record(comment_row, tickers)
+
+    async def insert_new_data_to_db(self, ticker_comments, submission_data):
+        """
+        Insert new ticker mention data to database.
+        Return dictionary with number of new rows per table or None on error.
+
+        Args:
+        :ticker_comments: list of comment records
+        :submission_data: dictionary with submission data
+        """
+        new_rows = await insert_comment_batch(self.pool, [submission_data], ticker_comments)
+        if new_rows is None:
+            return None
+        print(f"Number of new comments writen to db: {new_rows['comments']}")
+        print(f"Number of new ticker mentions writen to db: {new_rows['ticker_mentions']}")
+        return new_rows
+
+    async def process_submission(self, submission, comment_params):
+        """
+        Collect new ticker comments of single submission and write them to db.
+
+        Args:
+        :submission: asyncpraw single submission object.
+        :comment_params: dictionary with get_comments arguments.
+        """
+        async with self.semaphore:
+            submission_data = self.get_submission_data(submission)
+            if submission_data is None:
+                return
+            submission_id = submission_data["submission_id"]
+
+            # skip submissions without new comments since last pass
+            checkpoint = await get_submission_checkpoint(self.pool, submission_id)
+            if checkpoint is not None:
+                if submission_data["nr_comments"] <= checkpoint["nr_comments"]:
+                    print(f"No new comments in submission: {submission_id}")
+                    return
+                submission.comment_sort = "new"
+
+            print(f"Extracting comments from submission: {submission_id}")
+            comments = await self.get_comments(submission, **comment_params)
+            high_water = {}
+
+            # write each batch as soon as it is full, while comments keep streaming in,
+            # with at most max_writes batches in flight
+            writes = set()
+            results = []
+
+            async def write(batch):
+                nonlocal writes
+                if len(writes) >= self.max_writes:
+                    done, writes = await asyncio.wait(writes,
+                                                      return_when=asyncio.FIRST_COMPLETED)
+                    results.extend(task.result() for task in done)
+                writes.add(asyncio.ensure_future(self.insert_new_data_to_db(batch,
+                                                                            submission_data)))
+
+            ticker_comments = []
+            async for comment_record in self.get_ticker_comments(comments, checkpoint,
+                                                                 high_water):
+                ticker_comments.append(comment_record)
+                if len(ticker_comments) >= self.batch_size:
+                    await write(ticker_comments)
+                    ticker_comments = []
+            if len(ticker_comments) > 0:
+                await write(ticker_comments)
+            results.extend(await asyncio.gather(*writes))
+
+            # failed writes keep the previous checkpoint, so next pass fetches again
+            if any(result is None for result in results):
+                return
+            # partly fetched trees keep the previous newest comment,
+            # nr_comments is saved so unchanged submissions are skipped
+            if not comments.complete:
+                print(f"Comments of submission {submission_id} left unexpanded, "
+                      f"newest comment not moved")
+                high_water = {}
+            last_comment_timestamp = None
+            if "created_utc" in high_water:
+                last_comment_timestamp = datetime.fromtimestamp(
+                    int(high_water["created_utc"]), tz=timezone.utc)
+            await upsert_submission_checkpoint(self.pool, submission_id,
+                                               last_comment_timestamp,
+                                               high_water.get("comment_id"),
+                                               submission_data["nr_comments"])
+
+    async def get_new_data(self, subreddit_name, subreddit_params, comment_params):
+        """Get new comments from subreddit, all submissions processed concurrently."""
+        subreddit = await self.get_subreddit(subreddit_name)
+        tasks = []
+        async for submission in self.get_submissions(subreddit, **subreddit_params):
+            tasks.append(asyncio.create_task(self.process_submission(submission,
+                                                                     comment_params)))
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"Couldn't collect submission: {result}")
+
+    async def collect_forever(self, subreddit_name, subreddit_params,
+                              comment_params, interval_minutes):
+        """Collect new data from single subreddit every interval."""
+        while True:
+            start = asyncio.get_running_loop().time()
+            try:
+                await self.get_new_data(subreddit_name, subreddit_params, comment_params)
+            except Exception as error:
+                print(f"Collection from r/{subreddit_name} failed: {error}")
+            print(f"Cache hit rates: {format_cache_stats()}")
+            wait = max(0, 60 * interval_minutes - (asyncio.get_running_loop().time() - start))
+            print(f"Waiting for next call to r/{subreddit_name}: {wait / 60:.1f} min.")
+            await asyncio.sleep(wait)
+
+
+async def run_async_collector(reddit_config, subreddit_configs, concurrency=4, max_writes=2):
+    """
+    Collect from all subreddits concurrently on one event loop.
+
+    Args:
+    :reddit_config: dictionary with reddit credentials.
+    :subreddit_configs: dictionary with subreddit name as key and dictionary
+                        with subreddit_params, comment_params, comment_workers
+                        and interval_minutes.
+    :concurrency: max nr of submissions processed at the same time.
+    :max_writes: max nr of batch writes in flight per submission.
+    """
+    collector = await AsyncRedditCollector.create(**reddit_config, concurrency=concurrency,
+                                                  max_writes=max_writes)
+    try:
+        await asyncio.gather(*[
+            collector.collect_forever(name, config["subreddit_params"],
+                                      dict(config["comment_params"],
+                                           workers=config["comment_workers"]),
+                                      config["interval_minutes"])
+            for name, config in subreddit_configs.items()
+        ])
+    finally:
+        await collector.close()
@@ -0,0 +1,207 @@
+"""Multiprocess comment pipeline: fetch, parse and write in separate stages."""
+
+import multiprocessing
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.database.queries import get_submission_checkpoint
+from src.records import row_to_comment_record
+from src.ticker_matcher import TickerMatcher
+
+
+# end of stream marker between stages
+_DONE = object()
+
+# ticker matcher of worker process, created once by init_worker
+_worker_matcher = None
+
+
+def init_worker(tickers):
+    """Create ticker matcher in worker process."""
+    global _worker_matcher
+    _worker_matcher = TickerMatcher(tickers)
+
+
+def parse_comment_chunk(comment_rows):
+    """
+    Extract tickers from chunk of raw comment rows in worker process.
+    Return list of comment records.
+
+    Args:
+    :comment_rows: list of tuples (comment_id, created_utc, score,
+                   submission_id, author_id, body)
+    """
+    ticker_comments = []
+    for comment_row in comment_rows:
+        tickers = _worker_matcher.match(comment_row[-1])
+        if len(tickers) > 0:
+            ticker_comments.append(row_to_comment_record(comment_row, tickers))
+    return ticker_comments
+
+
+def create_executor(ticker_matcher, workers=None):
+    """
+    Return process pool with ticker matcher built in every worker.
+    Workers are started from a forkserver, forking the collector itself is unsafe
+    while its pool, rate limiter and listener threads hold locks.
+
+    Args:
+    :ticker_matcher: TickerMatcher with valid tickers.
+    :workers: nr of worker processes, defaults to nr of cpus.
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                               mp_context=multiprocessing.get_context("forkserver"),
+                               initializer=init_worker,
+                               initargs=(ticker_matcher.tickers, ))
+
+
+class CommentPipeline:
+    """
+    Collect new data with fetching, parsing and db writing as separate stages.
+
+    - fetch thread: calls reddit api and puts chunks of raw comment rows on a queue.
+    - main thread: hands chunks to a process pool for ticker extraction.
+    - write thread: writes parsed ticker comments to db.
+
+    Stages are joined by bounded queues, so a slow stage holds back the others
+    instead of buffering whole submissions in memory.
+    """
+    def __init__(self, collector, workers=None, queue_size=8, chunk_size=500,
+                 executor=None):
+        self.collector = collector
+        self.workers = workers or os.cpu_count()
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        # pipelines of several collectors can share one process pool
+        self.owns_executor = executor is None
+        self.executor = executor or create_executor(collector.ticker_matcher, self.workers)
+
+    def close(self):
+        """Shut down worker processes."""
+        if self.owns_executor:
+            self.executor.shutdown()
+
+    def fetch_stage(self, subreddit_name, subreddit_params, comment_params,
+                    parse_queue, errors, stop):
+        """Fetch submissions and comments, put raw comment chunks on parse queue."""
+        try:
+            subreddit = self.collector.get_subreddit(subreddit_name)
+            submissions = self.collector.get_submissions(subreddit, **subreddit_params)
+            for submission in submissions:
+                if stop.is_set():
+                    break
+                submission_data = self.collector.get_submission_data(submission)
+                if submission_data is None:
+                    continue
+
+                # skip submissions without new comments since last pass
+                checkpoint = get_submission_checkpoint(submission_data["submission_id"])
+                if self.collector.is_submission_unchanged(submission_data, checkpoint):
+                    print(f"No new comments in submission: {submission_data['submission_id']}")
+                    continue
+                if checkpoint is not None:
+                    submission.comment_sort = "new"
+
+                print(f"Extracting comments from submission: {submission_data['submission_id']}")
+                comments = self.collector.get_comments(submission, **comment_params)
+                high_water = {}
+                chunk = []
+                for comment in self.collector.filter_new_comments(comments, checkpoint, high_water):
+                    row = self.collector.get_comment_row(comment)
+                    if row is not None:
+                        chunk.append(row)
+                    if len(chunk) >= self.chunk_size:
+                        parse_queue.put(("comments", submission_data, chunk))
+                        chunk = []
+                    if stop.is_set():
+                        break
+                if len(chunk) > 0:
+                    parse_queue.put(("comments", submission_data, chunk))
+                if stop.is_set():
+                    break
+                # checkpoint follows the submission's comments through the stages,
+                # partly fetched trees keep the previous newest comment
+                if not comments.complete:
+                    print(f"Comments of submission {submission_data['submission_id']} "
+                          f"left unexpanded, newest comment not moved")
+                    high_water = {}
+                parse_queue.put(("checkpoint", submission_data, high_water))
+        except Exception as error:
+            print(f"Fetch stage failed: {error}")
+            errors.append(error)
+        finally:
+            parse_queue.put(_DONE)
+
+    def write_stage(self, write_queue):
+        """
+        Write parsed ticker comments from write queue to db.
+        Checkpoints are saved once all comments of the submission are written.
+        """
+        failed_submissions = set()
+        while True:
+            item = write_queue.get()
+            if item is _DONE:
+                break
+            kind, submission_data, payload = item
+            submission_id = submission_data["submission_id"]
+            if kind == "checkpoint":
+                if submission_id not in failed_submissions:
+                    self.collector.update_checkpoint(submission_data, payload)
+                failed_submissions.discard(submission_id)
+            elif len(payload) > 0:
+                if self.collector.insert_new_data_to_db(payload, submission_data) is None:
+                    failed_submissions.add(submission_id)
+
+    def collect_result(self, item):
+        """Wait for parsed chunk of in flight item, checkpoints pass through as is."""
+        kind, submission_data, payload = item
+        if kind == "comments":
+            payload = payload.result()
+        return kind, submission_data, payload
+
+    def run(self, subreddit_name, subreddit_params, comment_params):
+        """Get new comments from subreddit through the pipeline."""
+        parse_queue = queue.Queue(maxsize=self.queue_size)
+        write_queue = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        stop = threading.Event()
+
+        fetcher = threading.Thread(target=self.fetch_stage, daemon=True,
+                                   args=(subreddit_name, subreddit_params,
+                                         comment_params, parse_queue, errors, stop))
+        writer = threading.Thread(target=self.write_stage, args=(write_queue, ), daemon=True)
+        fetcher.start()
+        writer.start()
+
+        # keep workers busy, but only a bounded number of chunks in flight
+        in_flight = deque()
+        max_in_flight = 2 * self.workers
+        fetch_done = False
+        try:
+            while True:
+                item = parse_queue.get()
+                if item is _DONE:
+                    fetch_done = True
+                    break
+                kind, submission_data, payload = item
+                if kind == "comments":
+                    payload = self.executor.submit(parse_comment_chunk, payload)
+                in_flight.append((kind, submission_data, payload))
+                while len(in_flight) >= max_in_flight:
+                    write_queue.put(self.collect_result(in_flight.popleft()))
+            while len(in_flight) > 0:
+                write_queue.put(self.collect_result(in_flight.popleft()))
+        finally:
+            # on failure stop fetcher and drain queue so it is not blocked on put
+            stop.set()
+            while not fetch_done:
+                fetch_done = parse_queue.get() is _DONE
+            write_queue.put(_DONE)
+            writer.join()
+            fetcher.join()
+
+        if len(errors) > 0:
+            raise errors[0]
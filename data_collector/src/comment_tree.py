@@ -0,0 +1,207 @@
+"""Expansion of submission comment trees within a time and request budget."""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+import asyncpraw
+import praw
+from praw.endpoints import API_PATH
+
+
+# max comment ids per morechildren request
+MORECHILDREN_LIMIT = 100
+
+
+class CommentTreeBase:
+    """
+    Walk loaded comments of a submission and queue its MoreComments nodes,
+    largest first like replace_more. Expansions are counted against a budget
+    of requests (limit) and seconds spent waiting on them (time_budget),
+    None for no budget. Time the caller spends between comments is not counted.
+    """
+    more_class = None
+
+    def __init__(self, submission_obj, limit=None, time_budget=None):
+        self.submission = submission_obj
+        self.limit = limit
+        self.time_budget = time_budget
+        self.spent = 0.0
+        self.more = []
+        self.order = itertools.count()
+        self.requests = 0
+        # MoreComments nodes dropped on errors or when time budget ran out
+        self.lost = 0
+        self.finished = False
+
+    @property
+    def complete(self):
+        """True if all comments were walked and no MoreComments were left unexpanded."""
+        return self.finished and not self.more and self.lost == 0
+
+    def walk(self, items):
+        """Yield comments of items and their replies, queue MoreComments nodes."""
+        stack = list(items)[::-1]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, self.more_class):
+                item.submission = self.submission
+                heapq.heappush(self.more, (-item.count, next(self.order), item))
+                continue
+            yield item
+            stack.extend(list(item.replies)[::-1])
+
+    def time_left(self):
+        """Return seconds left of time budget, None without time budget."""
+        if self.time_budget is None:
+            return None
+        return max(0.0, self.time_budget - self.spent)
+
+    def has_budget(self):
+        """Check if another expansion request fits in the budget."""
+        if self.time_left() == 0:
+            return False
+        return self.limit is None or self.requests < self.limit
+
+    def next_more(self):
+        """Return next MoreComments node to expand or None if queue or budget is spent."""
+        if not self.more or not self.has_budget():
+            return None
+        self.requests += 1
+        return heapq.heappop(self.more)[2]
+
+    def summary(self):
+        """Return one line summary of expansion."""
+        return (f"Requested {self.requests} comment expansions of submission "
+                f"{self.submission.id} in {self.spent:.1f} sec, "
+                f"{len(self.more) + self.lost} left unexpanded")
+
+
+class CommentTree(CommentTreeBase):
+    """
+    Iterable of comments of a praw submission, yielded as they arrive.
+    praw is not thread safe, so MoreComments nodes are expanded on the calling thread.
+    Children of several nodes are fetched with one morechildren request instead.
+    """
+    more_class = praw.models.MoreComments
+
+    def __init__(self, reddit, submission_obj, limit=None, time_budget=None):
+        """
+        Args:
+        :reddit: praw reddit instance of submission.
+        :submission_obj: praw single submission object.
+        :limit: max nr of expansion requests, None for no limit.
+        :time_budget: max seconds spent on expansion requests, None for no limit.
+        """
+        super().__init__(submission_obj, limit, time_budget)
+        self.reddit = reddit
+
+    def next_batch(self):
+        """
+        Return list of MoreComments nodes for next request, largest first,
+        empty list if queue or budget is spent.
+        """
+        more = self.next_more()
+        if more is None:
+            return []
+        batch = [more]
+        # "continue this thread" nodes have no children and are loaded alone
+        if more.count == 0:
+            return batch
+        size = len(more.children)
+        while self.more:
+            more = self.more[0][2]
+            if more.count == 0 or size + len(more.children) > MORECHILDREN_LIMIT:
+                break
+            heapq.heappop(self.more)
+            batch.append(more)
+            size += len(more.children)
+        return batch
+
+    def request_batch(self, batch):
+        """Return comments and MoreComments of batch, fetched with one api request."""
+        if batch[0].count == 0:
+            return batch[0].comments(update=False)
+        data = {
+            "children": ",".join(child for more in batch for child in more.children),
+            "link_id": self.submission.fullname,
+            "sort": self.submission.comment_sort,
+        }
+        return self.reddit.post(API_PATH["morechildren"], data=data)
+
+    def __iter__(self):
+        yield from self.walk(self.submission.comments)
+        try:
+            while True:
+                batch = self.next_batch()
+                if not batch:
+                    break
+                started = time.monotonic()
+                try:
+                    comments = self.request_batch(batch)
+                except Exception as error:
+                    print(f"Couldn't expand comments: {error}. On to the next one...")
+                    self.lost += len(batch)
+                    continue
+                finally:
+                    self.spent += time.monotonic() - started
+                yield from self.walk(comments)
+            self.finished = True
+        finally:
+            print(self.summary())
+
+
+class AsyncCommentTree(CommentTreeBase):
+    """
+    Async iterable of comments of a loaded asyncpraw submission.
+    MoreComments nodes are expanded as concurrent tasks on the event loop.
+    """
+    more_class = asyncpraw.models.MoreComments
+
+    def __init__(self, submission_obj, limit=None, time_budget=None, workers=4):
+        """
+        Args:
+        :submission_obj: loaded asyncpraw single submission object.
+        :limit: max nr of expansion requests, None for no limit.
+        :time_budget: max seconds spent waiting on expansions, None for no limit.
+        :workers: nr of expansions in flight.
+        """
+        super().__init__(submission_obj, limit, time_budget)
+        self.workers = workers
+
+    async def __aiter__(self):
+        for comment in self.walk(self.submission.comments):
+            yield comment
+        in_flight = set()
+        try:
+            while True:
+                while len(in_flight) < self.workers:
+                    more = self.next_more()
+                    if more is None:
+                        break
+                    in_flight.add(asyncio.ensure_future(more.comments(update=False)))
+                if not in_flight:
+                    break
+                started = time.monotonic()
+                done, in_flight = await asyncio.wait(in_flight, timeout=self.time_left(),
+                                                     return_when=asyncio.FIRST_COMPLETED)
+                self.spent += time.monotonic() - started
+                # time budget spent, requests in flight are dropped
+                if not done:
+                    break
+                for task in done:
+                    try:
+                        comments = task.result()
+                    except Exception as error:
+                        print(f"Couldn't expand comments: {error}. On to the next one...")
+                        self.lost += 1
+                        continue
+                    for comment in self.walk(comments):
+                        yield comment
+            self.finished = True
+        finally:
+            self.lost += len(in_flight)
+            for task in in_flight:
+                task.cancel()
+            print(self.summary())
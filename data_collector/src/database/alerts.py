@@ -0,0 +1,99 @@
+"""Reads of hourly mention counts and writes of alerts for the alert engine."""
+
+from psycopg2.extras import execute_values
+
+from src.database.pool import pooled_connection
+
+
+# reads of alert engine and trending warm up, explained by query_plans
+HOURLY_COUNTS_SQL = """
+    SELECT ticker_id, hour, SUM(mention_count)
+    FROM ticker_mention_hourly
+    WHERE hour >= %s
+    GROUP BY ticker_id, hour
+    ORDER BY hour, ticker_id;
+"""
+
+CHANGED_HOURLY_COUNTS_SQL = """
+    WITH changed AS (
+        SELECT DISTINCT ticker_id, hour
+        FROM ticker_mention_hourly
+        WHERE updated_at >= %s
+    )
+    SELECT h.ticker_id, h.hour, SUM(h.mention_count)
+    FROM ticker_mention_hourly h
+    INNER JOIN changed c USING(ticker_id, hour)
+    GROUP BY h.ticker_id, h.hour
+    ORDER BY h.hour, h.ticker_id;
+"""
+
+
+def get_hourly_counts(since_hour):
+    """
+    Get mentions per ticker and UTC hour summed over sources, oldest hour first.
+    Return list of (ticker_id, hour, mention_count).
+
+    Args:
+    :since_hour: first hour to read, datetime with timezone
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(HOURLY_COUNTS_SQL, (since_hour, ))
+        rows = cur.fetchall()
+        cur.close()
+        conn.commit()
+    return rows
+
+
+def get_changed_hourly_counts(changed_since):
+    """
+    Get mentions per ticker and UTC hour summed over sources for ticker hours
+    with rollup rows changed at or after changed_since, oldest hour first.
+    Return tuple with (list of (ticker_id, hour, mention_count), db time of read).
+
+    Args:
+    :changed_since: datetime with timezone
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT now();")
+        read_time = cur.fetchone()[0]
+        cur.execute(CHANGED_HOURLY_COUNTS_SQL, (changed_since, ))
+        rows = cur.fetchall()
+        cur.close()
+        conn.commit()
+    return rows, read_time
+
+
+def insert_alerts(alerts):
+    """
+    Insert alerts, alerts of ticker hours already alerted are skipped.
+    Return list of inserted alerts, None on error.
+
+    Args:
+    :alerts: list of dictionaries with ticker_id, hour, mention_count,
+             baseline_mean, baseline_std and z_score
+    """
+    if not alerts:
+        return []
+    sql = """
+        INSERT INTO alert (ticker_id, hour, mention_count,
+                           baseline_mean, baseline_std, z_score)
+        VALUES %s
+        ON CONFLICT (ticker_id, hour) DO NOTHING
+        RETURNING ticker_id, hour;
+    """
+    rows = [(a["ticker_id"], a["hour"], a["mention_count"],
+             a["baseline_mean"], a["baseline_std"], a["z_score"]) for a in alerts]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            inserted = set(execute_values(cur, sql, rows, fetch=True))
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't insert alerts. Error: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
+    return [a for a in alerts if (a["ticker_id"], a["hour"]) in inserted]
@@ -0,0 +1,198 @@
+"""Daily mention vs price analytics per ticker, computed with window functions in db."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.aux_functions import get_config_section
+from src.database.pool import pooled_connection
+
+
+# hourly closes and volumes of price table joined with mentions since previous price hour,
+# then per ticker: correlation of mentions with returns k price hours later,
+# average returns after mention spikes and volume weighted mentions per hour
+ANALYTICS_SQL = """
+    WITH price_hourly AS (
+        SELECT
+            ticker_id,
+            date_trunc('hour', timestamp) AS hour,
+            ((array_agg(close_price ORDER BY timestamp DESC))[1])::double precision AS close,
+            COALESCE(SUM(volume), 0) AS volume
+        FROM price
+        WHERE timestamp >= %(since)s AND timestamp < %(until)s
+        GROUP BY 1, 2
+    ), price_series AS (
+        SELECT
+            ticker_id,
+            hour,
+            close,
+            volume,
+            lag(hour) OVER w AS prev_hour,
+            close / NULLIF(lag(close) OVER w, 0) - 1 AS ret
+        FROM price_hourly
+        WINDOW w AS (PARTITION BY ticker_id ORDER BY hour)
+    ), series AS (
+        -- mentions outside market hours count for next price hour
+        SELECT p.ticker_id, p.hour, p.close, p.volume, p.ret, COALESCE(m.mentions, 0) AS mentions
+        FROM price_series p
+        LEFT JOIN LATERAL (
+            SELECT SUM(h.mention_count) AS mentions
+            FROM ticker_mention_hourly h
+            WHERE h.ticker_id = p.ticker_id
+                AND h.hour > COALESCE(p.prev_hour, p.hour - interval '1 hour')
+                AND h.hour <= p.hour
+        ) m ON true
+    ), correlations AS (
+        SELECT ticker_id, lag, corr(mentions, future_ret) AS correlation,
+               count(future_ret) AS points
+        FROM (
+            SELECT
+                s.ticker_id,
+                l.lag,
+                s.mentions,
+                lead(s.ret, l.lag) OVER (PARTITION BY s.ticker_id, l.lag ORDER BY s.hour)
+                    AS future_ret
+            FROM series s
+            CROSS JOIN generate_series(0, %(max_lag)s) AS l(lag)
+        ) lagged
+        GROUP BY ticker_id, lag
+    ), lag_correlations AS (
+        SELECT
+            ticker_id,
+            array_agg(CASE WHEN points >= %(min_points)s THEN correlation END ORDER BY lag)
+                AS lag_correlations
+        FROM correlations
+        GROUP BY ticker_id
+    ), best_lags AS (
+        SELECT DISTINCT ON (ticker_id) ticker_id, lag AS best_lag, correlation AS best_correlation
+        FROM correlations
+        WHERE points >= %(min_points)s AND correlation IS NOT NULL
+        ORDER BY ticker_id, abs(correlation) DESC, lag
+    ), spikes AS (
+        SELECT
+            ticker_id,
+            mentions,
+            avg(mentions) OVER baseline AS baseline_mean,
+            stddev_samp(mentions) OVER baseline AS baseline_std,
+            lead(close, 1) OVER w / NULLIF(close, 0) - 1 AS return_next_hour,
+            lead(close, %(day_hours)s) OVER w / NULLIF(close, 0) - 1 AS return_next_day
+        FROM series
+        WINDOW w AS (PARTITION BY ticker_id ORDER BY hour),
+               baseline AS (w ROWS BETWEEN %(baseline_hours)s PRECEDING AND 1 PRECEDING)
+    ), spike_returns AS (
+        SELECT
+            ticker_id,
+            count(*) AS spikes,
+            avg(return_next_hour) AS return_after_spike_hour,
+            avg(return_next_day) AS return_after_spike_day
+        FROM spikes
+        WHERE mentions >= %(spike_min_mentions)s
+            AND mentions >= baseline_mean + %(spike_z)s * baseline_std
+        GROUP BY ticker_id
+    ), hype AS (
+        SELECT
+            ticker_id,
+            count(*) AS hours,
+            SUM(mentions) AS mentions,
+            SUM(mentions * volume)::double precision / NULLIF(SUM(volume), 0) AS vw_hype_score
+        FROM series
+        GROUP BY ticker_id
+    )
+    INSERT INTO ticker_analytics (analytics_date, ticker_id, price_hours, mentions, spikes,
+                                  return_after_spike_hour, return_after_spike_day,
+                                  vw_hype_score, lag_correlations, best_lag, best_correlation)
+    SELECT
+        %(day)s,
+        h.ticker_id,
+        h.hours,
+        h.mentions,
+        COALESCE(sr.spikes, 0),
+        sr.return_after_spike_hour,
+        sr.return_after_spike_day,
+        h.vw_hype_score,
+        lc.lag_correlations,
+        bl.best_lag,
+        bl.best_correlation
+    FROM hype h
+    LEFT JOIN spike_returns sr USING(ticker_id)
+    LEFT JOIN lag_correlations lc USING(ticker_id)
+    LEFT JOIN best_lags bl USING(ticker_id)
+    WHERE h.mentions > 0
+    ON CONFLICT (analytics_date, ticker_id) DO NOTHING;
+"""
+
+
+def get_analytics_config():
+    """Read analytics settings from config file."""
+    config = get_config_section("analytics")
+    return {
+        "enabled": config.get("enabled", "true").lower() == "true",
+        "window_days": int(config.get("window_days", 30)),
+        "max_lag": int(config.get("max_lag", 7)),
+        "min_points": int(config.get("min_points", 20)),
+        "baseline_hours": int(config.get("baseline_hours", 35)),
+        "spike_z": float(config.get("spike_z", 3)),
+        "spike_min_mentions": int(config.get("spike_min_mentions", 5)),
+        "day_hours": int(config.get("day_hours", 7)),
+        "keep_days": int(config.get("keep_days", 30)),
+        "check_hours": float(config.get("check_hours", 1)),
+    }
+
+
+def get_analytics_params(day, config):
+    """
+    Return parameters of ANALYTICS_SQL for analytics of day.
+
+    Args:
+    :day: UTC date of analytics
+    :config: dictionary from get_analytics_config
+    """
+    until = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return dict(config, day=day, until=until,
+                since=until - timedelta(days=config["window_days"]))
+
+
+def compute_ticker_analytics(day=None, config=None):
+    """
+    Compute analytics of window_days of complete UTC days before day, at most once per day.
+    Analytics older than keep_days are deleted.
+    Return number of tickers computed, 0 if already computed, None on error.
+
+    Args:
+    :day: UTC date of analytics, today if None
+    :config: dictionary from get_analytics_config, read from config file if None
+    """
+    config = config if config is not None else get_analytics_config()
+    day = day if day is not None else datetime.now(timezone.utc).date()
+    params = get_analytics_params(day, config)
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # one computation per day when several collectors run
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('ticker_analytics'));")
+            cur.execute("SELECT 1 FROM ticker_analytics WHERE analytics_date = %s LIMIT 1;",
+                        (day, ))
+            if cur.fetchone() is not None:
+                conn.rollback()
+                return 0
+            cur.execute(ANALYTICS_SQL, params)
+            computed = cur.rowcount
+            cur.execute("DELETE FROM ticker_analytics WHERE analytics_date < %s;",
+                        (day - timedelta(days=config["keep_days"]), ))
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't compute ticker analytics. Error: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
+    return computed
+
+
+def compute_analytics_forever(config=None):
+    """Compute analytics of new day, checked every check_hours, blocks forever."""
+    config = config if config is not None else get_analytics_config()
+    while True:
+        computed = compute_ticker_analytics(config=config)
+        if computed:
+            print(f"Ticker analytics computed for {computed} tickers.")
+        time.sleep(config["check_hours"] * 3600)
@@ -0,0 +1,182 @@
+"""Asyncpg versions of the inserts and queries used by the async collector."""
+
+from operator import attrgetter, itemgetter
+
+import asyncpg
+
+from src.aux_functions import get_config_section
+from src.database.cache import known_authors, known_sources, known_submissions
+from src.database.listeners import notify_new_mentions
+from src.database.rollups import HOURLY_ROLLUP_CTE
+
+
+async def create_async_pool():
+    """Create asyncpg connection pool from postgres config."""
+    config = get_config_section("postgres")
+    pool_config = get_config_section("postgres_pool")
+    return await asyncpg.create_pool(database=config.get("dbname"),
+                                     user=config.get("user"),
+                                     password=config.get("password"),
+                                     host=config.get("host"),
+                                     port=int(config.get("port", 5432)),
+                                     min_size=int(pool_config["minconn"]),
+                                     max_size=int(pool_config["maxconn"]),
+                                     server_settings={"timezone": "UTC"})
+
+
+def to_columns(rows, *keys):
+    """Return list of column arrays from list of dictionaries, one per key."""
+    return [[row[key] for row in rows] for key in keys]
+
+
+async def get_submission_checkpoint(pool, submission_id):
+    """
+    Get collection high-water mark for submission.
+    Return dictionary or None if submission not collected before.
+    """
+    sql = """
+    SELECT last_comment_timestamp, last_comment_id, nr_comments
+    FROM submission_checkpoint
+    WHERE submission_id = $1;
+    """
+    result = await pool.fetchrow(sql, submission_id)
+    if result is None:
+        return None
+    return dict(result)
+
+
+async def upsert_submission_checkpoint(pool, submission_id, last_comment_timestamp,
+                                       last_comment_id, nr_comments):
+    """
+    Insert or move forward collection high-water mark for submission.
+
+    Args:
+    :pool: asyncpg connection pool
+    :submission_id: string with submission_id
+    :last_comment_timestamp: timestamp UTC of newest comment seen, None keeps previous
+    :last_comment_id: string with id of newest comment seen, None keeps previous
+    :nr_comments: int with nr_comments of submission at collection
+    """
+    sql = """
+        INSERT INTO submission_checkpoint (submission_id, last_comment_timestamp,
+                                           last_comment_id, nr_comments)
+        VALUES($1, $2, $3, $4)
+        ON CONFLICT (submission_id) DO UPDATE
+            SET last_comment_timestamp = GREATEST(submission_checkpoint.last_comment_timestamp,
+                                                  EXCLUDED.last_comment_timestamp),
+                last_comment_id = CASE
+                    WHEN EXCLUDED.last_comment_timestamp
+                        >= submission_checkpoint.last_comment_timestamp
+                    THEN EXCLUDED.last_comment_id
+                    ELSE COALESCE(submission_checkpoint.last_comment_id,
+                                  EXCLUDED.last_comment_id) END,
+                nr_comments = EXCLUDED.nr_comments,
+                updated_at = now();
+    """
+    try:
+        await pool.execute(sql, submission_id, last_comment_timestamp,
+                           last_comment_id, nr_comments)
+    except Exception as e:
+        print(f"Couldn't update submission checkpoint. Error: {e}")
+
+
+async def insert_comment_batch(pool, submissions, ticker_comments):
+    """
+    Insert batch of submissions and ticker comments in a single transaction.
+    Rows are sent as arrays and unnested server side, duplicates are skipped.
+    Return dictionary with number of new rows per table or None on error.
+
+    Args:
+    :pool: asyncpg connection pool
+    :submissions: list of dictionaries with submission data
+    :ticker_comments: list of comment records with list of tickers
+    """
+    authors = {s["author_id"] for s in submissions}
+    authors.update(c.author_id for c in ticker_comments)
+
+    # skip rows already known to exist in db,
+    # rows sorted by key -> concurrent writers lock rows in the same order
+    sources = {s["source"]: s.get("source_name") for s in submissions}
+    new_sources = sorted(known_sources.missing(sources))
+    new_authors = sorted(known_authors.missing(authors))
+    new_submission_ids = known_submissions.missing({s["submission_id"] for s in submissions})
+    new_submissions = sorted((s for s in submissions if s["submission_id"] in new_submission_ids),
+                             key=itemgetter("submission_id"))
+    comments = sorted(ticker_comments, key=attrgetter("comment_id", "timestamp"))
+    mentions = sorted({(ticker, c.comment_id, c.timestamp)
+                       for c in ticker_comments for ticker in c.tickers})
+
+    # sources written before display names were stored get their name once
+    source_sql = """
+        INSERT INTO source (source, display_name)
+        SELECT * FROM unnest($1::text[], $2::text[])
+        ON CONFLICT (source) DO UPDATE SET display_name = EXCLUDED.display_name
+            WHERE source.display_name IS NULL
+        RETURNING source;
+    """
+    author_sql = """
+        INSERT INTO author (author_id)
+        SELECT * FROM unnest($1::text[])
+        ON CONFLICT DO NOTHING
+        RETURNING author_id;
+    """
+    submission_sql = """
+        INSERT INTO submission (submission_id, timestamp, score,
+                                nr_comments, author_id, source_id)
+        SELECT v.submission_id, v.timestamp, v.score,
+               v.nr_comments, v.author_id, s.source_id
+        FROM unnest($1::text[], $2::timestamptz[], $3::int[],
+                    $4::int[], $5::text[], $6::text[])
+            AS v(submission_id, timestamp, score, nr_comments, author_id, source)
+        INNER JOIN source s ON s.source = v.source
+        ORDER BY v.submission_id
+        ON CONFLICT DO NOTHING
+        RETURNING submission_id;
+    """
+    comment_sql = """
+        INSERT INTO comment (comment_id, timestamp, score, submission_id, author_id)
+        SELECT * FROM unnest($1::text[], $2::timestamptz[], $3::int[],
+                             $4::text[], $5::text[])
+        ON CONFLICT DO NOTHING
+        RETURNING comment_id;
+    """
+    # new mentions are added to hourly rollup in the same statement
+    mention_sql = f"""
+        WITH new_mention AS (
+            INSERT INTO ticker_mention (ticker_id, comment_id, comment_timestamp)
+            SELECT * FROM unnest($1::text[], $2::text[], $3::timestamptz[])
+            ON CONFLICT DO NOTHING
+            RETURNING mention_id, ticker_id, comment_id, comment_timestamp
+        ), {HOURLY_ROLLUP_CTE}
+        SELECT ticker_id, comment_timestamp FROM new_mention;
+    """
+    batches = [
+        ("sources", source_sql, [new_sources, [sources[source] for source in new_sources]]),
+        ("authors", author_sql, [new_authors]),
+        ("submissions", submission_sql,
+         to_columns(new_submissions, "submission_id", "timestamp", "score",
+                    "nr_comments", "author_id", "source")),
+        ("comments", comment_sql,
+         [[getattr(c, field) for c in comments]
+          for field in ("comment_id", "timestamp", "score", "submission_id", "author_id")]),
+        ("ticker_mentions", mention_sql,
+         [[m[0] for m in mentions], [m[1] for m in mentions], [m[2] for m in mentions]]),
+    ]
+    new_rows = {}
+    new_mentions = []
+    try:
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                for table, sql, args in batches:
+                    returned = await conn.fetch(sql, *args)
+                    new_rows[table] = len(returned)
+                new_mentions = [tuple(record) for record in returned]
+    except Exception as e:
+        print(f"Couldn't insert comment batch. Error: {e}")
+        return None
+    # all rows of batch exist in db after commit
+    known_sources.update(new_sources)
+    known_authors.update(new_authors)
+    known_submissions.update(new_submission_ids)
+    notify_new_mentions(new_mentions)
+    return new_rows
@@ -0,0 +1,216 @@
+"""Bulk loads to db with COPY FROM STDIN through staging tables."""
+
+from io import StringIO
+
+from src.database.partitions import create_partitions, get_partition_config, is_partitioned
+from src.database.pool import pooled_connection
+from src.database.rollups import HOURLY_ROLLUP_CTE
+
+
+# staging table columns and merge statements for each file backfill
+BACKFILLS = {
+    "submission": {
+        "columns": ["submission_id", "timestamp", "score",
+                    "nr_comments", "author_id", "source"],
+        "staging": """
+            CREATE TEMP TABLE submission_staging (
+                submission_id TEXT,
+                timestamp TIMESTAMPTZ,
+                score INT,
+                nr_comments INT,
+                author_id TEXT,
+                source TEXT
+            ) ON COMMIT DROP;
+        """,
+        "merge": [
+            """
+            INSERT INTO source (source)
+            SELECT DISTINCT source FROM submission_staging
+            WHERE source IS NOT NULL
+            ON CONFLICT DO NOTHING;
+            """,
+            """
+            INSERT INTO author (author_id)
+            SELECT DISTINCT author_id FROM submission_staging
+            WHERE author_id IS NOT NULL
+            ON CONFLICT DO NOTHING;
+            """,
+            """
+            INSERT INTO submission (submission_id, timestamp, score,
+                                    nr_comments, author_id, source_id)
+            SELECT DISTINCT ON (st.submission_id)
+                st.submission_id, st.timestamp, st.score,
+                st.nr_comments, st.author_id, s.source_id
+            FROM submission_staging st
+            INNER JOIN source s USING(source)
+            ON CONFLICT DO NOTHING;
+            """,
+        ],
+    },
+    "comment": {
+        "columns": ["comment_id", "timestamp", "score",
+                    "submission_id", "author_id"],
+        "staging": """
+            CREATE TEMP TABLE comment_staging (
+                comment_id TEXT,
+                timestamp TIMESTAMPTZ,
+                score INT,
+                submission_id TEXT,
+                author_id TEXT
+            ) ON COMMIT DROP;
+        """,
+        "merge": [
+            """
+            INSERT INTO author (author_id)
+            SELECT DISTINCT author_id FROM comment_staging
+            WHERE author_id IS NOT NULL
+            ON CONFLICT DO NOTHING;
+            """,
+            # comments of unknown submissions are skipped
+            """
+            INSERT INTO comment (comment_id, timestamp, score, submission_id, author_id)
+            SELECT DISTINCT ON (st.comment_id)
+                st.comment_id, st.timestamp, st.score, st.submission_id, st.author_id
+            FROM comment_staging st
+            INNER JOIN submission s USING(submission_id)
+            ON CONFLICT DO NOTHING;
+            """,
+        ],
+    },
+    "ticker_mention": {
+        "columns": ["ticker_id", "comment_id"],
+        "staging": """
+            CREATE TEMP TABLE ticker_mention_staging (
+                ticker_id TEXT,
+                comment_id TEXT
+            ) ON COMMIT DROP;
+        """,
+        "merge": [
+            # mentions of unknown tickers or comments are skipped,
+            # new mentions are added to hourly rollup
+            f"""
+            WITH new_mention AS (
+                INSERT INTO ticker_mention (ticker_id, comment_id, comment_timestamp)
+                SELECT DISTINCT st.ticker_id, st.comment_id, c.timestamp
+                FROM ticker_mention_staging st
+                INNER JOIN ticker t USING(ticker_id)
+                INNER JOIN comment c USING(comment_id)
+                ON CONFLICT DO NOTHING
+                RETURNING ticker_id, comment_id, comment_timestamp
+            ), {HOURLY_ROLLUP_CTE}
+            SELECT COUNT(*) FROM new_mention;
+            """,
+        ],
+    },
+}
+
+
+def copy_to_staging(cur, table, columns, file_obj, header=False):
+    """
+    Stream csv file object into table with COPY FROM STDIN.
+    Return number of copied rows.
+
+    Args:
+    :cur: psycopg2 cursor
+    :table: name of target table
+    :columns: list of column names in file order
+    :file_obj: file like object with csv data
+    :header: True if first line of file is header
+    """
+    sql = f"""
+        COPY {table} ({", ".join(columns)})
+        FROM STDIN WITH (FORMAT csv, HEADER {str(header).upper()});
+    """
+    cur.copy_expert(sql, file_obj)
+    return cur.rowcount
+
+
+def load_tickers(ticker_df):
+    """
+    Load ticker universe from dataframe with COPY and merge on ticker_id.
+    Existing tickers get updated company names.
+    Return dictionary with number of new and updated tickers or None on error.
+
+    Args:
+    :ticker_df: dataframe with columns [symbol, name]
+    """
+    buffer = StringIO()
+    ticker_df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    staging_sql = """
+        CREATE TEMP TABLE ticker_staging (
+            ticker_id TEXT,
+            company_name TEXT
+        ) ON COMMIT DROP;
+    """
+    merge_sql = """
+        INSERT INTO ticker (ticker_id, company_name)
+        SELECT DISTINCT ON (ticker_id)
+            ticker_id, left(COALESCE(company_name, ''), 200)
+        FROM ticker_staging
+        WHERE ticker_id IS NOT NULL AND length(ticker_id) <= 10
+        ON CONFLICT (ticker_id) DO UPDATE
+            SET company_name = EXCLUDED.company_name
+            WHERE ticker.company_name IS DISTINCT FROM EXCLUDED.company_name
+        RETURNING (xmax = 0) AS inserted;
+    """
+    result = None
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(staging_sql)
+            copy_to_staging(cur, "ticker_staging", ["ticker_id", "company_name"], buffer)
+            cur.execute(merge_sql)
+            inserted = [row[0] for row in cur.fetchall()]
+            conn.commit()
+            result = {"new": sum(inserted), "updated": len(inserted) - sum(inserted)}
+        except Exception as e:
+            print(f"Couldn't load control tickers. Error: {e}")
+            conn.rollback()
+        cur.close()
+    return result
+
+
+def backfill_from_file(table, file_path):
+    """
+    Backfill historical rows from csv file with header.
+    File columns must follow the order in BACKFILLS[table]["columns"].
+    Rows are copied to a staging table and merged in one transaction,
+    rows that already exist or miss their references are skipped.
+    Return dictionary with number of staged and new rows or None on error.
+
+    Args:
+    :table: submission, comment or ticker_mention
+    :file_path: path to csv file
+    """
+    backfill = BACKFILLS[table]
+    staging_table = f"{table}_staging"
+    result = None
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(backfill["staging"])
+            with open(file_path) as file_obj:
+                staged = copy_to_staging(cur, staging_table, backfill["columns"],
+                                         file_obj, header=True)
+            cur.execute(f"ANALYZE {staging_table};")
+            # partitions for backfilled history, rows outside them land in default partition
+            if table == "comment" and is_partitioned("comment"):
+                cur.execute("SELECT min(timestamp), max(timestamp) FROM comment_staging;")
+                first, last = cur.fetchone()
+                if first is not None:
+                    create_partitions(cur, first.date(), last.date(),
+                                      get_partition_config()["interval"])
+            for sql in backfill["merge"]:
+                cur.execute(sql)
+            # last merge statement writes target table,
+            # or counts written rows when it is a select
+            new = cur.fetchone()[0] if cur.description is not None else cur.rowcount
+            result = {"staged": staged, "new": new}
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't backfill {table} from {file_path}. Error: {e}")
+            conn.rollback()
+        cur.close()
+    return result
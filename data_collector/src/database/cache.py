@@ -0,0 +1,143 @@
+"""In-process LRU caches of rows already known to exist in db."""
+
+import threading
+from collections import OrderedDict
+
+from src.database.pool import pooled_connection
+
+
+class LRUCache:
+    """
+    Thread safe bounded set of keys, least recently used keys are evicted first.
+    Counts hits and misses of membership checks.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        with self.lock:
+            if key in self.keys:
+                self.keys.move_to_end(key)
+                self.hits += 1
+                return True
+            self.misses += 1
+            return False
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key):
+        """Add single key."""
+        self.update((key, ))
+
+    def update(self, keys):
+        """Add keys, evict least recently used keys above capacity."""
+        with self.lock:
+            for key in keys:
+                self.keys[key] = None
+                self.keys.move_to_end(key)
+            while len(self.keys) > self.capacity:
+                self.keys.popitem(last=False)
+
+    def discard(self, key):
+        """Remove single key if cached."""
+        with self.lock:
+            self.keys.pop(key, None)
+
+    def missing(self, keys):
+        """Return set of keys that are not cached."""
+        return {key for key in keys if key not in self}
+
+    def stats(self):
+        """Return dictionary with size, hits, misses and hit rate."""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.keys),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0,
+            }
+
+
+# ids known to exist in db, shared by all collectors of the process
+known_sources = LRUCache(100)
+known_authors = LRUCache(100000)
+known_submissions = LRUCache(10000)
+
+
+# recent ids read by warm_caches, explained by query_plans
+WARM_SOURCES_SQL = """
+    SELECT source FROM source
+    WHERE display_name IS NOT NULL
+    ORDER BY source_id LIMIT %s;
+"""
+
+WARM_AUTHORS_SQL = """
+    SELECT author_id FROM (
+        SELECT author_id, max(timestamp) AS last_seen
+        FROM comment
+        WHERE author_id IS NOT NULL
+        GROUP BY author_id
+        ORDER BY last_seen DESC
+        LIMIT %s
+    ) recent ORDER BY last_seen;
+"""
+
+WARM_SUBMISSIONS_SQL = """
+    SELECT submission_id FROM (
+        SELECT submission_id, timestamp
+        FROM submission
+        ORDER BY timestamp DESC
+        LIMIT %s
+    ) recent ORDER BY timestamp;
+"""
+
+
+def warm_caches(sources=100, authors=100000, submissions=10000):
+    """
+    Set cache capacities and fill caches with most recent ids from db.
+
+    Args:
+    :sources: capacity of source cache
+    :authors: capacity of author cache
+    :submissions: capacity of submission cache
+    """
+    known_sources.capacity = sources
+    known_authors.capacity = authors
+    known_submissions.capacity = submissions
+
+    # oldest first so most recent ids end up as most recently used
+    warmups = [
+        (known_sources, WARM_SOURCES_SQL, sources),
+        (known_authors, WARM_AUTHORS_SQL, authors),
+        (known_submissions, WARM_SUBMISSIONS_SQL, submissions),
+    ]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        for cache, sql, limit in warmups:
+            cur.execute(sql, (limit, ))
+            cache.update(row[0] for row in cur.fetchall())
+        cur.close()
+        conn.rollback()
+    print(f"Caches warmed. Sources: {len(known_sources)}, authors: {len(known_authors)}, "
+          f"submissions: {len(known_submissions)}")
+
+
+def cache_stats():
+    """Return dictionary with stats of all caches."""
+    return {
+        "sources": known_sources.stats(),
+        "authors": known_authors.stats(),
+        "submissions": known_submissions.stats(),
+    }
+
+
+def format_cache_stats():
+    """Return one line summary of cache hit rates."""
+    return ", ".join(f"{name}: {stats['hit_rate']:.0%} of {stats['hits'] + stats['misses']}"
+                     for name, stats in cache_stats().items())
@@ -1,41 +1,47 @@
 """All inserts to db."""
 
+from operator import itemgetter
+
 import psycopg2
+from psycopg2.extras import execute_values
 
-from src.database.models import get_db_connection
+from src.database.cache import known_authors, known_sources, known_submissions
+from src.database.listeners import notify_new_mentions
+from src.database.pool import pooled_connection
+from src.database.rollups import HOURLY_ROLLUP_CTE
 
 
-def insert_tickers(ticker_list):
+def insert_closing_price(price_list):
     """
-    Insert multiple new tickers to table.
+    Insert multiple new prices to table, prices of known ticker and timestamp
+    are updated. Return number of rows written or None on error.
 
     Args:
-    :ticker_list: [(ticker_id, company_name, )]
+    :price_list: [(ticker_id, timestamp, close_price, volume, )]
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
-        INSERT INTO ticker (ticker_id, company_name)
-        VALUES(%s, %s);
-    """
-    try:
-        cur.executemany(sql, ticker_list)
-        conn.commit()
-    except Exception as e:
-        print(f"Couldn't insert control tickers. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
-
-
-def insert_closing_price(price_list):
+        INSERT INTO price (ticker_id, timestamp, close_price, volume)
+        VALUES %s
+        ON CONFLICT (ticker_id, timestamp) DO UPDATE
+            SET close_price = EXCLUDED.close_price,
+                volume = EXCLUDED.volume;
     """
-    Insert multiple new prices to table.
-
-    Args:
-    :price_list: [(close_price, timestamp, )]
-    """
-    # TODO
+    if not price_list:
+        return 0
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # sorted keys -> concurrent writers lock rows in the same order
+            execute_values(cur, sql, sorted(price_list, key=lambda p: (p[0], p[1])),
+                           page_size=1000)
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't insert prices. Error: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
+    return len(price_list)
 
 
 def insert_source(source):
@@ -45,24 +51,28 @@ def insert_source(source):
     Args:
     :source: string with name of source
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # already written, skip round trip
+    if source in known_sources:
+        return
     sql = """
         INSERT INTO source (source)
         VALUES(%s);
     """
-    try:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
         try:
-            cur.execute(sql, (source, ))
-            conn.commit()
-        # Exception for duplicate record
-        except psycopg2.IntegrityError:
+            try:
+                cur.execute(sql, (source, ))
+                conn.commit()
+                known_sources.add(source)
+            # Exception for duplicate record
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                known_sources.add(source)
+        except Exception as e:
+            print(f"Couldn't insert new source. Error: {e}")
             conn.rollback()
-    except Exception as e:
-        print(f"Couldn't insert new source. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
+        cur.close()
 
 
 def insert_author(author_id):
@@ -72,24 +82,28 @@ def insert_author(author_id):
     Args:
     :author_id: string with id of author
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # already written, skip round trip
+    if author_id in known_authors:
+        return
     sql = """
         INSERT INTO author (author_id)
         VALUES(%s);
     """
-    try:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
         try:
-            cur.execute(sql, (author_id, ))
-            conn.commit()
-        # Exception for duplicate record
-        except psycopg2.IntegrityError:
+            try:
+                cur.execute(sql, (author_id, ))
+                conn.commit()
+                known_authors.add(author_id)
+            # Exception for duplicate record
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                known_authors.add(author_id)
+        except Exception as e:
+            print(f"Couldn't insert new author. Error: {e}")
             conn.rollback()
-    except Exception as e:
-        print(f"Couldn't insert new author. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
+        cur.close()
 
 
 def insert_submission(submission_id, timestamp, score,
@@ -106,27 +120,31 @@ def insert_submission(submission_id, timestamp, score,
     :author_id: string with author_id
     :source: string with source
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # already written, skip round trip
+    if submission_id in known_submissions:
+        return
     sql = """
         INSERT INTO submission (submission_id, timestamp, score,
                                 nr_comments, author_id, source_id)
         VALUES(%s, %s, %s, %s, %s,
             (SELECT source_id from source where source = %s));
     """
-    try:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
         try:
-            cur.execute(sql, (submission_id, timestamp, score,
-                              nr_comments, author_id, source, ))
-            conn.commit()
-        # Exception for duplicate record
-        except psycopg2.IntegrityError:
+            try:
+                cur.execute(sql, (submission_id, timestamp, score,
+                                  nr_comments, author_id, source, ))
+                conn.commit()
+                known_submissions.add(submission_id)
+            # Exception for duplicate record
+            except psycopg2.IntegrityError:
+                conn.rollback()
+                known_submissions.add(submission_id)
+        except Exception as e:
+            print(f"Couldn't insert new submission. Error: {e}")
             conn.rollback()
-    except Exception as e:
-        print(f"Couldn't insert new submission. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
+        cur.close()
 
 
 def insert_comment(comment_id, timestamp, score, submission_id, author_id):
@@ -141,24 +159,37 @@ def insert_comment(comment_id, timestamp, score, submission_id, author_id):
     :submission_id: string with submission_id
     :author_id: string with author_id
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
         INSERT INTO comment (comment_id, timestamp, score, submission_id, author_id)
         VALUES(%s, %s, %s, %s, %s);
     """
-    try:
+    with pooled_connection() as conn:
+        cur = conn.cursor()
         try:
-            cur.execute(sql, (comment_id, timestamp, score, submission_id, author_id, ))
-            conn.commit()
-        # Exception for duplicate record
-        except psycopg2.IntegrityError:
+            try:
+                cur.execute(sql, (comment_id, timestamp, score, submission_id, author_id, ))
+                conn.commit()
+            # Exception for duplicate record
+            except psycopg2.IntegrityError:
+                conn.rollback()
+        except Exception as e:
+            print(f"Couldn't insert new comment. Error: {e}")
             conn.rollback()
-    except Exception as e:
-        print(f"Couldn't insert new comment. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
+        cur.close()
+
+
+# new mention is added to hourly rollup in the same statement
+TICKER_MENTION_SQL = f"""
+    WITH new_mention AS (
+        INSERT INTO ticker_mention (ticker_id, comment_id, comment_timestamp)
+        SELECT %s, comment_id, timestamp
+        FROM comment
+        WHERE comment_id = %s
+        ON CONFLICT DO NOTHING
+        RETURNING ticker_id, comment_id, comment_timestamp
+    ), {HOURLY_ROLLUP_CTE}
+    SELECT ticker_id, comment_timestamp FROM new_mention;
+"""
 
 
 def insert_ticker_mention(ticker, comment_id):
@@ -170,21 +201,163 @@ def insert_ticker_mention(ticker, comment_id):
     :ticker: string with ticker
     :comment_id: string with comment_id
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            try:
+                cur.execute(TICKER_MENTION_SQL, (ticker, comment_id, ))
+                new_mentions = cur.fetchall()
+                conn.commit()
+                notify_new_mentions(new_mentions)
+            # Exception for duplicate record
+            except psycopg2.IntegrityError:
+                conn.rollback()
+        except Exception as e:
+            print(f"Couldn't insert new comment. Error: {e}")
+            conn.rollback()
+        cur.close()
+
+
+def upsert_submission_checkpoint(submission_id, last_comment_timestamp,
+                                 last_comment_id, nr_comments):
+    """
+    Insert or move forward collection high-water mark for submission.
+
+    Args:
+    :submission_id: string with submission_id
+    :last_comment_timestamp: timestamp UTC of newest comment seen, None keeps previous
+    :last_comment_id: string with id of newest comment seen, None keeps previous
+    :nr_comments: int with nr_comments of submission at collection
+    """
     sql = """
-        INSERT INTO ticker_mention (ticker_id, comment_id)
-        VALUES(%s, %s);
+        INSERT INTO submission_checkpoint (submission_id, last_comment_timestamp,
+                                           last_comment_id, nr_comments)
+        VALUES(%s, %s, %s, %s)
+        ON CONFLICT (submission_id) DO UPDATE
+            SET last_comment_timestamp = GREATEST(submission_checkpoint.last_comment_timestamp,
+                                                  EXCLUDED.last_comment_timestamp),
+                last_comment_id = CASE
+                    WHEN EXCLUDED.last_comment_timestamp
+                        >= submission_checkpoint.last_comment_timestamp
+                    THEN EXCLUDED.last_comment_id
+                    ELSE COALESCE(submission_checkpoint.last_comment_id,
+                                  EXCLUDED.last_comment_id) END,
+                nr_comments = EXCLUDED.nr_comments,
+                updated_at = now();
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(sql, (submission_id, last_comment_timestamp,
+                              last_comment_id, nr_comments, ))
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't update submission checkpoint. Error: {e}")
+            conn.rollback()
+        cur.close()
+
+
+def insert_comment_batch(submissions, ticker_comments):
+    """
+    Insert batch of submissions and ticker comments in a single transaction.
+    Duplicates are skipped with ON CONFLICT DO NOTHING.
+    Return dictionary with number of new rows per table or None on error.
+
+    Args:
+    :submissions: list of dictionaries with submission data
+    :ticker_comments: list of comment records with list of tickers
+    """
+    sources = {s["source"]: s.get("source_name") for s in submissions}
+    authors = {s["author_id"] for s in submissions}
+    authors.update(c.author_id for c in ticker_comments)
+    submission_ids = {s["submission_id"] for s in submissions}
+
+    # skip rows already known to exist in db
+    new_sources = known_sources.missing(sources)
+    new_authors = known_authors.missing(authors)
+    new_submission_ids = known_submissions.missing(submission_ids)
+    # rows sorted by key -> concurrent writers lock rows in the same order
+    source_rows = [(source, sources[source]) for source in sorted(new_sources)]
+    author_rows = [(author_id, ) for author_id in sorted(new_authors)]
+    submission_rows = sorted([(s["submission_id"], s["timestamp"], s["score"],
+                               s["nr_comments"], s["author_id"], s["source"])
+                              for s in submissions if s["submission_id"] in new_submission_ids],
+                             key=itemgetter(0))
+    comment_rows = sorted([(c.comment_id, c.timestamp, c.score,
+                            c.submission_id, c.author_id)
+                           for c in ticker_comments], key=itemgetter(0, 1))
+    mention_rows = sorted({(ticker, c.comment_id, c.timestamp)
+                           for c in ticker_comments for ticker in c.tickers})
+
+    # sources written before display names were stored get their name once
+    source_sql = """
+        INSERT INTO source (source, display_name)
+        VALUES %s
+        ON CONFLICT (source) DO UPDATE SET display_name = EXCLUDED.display_name
+            WHERE source.display_name IS NULL
+        RETURNING source;
+    """
+    author_sql = """
+        INSERT INTO author (author_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+        RETURNING author_id;
+    """
+    submission_sql = """
+        INSERT INTO submission (submission_id, timestamp, score,
+                                nr_comments, author_id, source_id)
+        SELECT v.submission_id, v.timestamp, v.score,
+               v.nr_comments, v.author_id, s.source_id
+        FROM (VALUES %s) AS v(submission_id, timestamp, score,
+                              nr_comments, author_id, source)
+        INNER JOIN source s ON s.source = v.source
+        ORDER BY v.submission_id
+        ON CONFLICT DO NOTHING
+        RETURNING submission_id;
+    """
+    comment_sql = """
+        INSERT INTO comment (comment_id, timestamp, score, submission_id, author_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+        RETURNING comment_id;
+    """
+    # new mentions are added to hourly rollup in the same statement
+    mention_sql = f"""
+        WITH new_mention AS (
+            INSERT INTO ticker_mention (ticker_id, comment_id, comment_timestamp)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+            RETURNING mention_id, ticker_id, comment_id, comment_timestamp
+        ), {HOURLY_ROLLUP_CTE}
+        SELECT ticker_id, comment_timestamp FROM new_mention;
     """
-    try:
+    new_rows = {"sources": 0, "authors": 0, "submissions": 0,
+                "comments": 0, "ticker_mentions": 0}
+    batches = [("sources", source_sql, source_rows),
+               ("authors", author_sql, author_rows),
+               ("submissions", submission_sql, submission_rows),
+               ("comments", comment_sql, comment_rows),
+               ("ticker_mentions", mention_sql, mention_rows)]
+    new_mentions = []
+    with pooled_connection() as conn:
+        cur = conn.cursor()
         try:
-            cur.execute(sql, (ticker, comment_id, ))
+            for table, sql, rows in batches:
+                if rows:
+                    returned = execute_values(cur, sql, rows, page_size=1000, fetch=True)
+                    new_rows[table] = len(returned)
+            # returned rows of last batch -> (ticker_id, comment_timestamp) of new mentions
+            if mention_rows:
+                new_mentions = returned
             conn.commit()
-        # Exception for duplicate record
-        except psycopg2.IntegrityError:
+            # all rows of batch exist in db after commit
+            known_sources.update(new_sources)
+            known_authors.update(new_authors)
+            known_submissions.update(new_submission_ids)
+            notify_new_mentions(new_mentions)
+        except Exception as e:
+            print(f"Couldn't insert comment batch. Error: {e}")
             conn.rollback()
-    except Exception as e:
-        print(f"Couldn't insert new comment. Error: {e}")
-        conn.rollback()
-    cur.close()
-    conn.close()
+            new_rows = None
+        cur.close()
+    return new_rows
@@ -0,0 +1,32 @@
+"""Listeners called with new ticker mentions after they are committed."""
+
+
+# functions taking list of (ticker_id, comment_timestamp) of new mentions
+mention_listeners = []
+
+
+def add_mention_listener(listener):
+    """
+    Register function called with new mentions of every committed mention write.
+
+    Args:
+    :listener: function taking list of (ticker_id, comment_timestamp)
+    """
+    mention_listeners.append(listener)
+
+
+def notify_new_mentions(mentions):
+    """
+    Call mention listeners with new mentions, errors of listeners are printed
+    and never fail the write.
+
+    Args:
+    :mentions: list of (ticker_id, comment_timestamp)
+    """
+    if not mentions:
+        return
+    for listener in mention_listeners:
+        try:
+            listener(mentions)
+        except Exception as e:
+            print(f"Couldn't update mention listener. Error: {e}")
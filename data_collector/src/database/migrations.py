@@ -0,0 +1,121 @@
+"""Versioned schema migrations applied on top of the tables from create_db."""
+
+from src.database.pool import pooled_connection
+
+
+# (version, description, sql) in apply order, never edit an applied migration,
+# add a new one instead
+MIGRATIONS = [
+    (1, "comment timestamp on ticker mentions", """
+        ALTER TABLE ticker_mention ADD COLUMN IF NOT EXISTS comment_timestamp TIMESTAMPTZ;
+        UPDATE ticker_mention tm
+        SET comment_timestamp = c.timestamp
+        FROM comment c
+        WHERE c.comment_id = tm.comment_id AND tm.comment_timestamp IS NULL;
+    """),
+    (2, "indexes for time windows and joins", """
+        CREATE INDEX IF NOT EXISTS idx_comment_timestamp ON comment (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_comment_submission_id ON comment (submission_id);
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_comment_id ON ticker_mention (comment_id);
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_ticker_timestamp
+            ON ticker_mention (ticker_id, comment_timestamp);
+        CREATE INDEX IF NOT EXISTS idx_submission_timestamp ON submission (timestamp);
+    """),
+    (3, "hour index on hourly rollup", """
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_hourly_hour
+            ON ticker_mention_hourly (hour);
+    """),
+    (4, "change time on hourly rollup for incremental reads", """
+        ALTER TABLE ticker_mention_hourly
+            ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_hourly_updated_at
+            ON ticker_mention_hourly (updated_at);
+    """),
+    (5, "source and hour index on hourly rollup for dashboard filters", """
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_hourly_source_hour
+            ON ticker_mention_hourly (source_id, hour);
+    """),
+    (6, "price table for intraday prices", """
+        CREATE SEQUENCE IF NOT EXISTS price_price_id_seq OWNED BY price.price_id;
+        ALTER TABLE price ALTER COLUMN price_id SET DEFAULT nextval('price_price_id_seq');
+        ALTER TABLE price ALTER COLUMN ticker_id SET NOT NULL;
+        ALTER TABLE price ALTER COLUMN close_price TYPE NUMERIC(14, 4);
+        ALTER TABLE price ALTER COLUMN timestamp TYPE TIMESTAMPTZ
+            USING timestamp AT TIME ZONE 'UTC';
+        ALTER TABLE price ADD COLUMN IF NOT EXISTS volume BIGINT;
+        CREATE UNIQUE INDEX IF NOT EXISTS price_ticker_id_timestamp_key
+            ON price (ticker_id, timestamp);
+    """),
+    (7, "ticker and hour index on hourly rollup for price analytics", """
+        CREATE INDEX IF NOT EXISTS idx_ticker_mention_hourly_ticker_hour
+            ON ticker_mention_hourly (ticker_id, hour);
+    """),
+    (8, "subreddit display name of sources", """
+        ALTER TABLE source ADD COLUMN IF NOT EXISTS display_name VARCHAR(200);
+    """),
+]
+
+# any constant, serializes migrations of processes started at the same time
+MIGRATION_LOCK_ID = 52019
+
+
+def create_migration_table(cur):
+    """Create table with applied schema versions."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(200) NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """)
+
+
+def get_schema_version():
+    """Return highest applied migration version, 0 if none."""
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        create_migration_table(cur)
+        cur.execute("SELECT COALESCE(max(version), 0) FROM schema_migrations;")
+        version = cur.fetchone()[0]
+        cur.close()
+        conn.commit()
+    return version
+
+
+def migrate():
+    """
+    Apply pending migrations in version order, each in its own transaction
+    together with its schema_migrations record.
+    Return list of applied versions.
+    """
+    applied = []
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        create_migration_table(cur)
+        conn.commit()
+        cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID, ))
+        try:
+            cur.execute("SELECT version FROM schema_migrations;")
+            done = {row[0] for row in cur.fetchall()}
+            conn.commit()
+            for version, description, sql in MIGRATIONS:
+                if version in done:
+                    continue
+                print(f"Applying migration {version}: {description}...")
+                try:
+                    cur.execute(sql)
+                    cur.execute("""
+                        INSERT INTO schema_migrations (version, description)
+                        VALUES(%s, %s);
+                    """, (version, description, ))
+                    conn.commit()
+                    applied.append(version)
+                except Exception as e:
+                    print(f"Couldn't apply migration {version}. Error: {e}")
+                    conn.rollback()
+                    break
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID, ))
+            conn.commit()
+            cur.close()
+    return applied
@@ -1,41 +1,28 @@
 """All db models for the project."""
 
-import psycopg2
-
-from src.aux_functions import get_config_section
-
-
-def get_db_connection():
-    """
-    Connecto to database connection to a PostgreSQL database.
-    :return: Connection object or None
-    """
-    # open config file
-    config = get_config_section("postgres")
-    conn = None
-    try:
-        conn = psycopg2.connect(**config)       # connect to server
-    except (psycopg2.DatabaseError) as error:
-        print(f"Couldn't connect to database. Error: {error}")
-    return conn
+from src.database.migrations import migrate
+from src.database.partitions import (create_default_partitions, get_partition_config,
+                                     is_partitioned, maintain_partitions)
+from src.database.pool import pooled_connection
+from src.database.rollups import init_ticker_mention_hourly
 
 
 def create_table(sql):
     """Create a postgres table."""
-    conn = get_db_connection()      # connection
-    cur = conn.cursor()             # get cursor
-    cur.execute(sql)                # execution
-    cur.close()                     # close communication
-    conn.commit()                   # commit the changes
+    with pooled_connection() as conn:   # connection from pool
+        cur = conn.cursor()             # get cursor
+        cur.execute(sql)                # execution
+        cur.close()                     # close communication
+        conn.commit()                   # commit the changes
 
 
 def set_timezone():
     """Set UTC timezone for database."""
-    conn = get_db_connection()              # connection
-    cur = conn.cursor()                     # get cursor
-    cur.execute("SET timezone = 'UTC';")   # execution
-    cur.close()                             # close communication
-    conn.commit()                           # commit the changes
+    with pooled_connection() as conn:           # connection from pool
+        cur = conn.cursor()                     # get cursor
+        cur.execute("SET timezone = 'UTC';")   # execution
+        cur.close()                             # close communication
+        conn.commit()                           # commit the changes
 
 
 def create_ticker_table():
@@ -55,13 +42,16 @@ def create_price_table():
     """Create ticker price table. Unique price per ticker and timestamp."""
     sql = """
     CREATE TABLE IF NOT EXISTS price (
-        price_id INT PRIMARY KEY,
-        ticker_id VARCHAR(10),
-        close_price NUMERIC(4) NOT NULL,
-        timestamp TIMESTAMP NOT NULL,
+        price_id SERIAL PRIMARY KEY,
+        ticker_id VARCHAR(10) NOT NULL,
+        close_price NUMERIC(14, 4) NOT NULL,
+        volume BIGINT,
+        timestamp TIMESTAMPTZ NOT NULL,
         CONSTRAINT fk_ticker_id
             FOREIGN KEY(ticker_id)
-                REFERENCES ticker(ticker_id)
+                REFERENCES ticker(ticker_id),
+        CONSTRAINT price_ticker_id_timestamp_key
+            UNIQUE (ticker_id, timestamp)
     );
     """
     return create_table(sql)
@@ -75,6 +65,7 @@ def create_source_table():
     CREATE TABLE IF NOT EXISTS source (
         source_id SERIAL PRIMARY KEY,
         source VARCHAR(200) NOT NULL,
+        display_name VARCHAR(200),
         UNIQUE (source)
     );
     """
@@ -132,16 +123,42 @@ def create_comment_table():
     return create_table(sql)
 
 
+def create_partitioned_comment_table():
+    """
+    Create reddit comment table range partitioned on comment timestamp.
+    Primary key includes timestamp as required for partitioned tables.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS comment (
+        comment_id VARCHAR(20) NOT NULL,
+        timestamp TIMESTAMPTZ NOT NULL,
+        score INT NOT NULL,
+        author_id VARCHAR(20),
+        submission_id VARCHAR(20),
+        CONSTRAINT fk_comment_author_id
+            FOREIGN KEY(author_id)
+                REFERENCES author(author_id),
+        CONSTRAINT fk_submission_id
+            FOREIGN KEY(submission_id)
+                REFERENCES submission(submission_id),
+        PRIMARY KEY (comment_id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    """
+    return create_table(sql)
+
+
 def create_ticker_mention_table():
     """
     Create table that track all ticker mentions from comments.
     Only allow one record per combination of ticker and comment_id.
+    Timestamp of comment is kept with mention.
     """
     sql = """
     CREATE TABLE IF NOT EXISTS ticker_mention (
         mention_id SERIAL PRIMARY KEY,
         ticker_id VARCHAR(10),
         comment_id VARCHAR(20),
+        comment_timestamp TIMESTAMPTZ,
         CONSTRAINT fk_ticker_id
             FOREIGN KEY(ticker_id)
                 REFERENCES ticker(ticker_id),
@@ -154,20 +171,191 @@ def create_ticker_mention_table():
     return create_table(sql)
 
 
+def create_partitioned_ticker_mention_table():
+    """
+    Create ticker mention table range partitioned on comment timestamp,
+    so mentions and their comments share partition boundaries.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS ticker_mention (
+        mention_id SERIAL,
+        ticker_id VARCHAR(10),
+        comment_id VARCHAR(20) NOT NULL,
+        comment_timestamp TIMESTAMPTZ NOT NULL,
+        CONSTRAINT fk_ticker_id
+            FOREIGN KEY(ticker_id)
+                REFERENCES ticker(ticker_id),
+        CONSTRAINT fk_comment_id
+            FOREIGN KEY(comment_id, comment_timestamp)
+                REFERENCES comment(comment_id, timestamp),
+        PRIMARY KEY (mention_id, comment_timestamp),
+        UNIQUE (ticker_id, comment_id, comment_timestamp)
+    ) PARTITION BY RANGE (comment_timestamp);
+    """
+    return create_table(sql)
+
+
+def create_submission_checkpoint_table():
+    """
+    Create table with collection high-water mark per submission.
+    Holds newest comment seen and nr of comments at last pass.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS submission_checkpoint (
+        submission_id VARCHAR(20) PRIMARY KEY,
+        last_comment_timestamp TIMESTAMPTZ,
+        last_comment_id VARCHAR(20),
+        nr_comments INT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """
+    return create_table(sql)
+
+
+def create_ticker_mention_hourly_table():
+    """
+    Create hourly rollup of ticker mentions per source.
+    Hour is the UTC hour of the comment, updated with every mention batch.
+    updated_at marks changed rows for incremental reads.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS ticker_mention_hourly (
+        ticker_id VARCHAR(10) NOT NULL,
+        source_id INT NOT NULL,
+        hour TIMESTAMPTZ NOT NULL,
+        mention_count INT NOT NULL,
+        score_sum BIGINT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT fk_hourly_ticker_id
+            FOREIGN KEY(ticker_id)
+                REFERENCES ticker(ticker_id),
+        CONSTRAINT fk_hourly_source_id
+            FOREIGN KEY(source_id)
+                REFERENCES source(source_id),
+        PRIMARY KEY (ticker_id, source_id, hour)
+    );
+    """
+    return create_table(sql)
+
+
+def create_alert_table():
+    """
+    Create table with hype alerts of alert engine.
+    One alert per ticker and UTC hour, with the baseline it was compared to.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS alert (
+        alert_id SERIAL PRIMARY KEY,
+        ticker_id VARCHAR(10) NOT NULL,
+        hour TIMESTAMPTZ NOT NULL,
+        mention_count INT NOT NULL,
+        baseline_mean DOUBLE PRECISION NOT NULL,
+        baseline_std DOUBLE PRECISION NOT NULL,
+        z_score DOUBLE PRECISION NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT fk_alert_ticker_id
+            FOREIGN KEY(ticker_id)
+                REFERENCES ticker(ticker_id),
+        UNIQUE (ticker_id, hour)
+    );
+    """
+    return create_table(sql)
+
+
+def create_trending_ticker_table():
+    """Create table with top tickers per sliding window, replaced every refresh."""
+    sql = """
+    CREATE TABLE IF NOT EXISTS trending_ticker (
+        time_window VARCHAR(5) NOT NULL,
+        rank INT NOT NULL,
+        ticker_id VARCHAR(10) NOT NULL,
+        mention_count INT NOT NULL,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT fk_trending_ticker_id
+            FOREIGN KEY(ticker_id)
+                REFERENCES ticker(ticker_id),
+        PRIMARY KEY (time_window, rank)
+    );
+    """
+    return create_table(sql)
+
+
+def create_ticker_analytics_table():
+    """
+    Create table with daily mention vs price analytics per ticker.
+    lag_correlations holds correlation of mentions with returns 0..max_lag price hours later.
+    """
+    sql = """
+    CREATE TABLE IF NOT EXISTS ticker_analytics (
+        analytics_date DATE NOT NULL,
+        ticker_id VARCHAR(10) NOT NULL,
+        price_hours INT NOT NULL,
+        mentions BIGINT NOT NULL,
+        spikes INT NOT NULL,
+        return_after_spike_hour DOUBLE PRECISION,
+        return_after_spike_day DOUBLE PRECISION,
+        vw_hype_score DOUBLE PRECISION,
+        lag_correlations DOUBLE PRECISION[],
+        best_lag INT,
+        best_correlation DOUBLE PRECISION,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        CONSTRAINT fk_analytics_ticker_id
+            FOREIGN KEY(ticker_id)
+                REFERENCES ticker(ticker_id),
+        PRIMARY KEY (analytics_date, ticker_id)
+    );
+    """
+    return create_table(sql)
+
+
+def create_comment_and_mention_tables():
+    """
+    Create comment and ticker_mention tables, range partitioned if set in
+    [schema] config. Existing tables are not converted between modes.
+    """
+    config = get_partition_config()
+    if not config["partitioned"]:
+        create_comment_table()
+        create_ticker_mention_table()
+        return
+
+    # existing unpartitioned tables stay as they are
+    if False in (is_partitioned("comment"), is_partitioned("ticker_mention")):
+        print("Comment tables already exist unpartitioned, keeping them. "
+              "Export and recreate them to partition.")
+        create_comment_table()
+        create_ticker_mention_table()
+        return
+    create_partitioned_comment_table()
+    create_partitioned_ticker_mention_table()
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        create_default_partitions(cur)
+        cur.close()
+        conn.commit()
+    maintain_partitions(config)
+
+
 def create_db():
-    """Create all tables if not already exists."""
+    """Create all tables if not already exists and apply pending migrations."""
     set_timezone()
     create_ticker_table()
     create_price_table()
     create_source_table()
     create_author_table()
     create_submission_table()
-    create_comment_table()
-    create_ticker_mention_table()
+    create_comment_and_mention_tables()
+    create_submission_checkpoint_table()
+    create_ticker_mention_hourly_table()
+    create_alert_table()
+    create_trending_ticker_table()
+    create_ticker_analytics_table()
+    migrate()
+    init_ticker_mention_hourly()
 
 
 def drop_table():
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """DROP TABLE ticker_mentions;"""
-    cur.execute(sql)
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
@@ -0,0 +1,206 @@
+"""Time range partitions of comment and ticker_mention tables with retention."""
+
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+
+from src.aux_functions import get_config_section
+from src.database.pool import pooled_connection
+
+
+# partitioned tables and their partition key, referenced table first
+PARTITION_KEYS = {
+    "comment": "timestamp",
+    "ticker_mention": "comment_timestamp",
+}
+
+
+def get_partition_config():
+    """Read schema settings from config file and return as dictionary."""
+    config = get_config_section("schema")
+    return {
+        "partitioned": config.get("partitioned", "false").lower() == "true",
+        "interval": config.get("partition_interval", "day"),
+        "premake": int(config.get("premake_partitions", 7)),
+        "retention_days": int(config.get("retention_days", 0)),
+        "archive_dir": config.get("archive_dir") or None,
+        "maintenance_hours": float(config.get("maintenance_hours", 6)),
+    }
+
+
+def is_partitioned(table):
+    """Return True if table is partitioned, False if not and None if it doesn't exist."""
+    sql = """
+    SELECT relkind = 'p'
+    FROM pg_class
+    WHERE relname = %s AND relnamespace = 'public'::regnamespace;
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (table, ))
+        result = cur.fetchone()
+        cur.close()
+        conn.rollback()
+    if result is None:
+        return None
+    return result[0]
+
+
+def period_start(day, interval):
+    """Return first day of day or week partition that holds day."""
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def period_end(start, interval):
+    """Return first day after partition that starts at start."""
+    return start + timedelta(days=7 if interval == "week" else 1)
+
+
+def create_default_partitions(cur):
+    """Create partitions for rows outside all ranges so inserts never fail."""
+    for table in PARTITION_KEYS:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+
+
+def create_partitions(cur, first_day, last_day, interval):
+    """
+    Create missing partitions of all partitioned tables from first_day to last_day.
+    Periods whose rows already landed in default partition are left there.
+    Return number of created partitions.
+
+    Args:
+    :cur: psycopg2 cursor
+    :first_day: date of first day to cover
+    :last_day: date of last day to cover
+    :interval: day or week
+    """
+    created = 0
+    start = period_start(first_day, interval)
+    while start <= last_day:
+        end = period_end(start, interval)
+        for table in PARTITION_KEYS:
+            name = f"{table}_p{start:%Y%m%d}"
+            cur.execute("SELECT to_regclass(%s);", (name, ))
+            if cur.fetchone()[0] is not None:
+                continue
+            sql = f"""
+                CREATE TABLE {name} PARTITION OF {table}
+                FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00');
+            """
+            cur.execute("SAVEPOINT create_partition;")
+            try:
+                cur.execute(sql)
+                cur.execute("RELEASE SAVEPOINT create_partition;")
+                created += 1
+            except Exception as e:
+                print(f"Couldn't create partition {name}. Error: {e}")
+                cur.execute("ROLLBACK TO SAVEPOINT create_partition;")
+        start = end
+    return created
+
+
+def get_partitions(cur, table):
+    """
+    Return list of tuples (partition name, upper bound date) of range partitions.
+
+    Args:
+    :cur: psycopg2 cursor
+    :table: name of partitioned table
+    """
+    sql = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+    FROM pg_inherits i
+    INNER JOIN pg_class c ON c.oid = i.inhrelid
+    INNER JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = %s;
+    """
+    cur.execute(sql, (table, ))
+    partitions = []
+    for name, bound in cur.fetchall():
+        # bounds are whole UTC days -> FOR VALUES FROM ('...') TO ('2021-01-02 00:00:00+00')
+        upper = re.search(r"TO \('(\d{4}-\d{2}-\d{2})", bound)
+        if upper is not None:
+            partitions.append((name, datetime.strptime(upper.group(1), "%Y-%m-%d").date()))
+    return partitions
+
+
+def archive_rows(cur, sql, file_path):
+    """Write result of select to csv file with header."""
+    with open(file_path, "w") as file_obj:
+        cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER TRUE);", file_obj)
+
+
+def drop_expired_partitions(cur, cutoff, archive_dir=None):
+    """
+    Drop partitions that only hold rows older than cutoff and delete expired
+    rows from default partitions. Mentions go before the comments they reference.
+    Rows are written to csv files in archive_dir first if given.
+    Return list of dropped partitions.
+
+    Args:
+    :cur: psycopg2 cursor
+    :cutoff: date, rows before this day are expired
+    :archive_dir: directory for csv archives or None to drop without archive
+    """
+    dropped = []
+    for table in reversed(list(PARTITION_KEYS)):
+        for name, upper in sorted(get_partitions(cur, table)):
+            if upper > cutoff:
+                continue
+            if archive_dir is not None:
+                archive_rows(cur, f"SELECT * FROM {name}", os.path.join(archive_dir, f"{name}.csv"))
+            # detach first, partitions of referenced tables can't be dropped attached
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+            cur.execute(f"DROP TABLE {name};")
+            dropped.append(name)
+
+        # stragglers in default partition
+        key = PARTITION_KEYS[table]
+        expired = f"{key} < '{cutoff} 00:00:00+00'"
+        if archive_dir is not None:
+            archive_rows(cur, f"SELECT * FROM {table}_default WHERE {expired}",
+                         os.path.join(archive_dir, f"{table}_default_{cutoff:%Y%m%d}.csv"))
+        cur.execute(f"DELETE FROM {table}_default WHERE {expired};")
+    return dropped
+
+
+def maintain_partitions(config=None):
+    """
+    Create partitions for coming periods and apply retention.
+    Does nothing unless comment and ticker_mention are partitioned.
+
+    Args:
+    :config: dictionary from get_partition_config, read from file if None
+    """
+    config = config or get_partition_config()
+    if not (config["partitioned"] and all(is_partitioned(t) for t in PARTITION_KEYS)):
+        return
+    today = datetime.now(timezone.utc).date()
+    last_day = period_start(today, config["interval"]) + \
+        timedelta(days=(7 if config["interval"] == "week" else 1) * config["premake"])
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            # start a period back so late comments of the last period are covered
+            created = create_partitions(cur, today - timedelta(days=1), last_day,
+                                        config["interval"])
+            dropped = []
+            if config["retention_days"] > 0:
+                cutoff = today - timedelta(days=config["retention_days"])
+                dropped = drop_expired_partitions(cur, cutoff, config["archive_dir"])
+            conn.commit()
+            print(f"Partitions created: {created}, dropped: {len(dropped)}")
+        except Exception as e:
+            print(f"Couldn't maintain partitions. Error: {e}")
+            conn.rollback()
+        cur.close()
+
+
+def maintain_partitions_forever(hours):
+    """Run partition maintenance every hours, blocks forever."""
+    while True:
+        time.sleep(hours * 3600)
+        maintain_partitions()
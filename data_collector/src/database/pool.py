@@ -0,0 +1,135 @@
+"""Shared postgres connection pool for the data collector."""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+
+from src.aux_functions import get_config_section
+
+
+# module level pool, created on first use
+_db_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = None
+_last_used = {}
+_health_check_interval = 30
+
+
+def get_pool_config():
+    """
+    Read connection and pool settings from config file once.
+    Return tuple with (connection config, pool config).
+    """
+    db_config = get_config_section("postgres")
+    pool_config = get_config_section("postgres_pool")
+    pool_config = {
+        "minconn": int(pool_config.get("minconn", 2)),
+        "maxconn": int(pool_config.get("maxconn", 5)),
+        "health_check_interval": int(pool_config.get("health_check_interval", 30)),
+        "connect_retries": int(pool_config.get("connect_retries", 3)),
+    }
+    return db_config, pool_config
+
+
+def get_pool():
+    """Return shared connection pool, create it if not already created."""
+    global _db_pool, _pool_slots, _health_check_interval
+    with _pool_lock:
+        if _db_pool is None or _db_pool.closed:
+            db_config, pool_config = get_pool_config()
+            # every pooled session runs in UTC
+            db_config.setdefault("options", "-c timezone=UTC")
+            _health_check_interval = pool_config["health_check_interval"]
+            _db_pool = pool.ThreadedConnectionPool(pool_config["minconn"],
+                                                   pool_config["maxconn"],
+                                                   **db_config)
+            # block callers when all connections are checked out
+            _pool_slots = threading.BoundedSemaphore(pool_config["maxconn"])
+            _db_pool.connect_retries = pool_config["connect_retries"]
+            _last_used.clear()
+    return _db_pool
+
+
+def close_pool():
+    """Close all connections in shared pool."""
+    global _db_pool
+    with _pool_lock:
+        if _db_pool is not None and not _db_pool.closed:
+            _db_pool.closeall()
+        _db_pool = None
+        _last_used.clear()
+
+
+def check_connection(conn):
+    """
+    Check if connection is still usable.
+    Connections used recently are trusted without a round trip.
+
+    Args:
+    :conn: psycopg2 connection object
+    """
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is not None and time.monotonic() - last_used < _health_check_interval:
+        return True
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1;")
+        cur.close()
+        conn.rollback()
+    except psycopg2.Error:
+        return False
+    return True
+
+
+def checkout_connection(db_pool):
+    """
+    Get healthy connection from pool.
+    Broken connections are discarded and replaced with new ones.
+
+    Args:
+    :db_pool: psycopg2 connection pool
+    """
+    attempt = 0
+    while True:
+        try:
+            conn = db_pool.getconn()
+        except psycopg2.OperationalError as error:
+            attempt += 1
+            print(f"Couldn't connect to database. Error: {error}")
+            if attempt >= db_pool.connect_retries:
+                raise
+            time.sleep(attempt)
+            continue
+        if check_connection(conn):
+            return conn
+        # drop broken connection, pool opens a fresh one on next getconn
+        print("Database connection lost. Reconnecting...")
+        _last_used.pop(id(conn), None)
+        db_pool.putconn(conn, close=True)
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Context manager that lends a connection from the shared pool.
+    Connection is returned to pool when block exits, open transactions
+    are rolled back and broken connections are closed.
+    """
+    db_pool = get_pool()
+    _pool_slots.acquire()
+    conn = None
+    try:
+        conn = checkout_connection(db_pool)
+        yield conn
+    finally:
+        if conn is not None:
+            _last_used[id(conn)] = time.monotonic()
+            if conn.closed:
+                _last_used.pop(id(conn), None)
+            db_pool.putconn(conn, close=bool(conn.closed))
+        _pool_slots.release()
@@ -1,34 +1,60 @@
 """All database quires."""
 
-from src.database.models import get_db_connection
+from src.database.pool import pooled_connection
+
+
+# read queries explained by query_plans
+CONTROL_TICKERS_SQL = """
+    SELECT ticker_id from ticker;
+"""
+
+MOST_RECENT_SUBMISSION_SQL = """
+    SELECT submission_id
+    FROM submission
+    WHERE timestamp = (SELECT max(timestamp) FROM submission);
+"""
+
+SUBMISSION_CHECKPOINT_SQL = """
+    SELECT last_comment_timestamp, last_comment_id, nr_comments
+    FROM submission_checkpoint
+    WHERE submission_id = %s;
+"""
+
+MENTIONED_TICKERS_SQL = """
+    SELECT DISTINCT ticker_id
+    FROM ticker_mention_hourly
+    WHERE hour >= date_trunc('hour', %s::timestamptz)
+    ORDER BY ticker_id;
+"""
+
+PRICE_DAYS_SQL = """
+    SELECT DISTINCT ticker_id, (timestamp AT TIME ZONE %s)::date
+    FROM price
+    WHERE timestamp >= %s;
+"""
 
 
 def count_current_tickers():
     """Count number of ticker in table."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
     SELECT count(ticker_id) from ticker;
     """
-    cur.execute(sql)
-    result = cur.fetchone()[0]
-    cur.close()
-    conn.close()
-    return result
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        result = cur.fetchone()[0]
+        cur.close()
+        return result
 
 
 def get_all_control_tickers():
     """Get list of all valid tickers."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    sql = """
-    SELECT ticker_id from ticker;
-    """
-    cur.execute(sql)
-    result = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [t[0] for t in result]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(CONTROL_TICKERS_SQL)
+        result = cur.fetchall()
+        cur.close()
+        return [t[0] for t in result]
 
 
 def check_for_existing_mentioned(ticker, comment_id):
@@ -37,8 +63,6 @@ def check_for_existing_mentioned(ticker, comment_id):
 
 def get_dates_for_top10_mentioned_tickers():
     """Get 10top mentioned tickers for each available date."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
     SELECT
         ticker_mentions.ticker,
@@ -51,14 +75,14 @@ def get_dates_for_top10_mentioned_tickers():
         count(ticker_mentions.mention_id) DESC
     LIMIT 10;
     """
-    cur.execute(sql)
-    return cur.fetchall()
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        return cur.fetchall()
 
 
 def get_dash_data():
     """Get all data for dash app."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
     SELECT
         ticker_control.name,
@@ -80,35 +104,80 @@ def get_dash_data():
         count(ticker_mentions.mention_id) DESC,
         ticker_mentions.ticker;
     """
-    cur.execute(sql)
-    return cur.fetchall()
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        return cur.fetchall()
 
 
 def get_all_submission_ids():
     """Get all unique submission ids."""
-    conn = get_db_connection()
-    cur = conn.cursor()
     sql = """
     SELECT submission_id from submission;
     """
-    cur.execute(sql)
-    result = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [id[0] for id in result]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        result = cur.fetchall()
+        cur.close()
+        return [id[0] for id in result]
 
 
 def get_most_recent_submission():
     """Get most recent submission id."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    sql = """
-    SELECT submission_id
-    FROM submission
-    WHERE timestamp = (SELECT max(timestamp) FROM submission);
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(MOST_RECENT_SUBMISSION_SQL)
+        result = cur.fetchall()
+        cur.close()
+        return [id[0] for id in result]
+
+
+def get_submission_checkpoint(submission_id):
+    """
+    Get collection high-water mark for submission.
+    Return dictionary or None if submission not collected before.
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(SUBMISSION_CHECKPOINT_SQL, (submission_id, ))
+        result = cur.fetchone()
+        cur.close()
+    if result is None:
+        return None
+    return {
+        "last_comment_timestamp": result[0],
+        "last_comment_id": result[1],
+        "nr_comments": result[2],
+    }
+
+
+def get_mentioned_tickers(since):
+    """
+    Get list of tickers mentioned since timestamp.
+
+    Args:
+    :since: datetime with timezone
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(MENTIONED_TICKERS_SQL, (since, ))
+        result = cur.fetchall()
+        cur.close()
+        return [t[0] for t in result]
+
+
+def get_price_days(since, timezone="America/New_York"):
+    """
+    Get (ticker_id, date) of days with prices since timestamp.
+
+    Args:
+    :since: datetime with timezone
+    :timezone: timezone of market dates
     """
-    cur.execute(sql)
-    result = cur.fetchall()
-    cur.close()
-    conn.close()
-    return [id[0] for id in result]
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(PRICE_DAYS_SQL, (timezone, since, ))
+        result = cur.fetchall()
+        cur.close()
+        return result
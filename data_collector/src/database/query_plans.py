@@ -0,0 +1,204 @@
+"""EXPLAIN (ANALYZE, BUFFERS) of the shipped query surface and plan regression checks."""
+
+import importlib.util
+from datetime import datetime, timezone
+from pathlib import Path
+
+from src.database.alerts import CHANGED_HOURLY_COUNTS_SQL, HOURLY_COUNTS_SQL
+from src.database.analytics import ANALYTICS_SQL, get_analytics_config, get_analytics_params
+from src.database.cache import WARM_AUTHORS_SQL, WARM_SOURCES_SQL, WARM_SUBMISSIONS_SQL
+from src.database.inserts import TICKER_MENTION_SQL
+from src.database.pool import pooled_connection
+from src.database.queries import (CONTROL_TICKERS_SQL, MENTIONED_TICKERS_SQL,
+                                  MOST_RECENT_SUBMISSION_SQL, PRICE_DAYS_SQL,
+                                  SUBMISSION_CHECKPOINT_SQL)
+
+
+# dashboard reads, only available when dashboard is checked out next to collector
+DASHBOARD_QUERIES = (Path(__file__).resolve().parents[3]
+                     / "dashboard" / "src" / "db_functions.py")
+
+
+def load_dashboard_queries():
+    """Return dashboard db_functions module loaded from file or None if not found."""
+    if not DASHBOARD_QUERIES.exists():
+        return None
+    spec = importlib.util.spec_from_file_location("dashboard_db_functions", DASHBOARD_QUERIES)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_analytics_sample():
+    """Return parameters of today's ticker analytics with configured settings."""
+    return get_analytics_params(datetime.now(timezone.utc).date(), get_analytics_config())
+
+
+def get_query_plans():
+    """
+    Return dictionary with query name as key and tuple (sql, sample) as value.
+    sample is None, sql returning one row of parameters, named by column for
+    queries with named parameters, or a function returning parameters.
+    SQL is imported from the modules that run it.
+    """
+    query_plans = {
+        # queries.get_all_control_tickers
+        "control_tickers": (CONTROL_TICKERS_SQL, None),
+        # queries.get_most_recent_submission
+        "most_recent_submission": (MOST_RECENT_SUBMISSION_SQL, None),
+        # queries.get_submission_checkpoint
+        "submission_checkpoint": (SUBMISSION_CHECKPOINT_SQL, """
+            SELECT submission_id FROM submission_checkpoint ORDER BY updated_at DESC LIMIT 1;
+        """),
+        # cache.warm_caches
+        "warm_sources": (WARM_SOURCES_SQL, "SELECT 100;"),
+        "warm_authors": (WARM_AUTHORS_SQL, "SELECT 100000;"),
+        "warm_submissions": (WARM_SUBMISSIONS_SQL, "SELECT 10000;"),
+        # inserts.insert_ticker_mention
+        "ticker_mention": (TICKER_MENTION_SQL, """
+            SELECT t.ticker_id, c.comment_id
+            FROM ticker t, (SELECT comment_id FROM comment ORDER BY timestamp DESC LIMIT 1) c
+            LIMIT 1;
+        """),
+        # queries.get_mentioned_tickers and get_price_days of price collector
+        "mentioned_tickers": (MENTIONED_TICKERS_SQL, "SELECT now() - interval '24 hours';"),
+        "price_days": (PRICE_DAYS_SQL, "SELECT 'America/New_York', now() - interval '6 days';"),
+        # alerts.get_hourly_counts of alert engine and trending warm up
+        "hourly_counts": (HOURLY_COUNTS_SQL, "SELECT now() - interval '8 days';"),
+        # alerts.get_changed_hourly_counts
+        "alert_changed_hours": (CHANGED_HOURLY_COUNTS_SQL,
+                                "SELECT now() - interval '5 minutes';"),
+        # analytics.compute_ticker_analytics
+        "ticker_analytics": (ANALYTICS_SQL, get_analytics_sample),
+    }
+    dashboard = load_dashboard_queries()
+    if dashboard is None:
+        print(f"Dashboard queries not found at {DASHBOARD_QUERIES}, skipping them.")
+        return query_plans
+    query_plans.update({
+        # dashboard db_functions.get_tickers_per_date_hour
+        "dashboard_tickers_per_date_hour": (dashboard.get_tickers_per_date_hour_sql(), None),
+        # with changed_since
+        "dashboard_changed_since": (dashboard.get_tickers_per_date_hour_sql(changed_since=True), """
+            SELECT now() - interval '5 minutes' AS changed_since;
+        """),
+        # with date range and sources
+        "dashboard_filtered": (dashboard.get_tickers_per_date_hour_sql(
+            start_date=True, end_date=True, source_ids=True), """
+            SELECT (now() - interval '1 day')::date AS start_date, now()::date AS end_date,
+                   ARRAY[min(source_id)] AS source_ids
+            FROM source HAVING count(*) > 0;
+        """),
+        # dashboard db_functions.get_sources
+        "dashboard_sources": (dashboard.SOURCES_SQL, None),
+        # dashboard db_functions.get_trending_tickers
+        "dashboard_trending_tickers": (dashboard.TRENDING_TICKERS_SQL, "SELECT '24h';"),
+        # dashboard db_functions.get_ticker_analytics
+        "dashboard_ticker_analytics": (dashboard.TICKER_ANALYTICS_SQL, None),
+    })
+    return query_plans
+
+
+QUERY_PLANS = get_query_plans()
+
+# regressions below these absolute changes are noise
+MIN_BUFFER_INCREASE = 100
+MIN_TIME_INCREASE_MS = 5
+
+
+def get_seq_scans(plan):
+    """Return sorted list of relations read with sequential scans in plan tree."""
+    relations = set()
+    if plan["Node Type"] == "Seq Scan":
+        relations.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        relations.update(get_seq_scans(child))
+    return sorted(relations)
+
+
+def explain_query(cur, sql, params=None, text=False):
+    """
+    Run query with EXPLAIN (ANALYZE, BUFFERS) and return summary dictionary
+    with execution time, shared buffers and sequential scans.
+
+    Args:
+    :cur: psycopg2 cursor
+    :sql: query to explain
+    :params: tuple with query parameters or None
+    :text: also run query with text explain and add plan to summary
+    """
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+    result = cur.fetchone()[0][0]
+    plan = result["Plan"]
+    summary = {
+        "execution_ms": round(result["Execution Time"], 3),
+        "buffers": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "seq_scans": get_seq_scans(plan),
+    }
+    if text:
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+        summary["plan"] = "\n".join(row[0] for row in cur.fetchall())
+    return summary
+
+
+def run_query_plans(names=None, text=False):
+    """
+    Explain shipped queries inside one transaction that is rolled back.
+    Queries without sample parameters in db are skipped.
+    Return dictionary with query name as key and summary as value.
+
+    Args:
+    :names: list of query names, all queries if None
+    :text: add text plans to summaries
+    """
+    results = {}
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            for name, (sql, sample_sql) in QUERY_PLANS.items():
+                if names is not None and name not in names:
+                    continue
+                params = None
+                if callable(sample_sql):
+                    params = sample_sql()
+                elif sample_sql is not None:
+                    cur.execute(sample_sql)
+                    params = cur.fetchone()
+                    if params is None:
+                        print(f"No sample parameters for {name}, skipping.")
+                        continue
+                    if "%(" in sql:
+                        params = dict(zip([column[0] for column in cur.description], params))
+                results[name] = explain_query(cur, sql, params, text)
+        finally:
+            conn.rollback()
+            cur.close()
+    return results
+
+
+def find_regressions(current, baseline, tolerance=0.5):
+    """
+    Compare plan summaries with baseline.
+    Return list of strings describing regressions.
+
+    Args:
+    :current: dictionary from run_query_plans
+    :baseline: dictionary from run_query_plans saved earlier
+    :tolerance: allowed relative increase of buffers and execution time
+    """
+    regressions = []
+    for name, summary in current.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        if summary["buffers"] > before["buffers"] * (1 + tolerance) and \
+                summary["buffers"] - before["buffers"] >= MIN_BUFFER_INCREASE:
+            regressions.append(f"{name}: buffers {before['buffers']} -> {summary['buffers']}")
+        if summary["execution_ms"] > before["execution_ms"] * (1 + tolerance) and \
+                summary["execution_ms"] - before["execution_ms"] >= MIN_TIME_INCREASE_MS:
+            regressions.append(f"{name}: execution {before['execution_ms']} ms -> "
+                               f"{summary['execution_ms']} ms")
+        new_scans = set(summary["seq_scans"]) - set(before["seq_scans"])
+        if new_scans:
+            regressions.append(f"{name}: new sequential scan on {', '.join(sorted(new_scans))}")
+    return regressions
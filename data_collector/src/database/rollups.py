@@ -0,0 +1,88 @@
+"""Pre-aggregated ticker mention rollups read by the dashboard."""
+
+from src.database.pool import pooled_connection
+
+
+# adds mentions of a new_mention CTE (ticker_id, comment_id, comment_timestamp)
+# to hourly rollup, used as a data-modifying CTE next to the ticker_mention insert so rollup and
+# mentions are written in the same statement and transaction.
+# Keys are updated in sorted order so concurrent writers lock rows in the same order.
+HOURLY_ROLLUP_CTE = """
+    hourly_rollup AS (
+        INSERT INTO ticker_mention_hourly AS h (ticker_id, source_id, hour,
+                                                mention_count, score_sum)
+        SELECT
+            nm.ticker_id,
+            s.source_id,
+            date_trunc('hour', c.timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+            COUNT(*),
+            SUM(c.score)
+        FROM new_mention nm
+        INNER JOIN comment c
+            ON c.comment_id = nm.comment_id AND c.timestamp = nm.comment_timestamp
+        INNER JOIN submission s USING(submission_id)
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (ticker_id, source_id, hour) DO UPDATE
+            SET mention_count = h.mention_count + EXCLUDED.mention_count,
+                score_sum = h.score_sum + EXCLUDED.score_sum,
+                updated_at = now()
+    )
+"""
+
+
+def rebuild_ticker_mention_hourly():
+    """
+    Recompute hourly rollup from all ticker mentions.
+    Mention writers are blocked until rebuild is committed.
+    Return number of rollup rows or None on error.
+    """
+    lock_sql = "LOCK TABLE ticker_mention IN SHARE MODE;"
+    delete_sql = "DELETE FROM ticker_mention_hourly;"
+    rebuild_sql = """
+        INSERT INTO ticker_mention_hourly (ticker_id, source_id, hour,
+                                           mention_count, score_sum)
+        SELECT
+            tm.ticker_id,
+            s.source_id,
+            date_trunc('hour', c.timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+            COUNT(*),
+            SUM(c.score)
+        FROM ticker_mention tm
+        INNER JOIN comment c USING(comment_id)
+        INNER JOIN submission s USING(submission_id)
+        GROUP BY 1, 2, 3;
+    """
+    result = None
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(lock_sql)
+            cur.execute(delete_sql)
+            cur.execute(rebuild_sql)
+            result = cur.rowcount
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't rebuild hourly ticker mention rollup. Error: {e}")
+            conn.rollback()
+        cur.close()
+    return result
+
+
+def init_ticker_mention_hourly():
+    """Build hourly rollup once for mentions written before rollup existed."""
+    sql = """
+    SELECT
+        EXISTS (SELECT 1 FROM ticker_mention_hourly),
+        EXISTS (SELECT 1 FROM ticker_mention);
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        has_rollup, has_mentions = cur.fetchone()
+        cur.close()
+        conn.rollback()
+    if has_mentions and not has_rollup:
+        print("Building hourly ticker mention rollup...")
+        rows = rebuild_ticker_mention_hourly()
+        print(f"Hourly rollup rows: {rows}")
@@ -0,0 +1,33 @@
+"""Writes of trending tickers read by the dashboard."""
+
+from psycopg2.extras import execute_values
+
+from src.database.pool import pooled_connection
+
+
+def replace_trending_tickers(rows):
+    """
+    Replace all trending tickers in a single transaction.
+    Return number of rows written or None on error.
+
+    Args:
+    :rows: list of (time_window, rank, ticker_id, mention_count)
+    """
+    sql = """
+        INSERT INTO trending_ticker (time_window, rank, ticker_id, mention_count)
+        VALUES %s;
+    """
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM trending_ticker;")
+            if rows:
+                execute_values(cur, sql, rows)
+            conn.commit()
+        except Exception as e:
+            print(f"Couldn't update trending tickers. Error: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
+    return len(rows)
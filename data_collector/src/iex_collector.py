@@ -4,7 +4,7 @@ from iexfinance.refdata import get_symbols
 # from iexfinance.stocks import get_historical_intraday
 
 from src.database.queries import count_current_tickers
-from src.database.inserts import insert_tickers
+from src.database.bulk_loads import load_tickers
 
 
 class IEXCollector:
@@ -26,16 +26,18 @@ class IEXCollector:
         all_symbols = get_symbols(token=self.token)
         return all_symbols[["symbol", "name"]]
 
-    def convert_df_to_tuples(self, df):
-        """Convert df to list of tuples for postgres executemany."""
-        return [tuple(x) for x in df.to_numpy()]
+    def update_database(self, refresh=False):
+        """
+        Call api if databse is empty and load values.
 
-    def update_database(self):
-        """Call api if databse is empty and insert values."""
-        if self.check_database() is False:
+        Args:
+        :refresh: True to reload ticker universe even if table is populated.
+        """
+        if refresh or self.check_database() is False:
             ticker_data = self.get_all_tickers()
-            ticker_db_format = self.convert_df_to_tuples(ticker_data)
-            insert_tickers(ticker_db_format)
-            print(f"Ticker table updated. Available tickers: {len(ticker_data)}")
+            result = load_tickers(ticker_data)
+            if result is not None:
+                print(f"Ticker table updated. New tickers: {result['new']}, "
+                      f"updated tickers: {result['updated']}")
         else:
             print("Ticker table already populated.")
@@ -0,0 +1,52 @@
+"""Notifiers that deliver new alerts of the alert engine."""
+
+import requests
+
+
+class PrintNotifier:
+    """Print alerts to stdout, used when no webhook is configured."""
+    def notify(self, alerts):
+        """
+        Args:
+        :alerts: list of alert dictionaries
+        """
+        for alert in alerts:
+            rank = ""
+            if alert.get("trending_rank") is not None:
+                rank = f", trending #{alert['trending_rank']} last hour"
+            print(f"ALERT {alert['ticker_id']} {alert['hour']:%Y-%m-%d %H:00} UTC: "
+                  f"{alert['mention_count']} mentions, baseline {alert['baseline_mean']:.1f}, "
+                  f"z-score {alert['z_score']:.1f}{rank}")
+
+
+class WebhookNotifier:
+    """POST alerts as json to a webhook url, one request per batch of alerts."""
+    def __init__(self, url, timeout=5):
+        """
+        Args:
+        :url: webhook url
+        :timeout: request timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def notify(self, alerts):
+        """
+        Args:
+        :alerts: list of alert dictionaries
+        """
+        payload = {"alerts": [dict(alert, hour=alert["hour"].isoformat()) for alert in alerts]}
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            # alerts are kept in alert table
+            print(f"Couldn't send {len(alerts)} alerts to webhook. Error: {e}")
+
+
+def get_notifier(webhook_url=None, timeout=5):
+    """Return webhook notifier if url is given, print notifier otherwise."""
+    if webhook_url:
+        return WebhookNotifier(webhook_url, timeout)
+    return PrintNotifier()
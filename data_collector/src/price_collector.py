@@ -0,0 +1,172 @@
+"""Intraday price collector for mentioned tickers using IEX Cloud batch requests."""
+
+import time
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+
+from src.aux_functions import get_config_section
+from src.database.cache import LRUCache
+from src.database.inserts import insert_closing_price
+from src.database.queries import get_mentioned_tickers, get_price_days
+from src.rate_limit import TokenBucket
+
+
+MARKET_TIMEZONE = pytz.timezone("America/New_York")
+
+
+def get_price_config():
+    """Read price collection settings from config file."""
+    config = get_config_section("prices")
+    return {
+        "enabled": config.get("enabled", "true").lower() == "true",
+        "base_url": config.get("base_url", "https://cloud.iexapis.com/stable"),
+        "batch_size": int(config.get("batch_size", 100)),
+        "lookback_days": int(config.get("lookback_days", 5)),
+        "mention_hours": int(config.get("mention_hours", 24)),
+        "interval_minutes": float(config.get("interval_minutes", 5)),
+        "requests_per_minute": int(config.get("requests_per_minute", 60)),
+        "timeout": int(config.get("timeout", 10)),
+        "cache_size": int(config.get("cache_size", 100000)),
+    }
+
+
+def parse_bars(ticker, bars):
+    """
+    Return price rows of minute bars, bars without trades are skipped.
+
+    Args:
+    :ticker: string with ticker
+    :bars: list of dictionaries with date, minute, close and volume
+    """
+    rows = []
+    for bar in bars:
+        if bar.get("close") is None:
+            continue
+        local_time = datetime.strptime(f"{bar['date']} {bar['minute']}", "%Y-%m-%d %H:%M")
+        timestamp = MARKET_TIMEZONE.localize(local_time).astimezone(pytz.utc)
+        rows.append((ticker, timestamp, bar["close"], bar.get("volume")))
+    return rows
+
+
+class PriceCollector:
+    """
+    Collect minute prices of tickers mentioned in the last mention_hours.
+    Prices are fetched with batch requests of up to batch_size tickers.
+    Finished market days are fetched once per ticker, tracked in a cache
+    warmed from the price table, today is fetched again every run.
+    """
+    def __init__(self, token, base_url="https://cloud.iexapis.com/stable", batch_size=100,
+                 lookback_days=5, mention_hours=24, requests_per_minute=60, timeout=10,
+                 cache_size=100000):
+        """
+        Args:
+        :token: IEX Cloud api token
+        :base_url: IEX Cloud api url
+        :batch_size: tickers per batch request, at most 100
+        :lookback_days: past market days to fetch for mentioned tickers
+        :mention_hours: tickers mentioned within these hours are collected
+        :requests_per_minute: IEX api request budget
+        :timeout: request timeout in seconds
+        :cache_size: capacity of cache of fetched (ticker, day)
+        """
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = min(batch_size, 100)
+        self.lookback_days = lookback_days
+        self.mention_hours = mention_hours
+        self.rate_limiter = TokenBucket(requests_per_minute)
+        self.timeout = timeout
+        # (ticker, day) of finished days already fetched, empty days included
+        self.fetched_days = LRUCache(cache_size)
+        self.session = requests.Session()
+
+    def warm_cache(self):
+        """Mark days with prices in db as fetched."""
+        since = datetime.now(pytz.utc) - timedelta(days=self.lookback_days + 1)
+        self.fetched_days.update(get_price_days(since, MARKET_TIMEZONE.zone))
+        print(f"Price cache warmed. Ticker days: {len(self.fetched_days)}")
+
+    def get_days(self):
+        """Return tuple with (today, list of past weekdays in lookback) as market dates."""
+        today = datetime.now(MARKET_TIMEZONE).date()
+        days = [today - timedelta(days=n) for n in range(1, self.lookback_days + 1)]
+        return today, [day for day in days if day.weekday() < 5]
+
+    def fetch_batch(self, tickers, day=None):
+        """
+        Fetch minute bars of tickers with one batch request.
+        Return dictionary with ticker as key and list of bars as value.
+
+        Args:
+        :tickers: list of at most batch_size tickers
+        :day: date of past day, today's intraday prices if None
+        """
+        params = {"symbols": ",".join(tickers), "token": self.token}
+        if day is None:
+            params["types"] = "intraday-prices"
+            key = "intraday-prices"
+        else:
+            params.update(types="chart", range="date", exactDate=day.strftime("%Y%m%d"),
+                          chartByDay="false")
+            key = "chart"
+        self.rate_limiter.acquire()
+        response = self.session.get(f"{self.base_url}/stock/market/batch",
+                                    params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return {ticker: data.get(key) or [] for ticker, data in response.json().items()}
+
+    def collect_day(self, tickers, day=None):
+        """
+        Fetch and write prices of tickers for day in batches.
+        Return number of price rows written.
+
+        Args:
+        :tickers: list of tickers
+        :day: date of past day, today if None
+        """
+        written = 0
+        for i in range(0, len(tickers), self.batch_size):
+            batch = tickers[i:i + self.batch_size]
+            try:
+                bars = self.fetch_batch(batch, day)
+            except (requests.RequestException, ValueError) as e:
+                print(f"Couldn't fetch prices of {len(batch)} tickers. Error: {e}")
+                continue
+            rows = [row for ticker, ticker_bars in bars.items()
+                    for row in parse_bars(ticker, ticker_bars)]
+            result = insert_closing_price(rows)
+            if result is None:
+                continue
+            written += result
+            if day is not None:
+                # tickers without data on day are not asked for again
+                self.fetched_days.update((ticker, day) for ticker in batch)
+        return written
+
+    def collect_once(self):
+        """Collect prices of mentioned tickers. Return number of price rows written."""
+        since = datetime.now(pytz.utc) - timedelta(hours=self.mention_hours)
+        tickers = get_mentioned_tickers(since)
+        today, days = self.get_days()
+        written = 0
+        for day in days:
+            missing = sorted(self.fetched_days.missing((ticker, day) for ticker in tickers))
+            if missing:
+                written += self.collect_day([ticker for ticker, _ in missing], day)
+        if today.weekday() < 5:
+            written += self.collect_day(tickers)
+        return written
+
+    def run_forever(self, interval_minutes=5):
+        """Collect prices every interval_minutes, blocks forever."""
+        self.warm_cache()
+        while True:
+            start = time.time()
+            try:
+                written = self.collect_once()
+                print(f"Prices updated. Rows written: {written}")
+            except Exception as e:
+                print(f"Couldn't collect prices. Error: {e}")
+            time.sleep(max(0, interval_minutes * 60 - (time.time() - start)))
@@ -0,0 +1,48 @@
+"""Shared reddit api rate limit for collectors running in parallel."""
+
+import threading
+import time
+
+import prawcore
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket.
+    Allows bursts of up to capacity requests and refills at rate per second.
+    """
+    def __init__(self, requests_per_minute, capacity=None):
+        self.rate = requests_per_minute / 60
+        self.capacity = capacity or max(1, requests_per_minute // 6)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, block until one is available."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedRequestor(prawcore.Requestor):
+    """
+    Prawcore requestor that takes a token from a shared bucket before every
+    request, so all praw instances created with it share one request budget.
+    Pass to praw with requestor_class and requestor_kwargs={"rate_limiter": bucket}.
+    """
+    def __init__(self, *args, rate_limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+
+    def request(self, *args, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return super().request(*args, **kwargs)
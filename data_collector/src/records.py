@@ -0,0 +1,39 @@
+"""Compact records passed between comment extraction and db writes."""
+
+from collections import namedtuple
+from datetime import datetime
+from itertools import islice
+
+
+# one per ticker comment, a tuple is far smaller than a dictionary per comment
+CommentRecord = namedtuple("CommentRecord", ["comment_id", "timestamp", "score",
+                                             "submission_id", "author_id", "tickers"])
+
+
+def row_to_comment_record(comment_row, tickers):
+    """
+    Return comment record from raw comment row and its tickers.
+
+    Args:
+    :comment_row: tuple (comment_id, created_utc, score, submission_id, author_id, body)
+    :tickers: list of tickers mentioned in comment
+    """
+    comment_id, created_utc, score, submission_id, author_id, _ = comment_row
+    return CommentRecord(comment_id, datetime.fromtimestamp(int(created_utc)), score,
+                         submission_id, author_id, tickers)
+
+
+def batched(iterable, size):
+    """
+    Yield lists of up to size items from iterable, consumed lazily.
+
+    Args:
+    :iterable: any iterable
+    :size: max nr of items per list
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -1,12 +1,14 @@
 """Reddit Collector using praw sdk"""
 
 import praw
-from datetime import datetime
+from datetime import datetime, timezone
 
-from src.database.queries import get_all_control_tickers
-from src.database.inserts import (insert_author, insert_source,
-                                  insert_submission, insert_comment,
-                                  insert_ticker_mention)
+from src.comment_tree import CommentTree
+from src.database.queries import get_all_control_tickers, get_submission_checkpoint
+from src.rate_limit import RateLimitedRequestor
+from src.records import CommentRecord, batched
+from src.ticker_matcher import TickerMatcher
+from src.database.inserts import insert_comment_batch, upsert_submission_checkpoint
 
 
 class RedditCollector:
@@ -15,14 +17,21 @@ class RedditCollector:
     authentication, calls and data formatting.
     """
     def __init__(self, client_id, client_secret,
-                 user_agent, username, password):
+                 user_agent, username, password,
+                 ticker_matcher=None, rate_limiter=None):
         self.new_ticker_updates = 0
-        self.ticker_control = get_all_control_tickers()
+        self.ticker_matcher = ticker_matcher or TickerMatcher(get_all_control_tickers())
         print("Creating connection to Reddit...")
+        # collectors sharing a rate limiter share one api request budget
+        requestor_args = {}
+        if rate_limiter is not None:
+            requestor_args = {"requestor_class": RateLimitedRequestor,
+                              "requestor_kwargs": {"rate_limiter": rate_limiter}}
         self.reddit = praw.Reddit(client_id=client_id,
                                   client_secret=client_secret,
                                   user_agent=user_agent,
-                                  username=username, password=password)
+                                  username=username, password=password,
+                                  **requestor_args)
 
     def get_subreddit(self, subreddit_name):
         """
@@ -57,18 +66,21 @@ class RedditCollector:
             print(f"Subreddit sorting type not recognized: {subreddit_sorting}")
             raise ValueError
 
-    def get_comments(self, submission_obj, limit=10):
+    def get_comments(self, submission_obj, limit=10, time_budget=None):
         """
-        Return list of comments objects from single submission object.
+        Return comment tree of single submission object, an iterable of comment objects.
+        Comments are yielded as they arrive, MoreComments are expanded in batched requests.
+        Check `complete` of the tree after iterating to see if comments were left unexpanded.
 
         Args:
         :submission_obj: praw single submission object.
-        :limit: int nr of comments to collect.
+        :limit: int nr of expansion requests, None for all.
+        :time_budget: seconds to spend on expansion requests, None for no limit.
         """
         # call for comments of submission
-        print(f"Getting {limit} comments from submission: {submission_obj.id}")
-        submission_obj.comments.replace_more(limit=limit)
-        return submission_obj.comments.list()
+        print(f"Getting comments from submission: {submission_obj.id}, "
+              f"expanding more comments with up to {limit} requests")
+        return CommentTree(self.reddit, submission_obj, limit=limit, time_budget=time_budget)
 
     def convert_to_epoc_utc(self, timestamp):
         """Convert reddit timestamp to datetime object."""
@@ -89,31 +101,46 @@ class RedditCollector:
                 "score": submission_obj.score,
                 "nr_comments": submission_obj.num_comments,
                 "author_id": submission_obj.author.id,
-                "source": submission_obj.subreddit.name
+                "source": submission_obj.subreddit.name,
+                "source_name": submission_obj.subreddit.display_name
             }
         except Exception as error:
             print(f"Couldn't access submission data: {error}. On to the next one...")
         return data
 
-    def get_comment_data(self, comment_obj):
+    def get_comment_record(self, comment_obj, tickers):
         """
-        Return target datapoints for single comment as dictionary.
+        Return target datapoints for single comment as comment record.
 
         Args:
         :comment_obj: praw single comment object.
+        :tickers: list of tickers mentioned in comment
         """
-        data = None
+        record = None
         try:
-            data = {
-                "comment_id": comment_obj.id,
-                "timestamp": self.convert_to_epoc_utc(comment_obj.created_utc),
-                "score": comment_obj.score,
-                "submission_id": comment_obj.submission.id,
-                "author_id": comment_obj.author.id,
-            }
+            record = CommentRecord(comment_obj.id,
+                                   self.convert_to_epoc_utc(comment_obj.created_utc),
+                                   comment_obj.score,
+                                   comment_obj.submission.id,
+                                   comment_obj.author.id,
+                                   tickers)
         except Exception as error:
             print(f"Couldn't access comment data: {error}. On to the next one...")
-        return data
+        return record
+
+    def get_comment_row(self, comment_obj):
+        """
+        Return raw datapoints for single comment as tuple for parsing in other processes.
+        Author id is read from author_fullname to avoid a lazy api call per author.
+
+        Args:
+        :comment_obj: praw single comment object.
+        """
+        author_fullname = getattr(comment_obj, "author_fullname", None)
+        if author_fullname is None:
+            return None
+        return (comment_obj.id, comment_obj.created_utc, comment_obj.score,
+                comment_obj.link_id[3:], author_fullname[3:], comment_obj.body)
 
     def filter_valid_tickers(self, comment_obj):
         """
@@ -123,82 +150,126 @@ class RedditCollector:
         Args:
         :comment_obj: praw single comment object.
         """
-        # combine title and body split by whitespace
-        words = comment_obj.body.split()
-        # cashtags
-        possible_tickers = [w for w in words if w.startswith('$')]
-        # most ticker 1-5 characters
-        possible_tickers.extend([w for w in words if len(w) > 1 and len(w) < 6])
-        # remove cashtags
-        clean_tickers = [w.strip('$') for w in possible_tickers]
-        # compare against control table
-        valid_tickers = [c for c in clean_tickers if c in self.ticker_control]
-        # get unique tickers
-        unique_tickers = list(set(valid_tickers))
-        return unique_tickers
-
-    def get_comments_with_tickers(self, comments_list, submission_data):
-        """
-        Filter comments that mentions tickers.
-        Return list of dictionary with comment data.
+        return self.ticker_matcher.match(comment_obj.body)
+
+    def iter_ticker_comments(self, comments):
+        """
+        Yield comment records of comments that mention tickers.
+        Comments are consumed one at a time, nothing else is kept.
 
         Args:
-        :comments_list: List of comment objects.
-        :submission_data: dictionary with submission data
+        :comments: iterable of praw comment objects.
         """
-        # filter each comment for ticker mentions
-        ticker_comments = list()
-        for i, comment in enumerate(comments_list):
+        for i, comment in enumerate(comments, start=1):
             tickers = self.filter_valid_tickers(comment)
             # if tickers mentioned in text, get comment data
             if len(tickers) > 0:
-                comment_data = self.get_comment_data(comment)
-
-                # if comment data available, add tickers to dict and add to result list
-                if comment_data is not None:
-                    comment_data["tickers"] = tickers
-                    ticker_comments.append(comment_data)
-
-            # flush data to db when extracted 100 ticker comments, reset result list
-            if len(ticker_comments) > 99:
-                self.insert_new_data_to_db(ticker_comments, submission_data)
-                ticker_comments = list()
+                comment_record = self.get_comment_record(comment, tickers)
+                if comment_record is not None:
+                    yield comment_record
 
             # print number of comments that been reviewed
-            if i+1 % 100 == 0:
+            if i % 1000 == 0:
                 print(f"Numbers of comments from submission assessed: {i}")
 
-        # write any remaining ticker comments
-        if len(ticker_comments) > 0:
-            self.insert_new_data_to_db(ticker_comments, submission_data)
+    def get_comments_with_tickers(self, comments, submission_data, batch_size=100):
+        """
+        Filter comments that mentions tickers and write them to db in batches.
+        Comments are streamed, at most one batch of ticker comments is held in memory.
+        Return True if all writes succeeded.
+
+        Args:
+        :comments: iterable of praw comment objects.
+        :submission_data: dictionary with submission data
+        :batch_size: nr of ticker comments per db write
+        """
+        success = True
+        for ticker_comments in batched(self.iter_ticker_comments(comments), batch_size):
+            success &= self.insert_new_data_to_db(ticker_comments, submission_data) is not None
+        return success
 
     def insert_new_data_to_db(self, ticker_comments, submission_data):
         """
         Insert new ticker mention data to database.
+        Return dictionary with number of new rows per table or None on error.
 
         Args:
-        :ticker_comments: list of dictionaries with comment data
+        :ticker_comments: list of comment records
         :submission_data: dictionary with submission data
         """
-        # submission related data
-        insert_source(submission_data["source"])        # insert source table
-        insert_author(submission_data["author_id"])     # insert author table
-        insert_submission(**submission_data)            # insert submission table
+        return self.insert_batch_to_db(ticker_comments, [submission_data])
 
-        # for each comment
-        updates = 0
-        for comment_data in ticker_comments:
-            insert_author(comment_data["author_id"])       # insert author
-            comment_tickers = comment_data.pop("tickers")  # drop tickers from comment data
-            insert_comment(**comment_data)                 # insert comment table
+    def insert_batch_to_db(self, ticker_comments, submissions):
+        """
+        Insert new ticker mention data from one or more submissions to database.
+        Return dictionary with number of new rows per table or None on error.
 
-            # for each ticker in comment, insert new ticker mentions
-            for ticker in comment_tickers:
-                insert_ticker_mention(ticker, comment_data["comment_id"])
-                updates += 1
+        Args:
+        :ticker_comments: list of comment records
+        :submissions: list of dictionaries with submission data
+        """
+        # write submissions, authors, comments and ticker mentions in one transaction
+        new_rows = insert_comment_batch(submissions, ticker_comments)
+        if new_rows is None:
+            return None
 
         # print results
-        print(f"Number of new ticker mentions writen to db: {updates}")
+        print(f"Number of new comments writen to db: {new_rows['comments']}")
+        print(f"Number of new ticker mentions writen to db: {new_rows['ticker_mentions']}")
+        return new_rows
+
+    def is_submission_unchanged(self, submission_data, checkpoint):
+        """
+        Check if submission got no new comments since last collection.
+
+        Args:
+        :submission_data: dictionary with submission data
+        :checkpoint: dictionary with submission checkpoint or None
+        """
+        if checkpoint is None:
+            return False
+        return submission_data["nr_comments"] <= checkpoint["nr_comments"]
+
+    def filter_new_comments(self, comments, checkpoint, high_water):
+        """
+        Yield comments created since last collection of submission.
+        Comments from the same second as the checkpoint are yielded again,
+        duplicates are skipped on insert.
+        Newest comment seen is tracked in high_water dictionary.
+
+        Args:
+        :comments: iterable of praw comment objects.
+        :checkpoint: dictionary with submission checkpoint or None
+        :high_water: dictionary updated with created_utc and comment_id of newest comment
+        """
+        since = None
+        if checkpoint is not None and checkpoint["last_comment_timestamp"] is not None:
+            since = checkpoint["last_comment_timestamp"].timestamp()
+        for comment in comments:
+            created_utc = comment.created_utc
+            if created_utc > high_water.get("created_utc", 0):
+                high_water["created_utc"] = created_utc
+                high_water["comment_id"] = comment.id
+            if since is None or created_utc >= since:
+                yield comment
+
+    def update_checkpoint(self, submission_data, high_water):
+        """
+        Save high-water mark of collected submission.
+
+        Args:
+        :submission_data: dictionary with submission data
+        :high_water: dictionary with created_utc and comment_id of newest comment,
+                     empty to keep previous newest comment and save nr_comments only
+        """
+        last_comment_timestamp = None
+        if "created_utc" in high_water:
+            last_comment_timestamp = datetime.fromtimestamp(int(high_water["created_utc"]),
+                                                            tz=timezone.utc)
+        upsert_submission_checkpoint(submission_data["submission_id"],
+                                     last_comment_timestamp,
+                                     high_water.get("comment_id"),
+                                     submission_data["nr_comments"])
 
     def get_new_data(self, subreddit_name, subreddit_params, comment_params):
         """Get new comments from subreddit."""
@@ -209,17 +280,27 @@ class RedditCollector:
 
             # if submission data available, get comments from submission
             if submission_data is not None:
-                print(f"Extracting comments from submission: {submission_data['submission_id']}")
-                comments = self.get_comments(submission, **comment_params)
-                self.get_comments_with_tickers(comments, submission_data)
-
-        # TODO!
-        # How long should extraction for single submission run?
-        # When number of new comments extraction is 0 -> go to next submission
-        # Skip submission in table
+                # skip submissions without new comments since last pass
+                checkpoint = get_submission_checkpoint(submission_data["submission_id"])
+                if self.is_submission_unchanged(submission_data, checkpoint):
+                    print(f"No new comments in submission: {submission_data['submission_id']}")
+                    continue
 
-        # TODO!
-        # How to control all comments in submission have been extracted?
-        # Get nr_comments from submission and track comments extraced comments until end reached?
-        # Skip comments in table
+                # newest first so the replace_more budget is spent on new comments
+                if checkpoint is not None:
+                    submission.comment_sort = "new"
 
+                print(f"Extracting comments from submission: {submission_data['submission_id']}")
+                comments = self.get_comments(submission, **comment_params)
+                high_water = {}
+                new_comments = self.filter_new_comments(comments, checkpoint, high_water)
+                success = self.get_comments_with_tickers(new_comments, submission_data)
+
+                if success:
+                    # partly fetched trees keep the previous newest comment,
+                    # nr_comments is saved so unchanged submissions are skipped
+                    if not comments.complete:
+                        print(f"Comments of submission {submission_data['submission_id']} "
+                              f"left unexpanded, newest comment not moved")
+                        high_water = {}
+                    self.update_checkpoint(submission_data, high_water)
@@ -0,0 +1,94 @@
+"""Scheduler that collects from several subreddits concurrently."""
+
+import threading
+import time
+
+from src.comment_pipeline import CommentPipeline, create_executor
+from src.database.cache import format_cache_stats
+from src.database.queries import get_all_control_tickers
+from src.rate_limit import TokenBucket
+from src.reddit_collector import RedditCollector
+from src.ticker_matcher import TickerMatcher
+
+
+class SubredditScheduler:
+    """
+    Collect from a list of subreddits concurrently within one process.
+    Each subreddit runs on its own thread with its own sorting, limits and interval.
+    All collectors share one ticker matcher and one reddit api rate limit,
+    so adding sources does not multiply cycle time or api usage.
+    """
+    def __init__(self, reddit_config, subreddit_configs, requests_per_minute=60,
+                 pipeline_config=None):
+        """
+        Args:
+        :reddit_config: dictionary with reddit credentials.
+        :subreddit_configs: dictionary with subreddit name as key and dictionary
+                            with subreddit_params, comment_params and interval_minutes.
+        :requests_per_minute: shared reddit api budget for all subreddits.
+        :pipeline_config: dictionary with CommentPipeline options to collect in
+                          pipeline mode, None to collect on the subreddit thread.
+        """
+        self.subreddit_configs = subreddit_configs
+        self.ticker_matcher = TickerMatcher(get_all_control_tickers())
+        self.rate_limiter = TokenBucket(requests_per_minute)
+        self.pipeline_config = pipeline_config
+        self.executor = None
+        if pipeline_config is not None:
+            self.executor = create_executor(self.ticker_matcher, pipeline_config.get("workers"))
+        self.collectors = {
+            name: RedditCollector(**reddit_config,
+                                  ticker_matcher=self.ticker_matcher,
+                                  rate_limiter=self.rate_limiter)
+            for name in subreddit_configs
+        }
+        self.stop_event = threading.Event()
+
+    def get_collect_function(self, collector):
+        """Return get_new_data function of collector for configured mode."""
+        if self.pipeline_config is None:
+            return collector.get_new_data
+        pipeline = CommentPipeline(collector, executor=self.executor, **self.pipeline_config)
+        return pipeline.run
+
+    def collect_forever(self, name):
+        """
+        Collect new data from single subreddit every interval until stopped.
+
+        Args:
+        :name: name of subreddit -> r/{}.
+        """
+        config = self.subreddit_configs[name]
+        get_new_data = self.get_collect_function(self.collectors[name])
+        interval = 60 * config["interval_minutes"]
+        while not self.stop_event.is_set():
+            start = time.monotonic()
+            try:
+                get_new_data(subreddit_name=name,
+                             subreddit_params=config["subreddit_params"],
+                             comment_params=config["comment_params"])
+            except Exception as error:
+                print(f"Collection from r/{name} failed: {error}")
+            print(f"Cache hit rates: {format_cache_stats()}")
+            wait = max(0, interval - (time.monotonic() - start))
+            print(f"Waiting for next call to r/{name}: {wait / 60:.1f} min.")
+            self.stop_event.wait(wait)
+
+    def run(self):
+        """Start one collection thread per subreddit and wait for them."""
+        threads = [threading.Thread(target=self.collect_forever, args=(name, ),
+                                    name=f"collect-{name}", daemon=True)
+                   for name in self.subreddit_configs]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop collection threads after their current cycle."""
+        self.stop_event.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
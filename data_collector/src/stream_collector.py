@@ -0,0 +1,113 @@
+"""Streaming collector that follows the subreddit comment stream."""
+
+import time
+from collections import OrderedDict
+
+from src.records import row_to_comment_record
+
+
+class StreamCollector:
+    """
+    Follow new comments of a subreddit as they are posted and write
+    ticker comments to db in micro-batches.
+    A batch is flushed when it reaches batch_size or is flush_seconds old.
+    """
+    def __init__(self, collector, batch_size=100, flush_seconds=10,
+                 pause_after=0, skip_existing=True, submission_cache_size=1000):
+        self.collector = collector
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pause_after = pause_after
+        self.skip_existing = skip_existing
+        self.submission_cache_size = submission_cache_size
+        # submission data of recently seen submissions, oldest first
+        self.submissions = OrderedDict()
+
+    def get_submission_data(self, submission_id):
+        """
+        Return submission data for submission id, fetched once and cached.
+
+        Args:
+        :submission_id: string with submission id
+        """
+        if submission_id in self.submissions:
+            self.submissions.move_to_end(submission_id)
+            return self.submissions[submission_id]
+        submission = self.collector.reddit.submission(id=submission_id)
+        submission_data = self.collector.get_submission_data(submission)
+        if submission_data is not None:
+            self.submissions[submission_id] = submission_data
+            if len(self.submissions) > self.submission_cache_size:
+                self.submissions.popitem(last=False)
+        return submission_data
+
+    def flush(self, ticker_comments):
+        """
+        Write micro-batch of ticker comments with their submissions to db.
+
+        Args:
+        :ticker_comments: list of comment records
+        """
+        submissions = {}
+        comments = []
+        for comment_record in ticker_comments:
+            submission_id = comment_record.submission_id
+            if submission_id not in submissions:
+                submissions[submission_id] = self.get_submission_data(submission_id)
+            # comments of unavailable submissions can't be referenced
+            if submissions[submission_id] is not None:
+                comments.append(comment_record)
+        if len(comments) > 0:
+            self.collector.insert_batch_to_db(
+                comments, [s for s in submissions.values() if s is not None])
+
+    def consume(self, subreddit_name):
+        """
+        Consume comment stream until an error is raised.
+
+        Args:
+        :subreddit_name: name of subreddit -> r/{}.
+        """
+        subreddit = self.collector.get_subreddit(subreddit_name)
+        stream = subreddit.stream.comments(pause_after=self.pause_after,
+                                           skip_existing=self.skip_existing)
+        ticker_comments = []
+        last_flush = time.monotonic()
+        try:
+            # stream yields None when a request returned no new comments
+            for comment in stream:
+                if comment is not None:
+                    tickers = self.collector.filter_valid_tickers(comment)
+                    if len(tickers) > 0:
+                        comment_row = self.collector.get_comment_row(comment)
+                        if comment_row is not None:
+                            ticker_comments.append(row_to_comment_record(comment_row, tickers))
+
+                batch_age = time.monotonic() - last_flush
+                if len(ticker_comments) >= self.batch_size or \
+                        (len(ticker_comments) > 0 and batch_age >= self.flush_seconds):
+                    self.flush(ticker_comments)
+                    ticker_comments = []
+                if len(ticker_comments) == 0:
+                    last_flush = time.monotonic()
+        finally:
+            # don't lose buffered comments when stream breaks
+            if len(ticker_comments) > 0:
+                self.flush(ticker_comments)
+
+    def run(self, subreddit_name, retry_seconds=30):
+        """
+        Stream comments from subreddit forever, reconnect on errors.
+
+        Args:
+        :subreddit_name: name of subreddit -> r/{}.
+        :retry_seconds: seconds to wait before reconnecting.
+        """
+        print(f"Streaming comments from: r/{subreddit_name}...")
+        while True:
+            try:
+                self.consume(subreddit_name)
+            except Exception as error:
+                print(f"Comment stream interrupted: {error}. "
+                      f"Reconnecting in {retry_seconds} sec...")
+                time.sleep(retry_seconds)
@@ -0,0 +1,116 @@
+"""Ticker matching engine for comment text."""
+
+import re
+import string
+
+import pandas as pd
+
+
+# characters stripped from both ends of a word, i.e. "($GME)," -> "GME"
+EDGE_CHARS = string.punctuation
+# bare words (without $) must be 2-5 characters to count as tickers
+BARE_MIN_LEN = 2
+BARE_MAX_LEN = 5
+# longest run of edge characters tolerated around a ticker
+MAX_EDGE_LEN = 4
+# word with $ in its leading punctuation, vectorized cashtag check
+CASHTAG_PATTERN = f"^[{re.escape(EDGE_CHARS)}]*\\$"
+
+
+class TickerMatcher:
+    """
+    Match words in text against a frozen set of valid tickers.
+
+    Rules:
+    - Words are split on whitespace and punctuation is stripped from both ends.
+    - Cashtags ($gme, $GME) match case-insensitive and of any length.
+    - Bare words match case-sensitive and only if 2-5 characters long,
+      so common lower case words are not counted as tickers.
+    """
+    def __init__(self, tickers):
+        self.tickers = frozenset(tickers)
+        max_ticker_len = max((len(t) for t in self.tickers), default=0)
+        self.max_word_len = max_ticker_len + MAX_EDGE_LEN
+        # hashed index for vectorized membership joins
+        self.ticker_index = pd.Index(sorted(self.tickers))
+        self.mixed_case = any(t != t.upper() for t in self.tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.tickers
+
+    def match_word(self, word):
+        """
+        Return ticker for single word or None.
+
+        Args:
+        :word: string without whitespace.
+        """
+        if len(word) > self.max_word_len:
+            return None
+        core = word.strip(EDGE_CHARS)
+        if not core:
+            return None
+        # cashtag if $ is part of the stripped prefix
+        prefix = word[:len(word) - len(word.lstrip(EDGE_CHARS))]
+        if "$" in prefix:
+            candidate = core.upper()
+        elif BARE_MIN_LEN <= len(core) <= BARE_MAX_LEN:
+            candidate = core
+        else:
+            return None
+        if candidate in self.tickers:
+            return candidate
+        return None
+
+    def match(self, text):
+        """
+        Return list of unique tickers in text in order of first mention.
+
+        Args:
+        :text: string with comment body.
+        """
+        found = {}
+        match_word = self.match_word
+        for word in text.split():
+            ticker = match_word(word)
+            if ticker is not None:
+                found[ticker] = None
+        return list(found)
+
+    def match_frame(self, comments_df, id_column="comment_id", body_column="body"):
+        """
+        Vectorized match for a batch of comments, same rules as match().
+        Return dataframe with unique [id_column, ticker] pairs
+        in order of first mention per comment.
+
+        Args:
+        :comments_df: dataframe with comment ids and comment bodies.
+        :id_column: name of id column.
+        :body_column: name of body column.
+        """
+        words = comments_df[[id_column]].assign(word=comments_df[body_column].str.split())
+        words = words.explode("word").dropna(subset=["word"])
+        words = words[words["word"].str.len() <= self.max_word_len]
+        if words.empty:
+            return pd.DataFrame(columns=[id_column, "ticker"])
+
+        # cheap superset filter first, upper case core must be a ticker
+        core = words["word"].str.strip(EDGE_CHARS)
+        upper_core = core.str.upper()
+        known = upper_core.isin(self.ticker_index)
+        if self.mixed_case:
+            known |= core.isin(self.ticker_index)
+        words, core, upper_core = words[known], core[known], upper_core[known]
+
+        cashtag = words["word"].str.contains(CASHTAG_PATTERN, regex=True)
+        core_len = core.str.len()
+        bare = ~cashtag & (core_len >= BARE_MIN_LEN) & (core_len <= BARE_MAX_LEN) \
+            & core.isin(self.ticker_index)
+        valid = cashtag & upper_core.isin(self.ticker_index) | bare
+        ticker = upper_core.where(cashtag, core)
+        matches = pd.DataFrame({id_column: words.loc[valid, id_column].to_numpy(),
+                                "ticker": ticker[valid].to_numpy()})
+        return matches.drop_duplicates().reset_index(drop=True)
@@ -0,0 +1,160 @@
+"""Exact top-K trending tickers over sliding windows of new mentions."""
+
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+
+from src.aux_functions import get_config_section
+from src.database.alerts import get_hourly_counts
+from src.database.trending import replace_trending_tickers
+
+
+# window name -> length of sliding window
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+}
+
+
+def get_trending_config():
+    """Read trending settings from config file."""
+    config = get_config_section("trending")
+    return {
+        "enabled": config.get("enabled", "true").lower() == "true",
+        "top_k": int(config.get("top_k", 10)),
+        "bucket_minutes": int(config.get("bucket_minutes", 5)),
+        "interval_seconds": int(config.get("interval_seconds", 60)),
+    }
+
+
+class TrendingTracker:
+    """
+    Count mentions per ticker in time buckets and keep a running total per window.
+    New mentions are added to their bucket and to the totals of windows they fall in,
+    buckets leaving a window are subtracted when time moves on, so no window is
+    ever recounted. Top-K per window is refreshed every interval and read in
+    constant time with top and rank.
+    """
+    def __init__(self, top_k=10, bucket_minutes=5, windows=None):
+        """
+        Args:
+        :top_k: number of tickers kept per window
+        :bucket_minutes: resolution of windows in minutes
+        :windows: dictionary with window name as key and timedelta as value
+        """
+        self.top_k = top_k
+        self.bucket_seconds = bucket_minutes * 60
+        self.windows = windows if windows is not None else WINDOWS
+        # buckets per window, current bucket included
+        self.window_buckets = {name: max(1, int(length.total_seconds() // self.bucket_seconds))
+                               for name, length in self.windows.items()}
+        # bucket start -> Counter of mentions per ticker
+        self.buckets = {}
+        self.totals = {name: Counter() for name in self.windows}
+        self.window_start = {name: None for name in self.windows}
+        self.current_bucket = None
+        self.top_tickers = {name: [] for name in self.windows}
+        self.ranks = {name: {} for name in self.windows}
+        self.lock = threading.Lock()
+
+    def bucket_of(self, timestamp):
+        """Return start of bucket of timestamp as epoch seconds."""
+        return int(timestamp.timestamp()) // self.bucket_seconds * self.bucket_seconds
+
+    def advance(self, now=None):
+        """Move windows to bucket of now, subtract buckets that left a window."""
+        now_bucket = self.bucket_of(now or datetime.now(timezone.utc))
+        with self.lock:
+            if now_bucket == self.current_bucket:
+                return
+            self.current_bucket = now_bucket
+            for name, totals in self.totals.items():
+                new_start = now_bucket - (self.window_buckets[name] - 1) * self.bucket_seconds
+                old_start = self.window_start[name]
+                self.window_start[name] = new_start
+                if old_start is None:
+                    continue
+                for bucket, counts in self.buckets.items():
+                    if old_start <= bucket < new_start:
+                        totals.subtract(counts)
+                for ticker_id in [t for t, count in totals.items() if count <= 0]:
+                    del totals[ticker_id]
+            oldest = min(self.window_start.values())
+            for bucket in [b for b in self.buckets if b < oldest]:
+                del self.buckets[bucket]
+
+    def add_counts(self, counts):
+        """
+        Add mention counts to buckets and window totals.
+
+        Args:
+        :counts: iterable of (ticker_id, timestamp, count)
+        """
+        self.advance()
+        with self.lock:
+            oldest = min(self.window_start.values())
+            for ticker_id, timestamp, count in counts:
+                # timestamps ahead of clock count in current bucket
+                bucket = min(self.bucket_of(timestamp), self.current_bucket)
+                if bucket < oldest:
+                    continue
+                self.buckets.setdefault(bucket, Counter())[ticker_id] += count
+                for name, totals in self.totals.items():
+                    if bucket >= self.window_start[name]:
+                        totals[ticker_id] += count
+
+    def add(self, mentions):
+        """
+        Add new mentions, registered as mention listener.
+
+        Args:
+        :mentions: list of (ticker_id, comment_timestamp)
+        """
+        self.add_counts((ticker_id, timestamp, 1) for ticker_id, timestamp in mentions)
+
+    def warm_up(self):
+        """Fill buckets from hourly rollup, mentions of an hour count at start of hour."""
+        since_hour = datetime.now(timezone.utc) - max(self.windows.values()) - timedelta(hours=1)
+        rows = get_hourly_counts(since_hour)
+        self.add_counts(rows)
+        self.refresh()
+        print(f"Trending windows built from {len(rows)} ticker hours.")
+
+    def refresh(self):
+        """Recompute top-K of every window from window totals."""
+        self.advance()
+        with self.lock:
+            for name, totals in self.totals.items():
+                top = heapq.nlargest(self.top_k, totals.items(), key=itemgetter(1))
+                self.top_tickers[name] = top
+                self.ranks[name] = {ticker_id: rank for rank, (ticker_id, _) in
+                                    enumerate(top, start=1)}
+
+    def top(self, window):
+        """Return list of (ticker_id, mention_count) of window as of last refresh."""
+        return self.top_tickers[window]
+
+    def rank(self, ticker_id, window):
+        """Return rank of ticker in window as of last refresh, None if not in top-K."""
+        return self.ranks[window].get(ticker_id)
+
+    def save(self):
+        """Write top-K of all windows to trending_ticker table for the dashboard."""
+        rows = [(name, rank, ticker_id, count)
+                for name, top in self.top_tickers.items()
+                for rank, (ticker_id, count) in enumerate(top, start=1)]
+        return replace_trending_tickers(rows)
+
+    def run_forever(self, interval_seconds=60):
+        """Refresh and save top-K every interval_seconds, blocks forever."""
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                self.refresh()
+                self.save()
+            except Exception as e:
+                print(f"Couldn't update trending tickers. Error: {e}")
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import src.alert_engine
+from src.alert_engine import HOUR, AlertEngine, Baseline
+
+
+NOW = datetime(2021, 1, 28, 12, 30, tzinfo=timezone.utc)
+NOW_HOUR = NOW.replace(minute=0)
+# 30 settled hours alternating 1 and 3 mentions, mean 2
+HISTORY = [(1, NOW_HOUR - k * HOUR, 1 + 2 * (k % 2)) for k in range(1, 31)]
+
+
+class Clock(datetime):
+    current = NOW
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, alerts):
+        self.sent.append(alerts)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    Clock.current = NOW
+    monkeypatch.setattr(src.alert_engine, "datetime", Clock)
+    return Clock
+
+
+@pytest.fixture
+def engine(clock):
+    engine = AlertEngine(notifier=RecordingNotifier(), alpha=0.1, z_threshold=4,
+                         min_mentions=20, min_hours=24)
+    engine.add_counts(HISTORY)
+    engine.fold_settled()
+    return engine
+
+
+def test_baseline_ewma():
+    baseline = Baseline()
+    baseline.update(10, 0.5)
+    assert (baseline.mean, baseline.var, baseline.hours) == (10, 0, 1)
+    baseline.update(20, 0.5)
+    assert (baseline.mean, baseline.var) == (15, 25)
+
+
+def test_baseline_fold_fills_gaps():
+    hour = NOW_HOUR
+    baseline = Baseline()
+    baseline.fold(hour, 8, 0.5, max_gap=3)
+    # two hours without mentions in between
+    baseline.fold(hour + 3 * HOUR, 8, 0.5, max_gap=3)
+    assert baseline.hours == 4
+    # 8 -> 4 -> 2 -> 5
+    assert baseline.mean == 5
+    assert baseline.last_hour == hour + 3 * HOUR
+    # long gap folds at most max_gap zeros
+    baseline.fold(hour + 100 * HOUR, 1, 0.5, max_gap=3)
+    assert baseline.hours == 8
+
+
+def test_baseline_built_from_settled_hours(engine):
+    baseline = engine.baselines[1]
+    assert baseline.hours == 30
+    assert baseline.last_hour == NOW_HOUR - HOUR
+    assert 1.5 < baseline.mean < 2.5
+    assert not engine.open_hours
+
+
+def test_thresholds(engine):
+    changed = engine.add_counts([(1, NOW_HOUR, 30)])
+    alerts = engine.evaluate(changed)
+    assert len(alerts) == 1
+    assert alerts[0]["ticker_id"] == 1 and alerts[0]["hour"] == NOW_HOUR
+    assert alerts[0]["mention_count"] == 30
+    assert alerts[0]["baseline_std"] >= 1
+    assert alerts[0]["z_score"] >= 4
+
+    # below min_mentions
+    assert engine.evaluate(engine.add_counts([(1, NOW_HOUR, 15)])) == []
+    # above min_mentions, z-score below threshold
+    engine.min_mentions = 5
+    assert engine.evaluate(engine.add_counts([(1, NOW_HOUR, 5)])) == []
+    # ticker without min_hours of baseline
+    engine.add_counts([(2, NOW_HOUR - k * HOUR, 1) for k in range(1, 4)])
+    engine.fold_settled()
+    assert engine.evaluate(engine.add_counts([(2, NOW_HOUR, 50)])) == []
+
+
+def test_settled_hours_not_reopened(engine):
+    assert engine.add_counts([(1, NOW_HOUR - HOUR, 100)]) == []
+
+
+def test_one_alert_per_ticker_hour(engine, clock, monkeypatch):
+    reads = []
+    inserted = []
+
+    def get_changed_hourly_counts(since):
+        return reads.pop(0), clock.current
+
+    def insert_alerts(alerts):
+        inserted.extend(alerts)
+        return alerts
+
+    monkeypatch.setattr(src.alert_engine, "get_changed_hourly_counts",
+                        get_changed_hourly_counts)
+    monkeypatch.setattr(src.alert_engine, "insert_alerts", insert_alerts)
+    engine.watermark = NOW
+
+    reads.append([(1, NOW_HOUR, 30)])
+    assert len(engine.run_once()) == 1
+    # count of same hour grows, no second alert
+    reads.append([(1, NOW_HOUR, 45)])
+    assert engine.run_once() == []
+    assert len(engine.notifier.sent) == 1
+
+    # hour settled and folded, next hour can alert again
+    clock.current = NOW + HOUR
+    reads.append([(1, NOW_HOUR + HOUR, 200)])
+    assert [a["hour"] for a in engine.run_once()] == [NOW_HOUR + HOUR]
+    assert engine.baselines[1].last_hour == NOW_HOUR
+    assert (1, NOW_HOUR) not in engine.alerted
+    assert len(inserted) == 2
+
+
+def test_failed_insert_retried(engine, monkeypatch):
+    results = [None, "inserted"]
+
+    def insert_alerts(alerts):
+        return alerts if results.pop(0) else None
+
+    monkeypatch.setattr(src.alert_engine, "get_changed_hourly_counts",
+                        lambda since: ([(1, NOW_HOUR, 30)], NOW))
+    monkeypatch.setattr(src.alert_engine, "insert_alerts", insert_alerts)
+    engine.watermark = NOW
+    assert engine.run_once() == []
+    assert engine.notifier.sent == []
+    assert len(engine.run_once()) == 1
+    assert len(engine.notifier.sent) == 1
+
+
+def test_trending_rank(engine):
+    class Trending:
+        def rank(self, ticker_id, window):
+            return 3
+    engine.trending = Trending()
+    alerts = engine.evaluate(engine.add_counts([(1, NOW_HOUR, 30)]))
+    assert alerts[0]["trending_rank"] == 3
@@ -0,0 +1,284 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+
+import asyncpg
+import pytest
+
+import src.async_reddit_collector
+from src.async_reddit_collector import AsyncRedditCollector
+from src.database import async_db
+from src.database.pool import pooled_connection
+from src.records import CommentRecord
+from src.ticker_matcher import TickerMatcher
+
+
+TICKERS = ["GME", "AMC", "BB"]
+SUBREDDIT_PARAMS = {"subreddit_sorting": "hot", "limit": 2}
+
+
+def listing(children):
+    return {"kind": "Listing", "data": {"children": children, "after": None}}
+
+
+def t3(submission_id, num_comments):
+    return {"kind": "t3", "data": {
+        "id": submission_id, "name": f"t3_{submission_id}", "title": submission_id,
+        "created_utc": 1611800000, "score": 10, "num_comments": num_comments,
+        "author_fullname": "t2_op", "subreddit_id": "t5_2th52",
+        "subreddit": "wallstreetbets"}}
+
+
+def t1(comment_id, submission_id, body, created_utc, replies=()):
+    return {"kind": "t1", "data": {
+        "id": comment_id, "name": f"t1_{comment_id}", "body": body,
+        "created_utc": created_utc, "score": 2, "author": f"u{comment_id}",
+        "author_fullname": f"t2_u{comment_id}", "link_id": f"t3_{submission_id}",
+        "parent_id": f"t3_{submission_id}",
+        "replies": listing(list(replies)) if replies else ""}}
+
+
+def more(submission_id, children):
+    return {"kind": "more", "data": {
+        "id": children[0], "name": f"t1_{children[0]}", "count": len(children),
+        "children": children, "parent_id": f"t3_{submission_id}", "depth": 0}}
+
+
+@pytest.fixture
+def reddit_url(http_stub):
+    """
+    Fake Reddit api with two submissions of r/wallstreetbets.
+    s1 has a reply and a MoreComments node expanded with morechildren.
+    """
+    s1, s2 = t3("s1", 5), t3("s2", 1)
+    routes = {
+        ("POST", "/api/v1/access_token"): {"access_token": "token", "token_type": "bearer",
+                                           "expires_in": 3600, "scope": "*"},
+        ("GET", "/r/wallstreetbets/hot"): listing([s1, s2]),
+        ("GET", "/comments/s1/"): [listing([s1]), listing([
+            t1("c1", "s1", "GME to the moon", 1611800100,
+               replies=[t1("c2", "s1", "$amc too", 1611800200)]),
+            t1("c3", "s1", "no tickers here", 1611800150),
+            more("s1", ["c4", "c5"]),
+        ])],
+        ("POST", "/api/morechildren/"): {"json": {"errors": [], "data": {"things": [
+            t1("c4", "s1", "AMC squeeze", 1611800300),
+            t1("c5", "s1", "bb is lower case", 1611800250),
+        ]}}},
+        ("GET", "/comments/s2/"): [listing([s2]), listing([
+            t1("c6", "s2", "BB and GME", 1611800400),
+        ])],
+    }
+    http_stub.routes.update({route: (200, payload) for route, payload in routes.items()})
+    return http_stub.url
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """Record db calls of collector, checkpoints are read from checkpoints dictionary."""
+    db = {"batches": [], "checkpoints": {}, "upserts": [], "fail": False}
+
+    async def get_submission_checkpoint(pool, submission_id):
+        return db["checkpoints"].get(submission_id)
+
+    async def insert_comment_batch(pool, submissions, ticker_comments):
+        if db["fail"]:
+            return None
+        db["batches"].append((submissions, ticker_comments))
+        return {"comments": len(ticker_comments), "ticker_mentions": 0}
+
+    async def upsert_submission_checkpoint(pool, *args):
+        db["upserts"].append(args)
+
+    for function in (get_submission_checkpoint, insert_comment_batch,
+                     upsert_submission_checkpoint):
+        monkeypatch.setattr(src.async_reddit_collector, function.__name__, function)
+    return db
+
+
+async def collect_async(reddit_url, comment_params=None, pool=None):
+    """Run one collection pass of r/wallstreetbets against fake Reddit api."""
+    collector = AsyncRedditCollector("id", "secret", "tests", "user", "password",
+                                     ticker_matcher=TickerMatcher(TICKERS),
+                                     batch_size=2, oauth_url=reddit_url,
+                                     reddit_url=reddit_url)
+    collector.pool = pool
+    try:
+        await collector.get_new_data("wallstreetbets", SUBREDDIT_PARAMS,
+                                     comment_params or {"limit": None})
+    finally:
+        await collector.reddit.close()
+
+
+def collect(reddit_url, comment_params=None):
+    asyncio.run(collect_async(reddit_url, comment_params))
+
+
+def written(db):
+    return {c.comment_id: c.tickers for _, comments in db["batches"] for c in comments}
+
+
+def requested(http_stub, method, path):
+    return [r for r in http_stub.requests if (r["method"], r["path"]) == (method, path)]
+
+
+def test_get_new_data(reddit_url, http_stub, fake_db):
+    collect(reddit_url)
+    assert written(fake_db) == {"c1": ["GME"], "c2": ["AMC"], "c4": ["AMC"],
+                                "c6": ["BB", "GME"]}
+    submissions = {s["submission_id"]: s for batch, _ in fake_db["batches"] for s in batch}
+    assert submissions["s1"]["author_id"] == "op"
+    assert submissions["s1"]["source"] == "t5_2th52"
+    assert submissions["s1"]["source_name"] == "wallstreetbets"
+    # both MoreComments children fetched with one request
+    more_requests = requested(http_stub, "POST", "/api/morechildren/")
+    assert len(more_requests) == 1
+    assert more_requests[0]["body"]["children"] == ["c4,c5"]
+    assert more_requests[0]["body"]["link_id"] == ["t3_s1"]
+    checkpoints = {args[0]: args[1:] for args in fake_db["upserts"]}
+    assert checkpoints == {
+        "s1": (datetime.fromtimestamp(1611800300, tz=timezone.utc), "c4", 5),
+        "s2": (datetime.fromtimestamp(1611800400, tz=timezone.utc), "c6", 1),
+    }
+
+
+def test_unchanged_submission_skipped(reddit_url, http_stub, fake_db):
+    fake_db["checkpoints"]["s1"] = {"last_comment_timestamp": None,
+                                    "last_comment_id": None, "nr_comments": 5}
+    collect(reddit_url)
+    assert requested(http_stub, "GET", "/comments/s1/") == []
+    assert written(fake_db) == {"c6": ["BB", "GME"]}
+
+
+def test_checkpoint_skips_old_comments(reddit_url, http_stub, fake_db):
+    fake_db["checkpoints"]["s1"] = {
+        "last_comment_timestamp": datetime.fromtimestamp(1611800200, tz=timezone.utc),
+        "last_comment_id": "c2", "nr_comments": 3}
+    collect(reddit_url)
+    # newest first, comments of the checkpoint second are written again
+    assert requested(http_stub, "GET", "/comments/s1/")[0]["query"]["sort"] == ["new"]
+    assert written(fake_db) == {"c2": ["AMC"], "c4": ["AMC"], "c6": ["BB", "GME"]}
+
+
+def test_partly_fetched_tree(reddit_url, http_stub, fake_db):
+    collect(reddit_url, {"limit": 0})
+    assert requested(http_stub, "POST", "/api/morechildren/") == []
+    checkpoints = {args[0]: args[1:] for args in fake_db["upserts"]}
+    # nr_comments saved, newest comment not moved
+    assert checkpoints["s1"] == (None, None, 5)
+    assert checkpoints["s2"][1] == "c6"
+
+
+def test_failed_write_keeps_checkpoint(reddit_url, fake_db):
+    fake_db["fail"] = True
+    collect(reddit_url)
+    assert fake_db["upserts"] == []
+
+
+def add_tickers(tickers):
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.executemany("INSERT INTO ticker (ticker_id, company_name) VALUES (%s, %s);",
+                        [(ticker, ticker) for ticker in tickers])
+        conn.commit()
+        cur.close()
+
+
+def fetch(sql):
+    with pooled_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql)
+        rows = cur.fetchall()
+        conn.rollback()
+        cur.close()
+    return rows
+
+
+def submission(submission_id, author_id="op"):
+    return {"submission_id": submission_id,
+            "timestamp": datetime(2021, 1, 28, 12, tzinfo=timezone.utc), "score": 10,
+            "nr_comments": 5, "author_id": author_id, "source": "t5_2th52",
+            "source_name": "wallstreetbets"}
+
+
+def comment(comment_id, submission_id, author_id, tickers, minute=0):
+    return CommentRecord(comment_id, datetime(2021, 1, 28, 12, minute, tzinfo=timezone.utc),
+                         2, submission_id, author_id, tickers)
+
+
+def with_pool(test_db, coroutine_function):
+    """Run coroutine function with asyncpg pool of test database."""
+    async def run():
+        async_pool = await asyncpg.create_pool(min_size=1, max_size=5, **test_db)
+        try:
+            return await coroutine_function(async_pool)
+        finally:
+            await async_pool.close()
+    return asyncio.run(run())
+
+
+def test_insert_comment_batch(test_db):
+    add_tickers(TICKERS)
+    comments = [comment("c1", "s1", "u1", ["GME", "AMC"]),
+                comment("c2", "s1", "u2", ["GME"], minute=30)]
+
+    async def insert_twice(async_pool):
+        first = await async_db.insert_comment_batch(async_pool, [submission("s1")], comments)
+        second = await async_db.insert_comment_batch(async_pool, [submission("s1")], comments)
+        return first, second
+
+    first, second = with_pool(test_db, insert_twice)
+    assert first == {"sources": 1, "authors": 3, "submissions": 1, "comments": 2,
+                     "ticker_mentions": 3}
+    # known rows are skipped, duplicates are not written again
+    assert second == {"sources": 0, "authors": 0, "submissions": 0, "comments": 0,
+                      "ticker_mentions": 0}
+    assert fetch("SELECT source, display_name FROM source;") == [
+        ("t5_2th52", "wallstreetbets")]
+    assert fetch("SELECT ticker_id, mention_count FROM ticker_mention_hourly "
+                 "ORDER BY ticker_id;") == [("AMC", 1), ("GME", 2)]
+
+
+def test_concurrent_batches_with_shared_authors(test_db):
+    add_tickers(TICKERS)
+    # batches of 150 of 200 authors in shuffled order, most authors are new in several
+    authors = [f"u{i}" for i in range(200)]
+    batches = []
+    for i in range(8):
+        random.shuffle(authors)
+        batches.append([comment(f"c{i}_{j}", f"s{i % 2}", author, ["GME"])
+                        for j, author in enumerate(authors[:150])])
+
+    async def insert_concurrently(async_pool):
+        return await asyncio.gather(*[
+            async_db.insert_comment_batch(async_pool, [submission(f"s{i % 2}")], batch)
+            for i, batch in enumerate(batches)])
+
+    results = with_pool(test_db, insert_concurrently)
+    assert None not in results
+    assert sum(result["comments"] for result in results) == 8 * 150
+    assert fetch("SELECT COUNT(*) FROM author WHERE author_id LIKE 'u%';")[0][0] == \
+        len({c.author_id for batch in batches for c in batch})
+
+
+def test_upsert_checkpoint_keeps_newest_comment(test_db):
+    newest = datetime(2021, 1, 28, 12, tzinfo=timezone.utc)
+
+    async def upsert(async_pool):
+        await async_db.upsert_submission_checkpoint(async_pool, "s1", newest, "c1", 5)
+        await async_db.upsert_submission_checkpoint(async_pool, "s1", None, None, 8)
+        return await async_db.get_submission_checkpoint(async_pool, "s1")
+
+    checkpoint = with_pool(test_db, upsert)
+    assert checkpoint == {"last_comment_timestamp": newest, "last_comment_id": "c1",
+                          "nr_comments": 8}
+
+
+def test_get_new_data_to_postgres(reddit_url, test_db):
+    add_tickers(TICKERS)
+    with_pool(test_db, lambda async_pool: collect_async(reddit_url, pool=async_pool))
+    assert fetch("SELECT comment_id, ticker_id FROM ticker_mention "
+                 "ORDER BY 1, 2;") == [("c1", "GME"), ("c2", "AMC"), ("c4", "AMC"),
+                                       ("c6", "BB"), ("c6", "GME")]
+    assert fetch("SELECT submission_id, last_comment_id, nr_comments "
+                 "FROM submission_checkpoint ORDER BY 1;") == [("s1", "c4", 5), ("s2", "c6", 1)]
@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+import asyncpraw
+import praw
+
+from src.comment_tree import MORECHILDREN_LIMIT, AsyncCommentTree, CommentTree
+
+
+ids = itertools.count()
+
+
+def comment(replies=()):
+    return SimpleNamespace(id=f"c{next(ids)}", replies=list(replies))
+
+
+def more(more_class, count, children=None):
+    if children is None:
+        children = [f"k{next(ids)}" for _ in range(count)]
+    return more_class(None, {"id": f"m{next(ids)}", "count": count, "children": children,
+                             "parent_id": "t3_s1"})
+
+
+# comments loaded with the submission, MoreComments of 3 below the second
+LOADED = 3
+
+
+def submission(more_class, counts):
+    top = [comment(), comment([comment(), more(more_class, 3)])]
+    return SimpleNamespace(id="s1", fullname="t3_s1", comment_sort="new",
+                           comments=top + [more(more_class, count) for count in counts])
+
+
+class FakeReddit:
+    """praw reddit with morechildren answered after delay seconds."""
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.posts = []
+
+    def post(self, path, data):
+        children = data["children"].split(",")
+        self.posts.append((path, data["link_id"], len(children)))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("server error")
+        return [comment() for _ in children]
+
+
+class ContinueThread(praw.models.MoreComments):
+    """"continue this thread" node, loaded with its own request."""
+    def comments(self, update=True):
+        assert update is False
+        return [comment([comment()])]
+
+
+def test_expands_all_in_batches():
+    reddit = FakeReddit()
+    counts = [20, 60, 90, 10]
+    tree = CommentTree(reddit, submission(praw.models.MoreComments, counts))
+    found = [c.id for c in tree]
+    # loaded comments and one comment per child
+    assert len(found) == len(set(found)) == LOADED + 3 + sum(counts)
+    assert tree.complete
+    assert all(path == "api/morechildren/" and link_id == "t3_s1"
+               for path, link_id, _ in reddit.posts)
+    assert all(size <= MORECHILDREN_LIMIT for _, _, size in reddit.posts)
+    # largest first, small nodes packed into one request
+    assert [size for _, _, size in reddit.posts] == [90, 93]
+    assert tree.requests == 2
+
+
+def test_continue_thread_loaded_alone():
+    reddit = FakeReddit()
+    sub = submission(praw.models.MoreComments, [5])
+    sub.comments.append(more(ContinueThread, 0, []))
+    tree = CommentTree(reddit, sub)
+    assert len(list(tree)) == LOADED + 3 + 5 + 2
+    assert [size for _, _, size in reddit.posts] == [8]
+    assert tree.requests == 2
+    assert tree.complete
+
+
+def test_request_limit():
+    tree = CommentTree(FakeReddit(), submission(praw.models.MoreComments, [80, 60, 50]),
+                       limit=1)
+    assert len(list(tree)) == LOADED + 80
+    assert tree.requests == 1
+    assert not tree.complete
+    assert len(tree.more) == 3
+
+
+def test_time_budget_counts_only_requests():
+    reddit = FakeReddit(delay=0.05)
+    tree = CommentTree(reddit, submission(praw.models.MoreComments, [90] * 6),
+                       time_budget=0.12)
+    list(tree)
+    assert len(reddit.posts) == 3
+    assert not tree.complete
+
+    # slow consumer, time between comments is not part of the budget
+    reddit = FakeReddit(delay=0.01)
+    tree = CommentTree(reddit, submission(praw.models.MoreComments, [90] * 3),
+                       time_budget=0.1)
+    for _ in tree:
+        time.sleep(0.001)
+    assert tree.complete
+    assert tree.spent < 0.1
+
+
+def test_failed_request_not_complete():
+    tree = CommentTree(FakeReddit(fail=True), submission(praw.models.MoreComments, [5]))
+    assert len(list(tree)) == LOADED
+    assert tree.lost == 2
+    assert not tree.complete
+
+
+def test_stopped_early_not_complete():
+    tree = CommentTree(FakeReddit(), submission(praw.models.MoreComments, [5]))
+    comments = iter(tree)
+    next(comments)
+    comments.close()
+    assert not tree.complete
+
+
+class AsyncMore(asyncpraw.models.MoreComments):
+    delay = 0.1
+
+    async def comments(self, update=True):
+        assert update is False
+        assert self.submission.id == "s1"
+        await asyncio.sleep(self.delay)
+        return [comment() for _ in self.children]
+
+
+class AsyncFailingMore(AsyncMore):
+    async def comments(self, update=True):
+        raise RuntimeError("server error")
+
+
+async def collect(tree):
+    return [c.id async for c in tree]
+
+
+def test_async_expands_concurrently():
+    tree = AsyncCommentTree(submission(AsyncMore, [5] * 7), workers=4)
+    started = time.monotonic()
+    found = asyncio.run(collect(tree))
+    # 8 nodes, 4 at a time
+    assert time.monotonic() - started < 0.35
+    assert len(found) == len(set(found)) == LOADED + 3 + 35
+    assert tree.requests == 8
+    assert tree.complete
+
+
+def test_async_request_limit():
+    tree = AsyncCommentTree(submission(AsyncMore, [5] * 7), limit=3)
+    assert len(asyncio.run(collect(tree))) == LOADED + 15
+    assert tree.requests == 3
+    assert not tree.complete
+
+
+def test_async_time_budget():
+    tree = AsyncCommentTree(submission(AsyncMore, [5] * 7), time_budget=0.15, workers=4)
+    started = time.monotonic()
+    found = asyncio.run(collect(tree))
+    assert time.monotonic() - started < 0.3
+    # first 4 done in time, next 4 dropped in flight
+    assert len(found) == LOADED + 20
+    assert tree.lost == 4
+    assert not tree.complete
+
+
+def test_async_failed_expansion():
+    sub = submission(AsyncMore, [5])
+    sub.comments.append(more(AsyncFailingMore, 2))
+    tree = AsyncCommentTree(sub)
+    assert len(asyncio.run(collect(tree))) == LOADED + 3 + 5
+    assert tree.lost == 1
+    assert not tree.complete
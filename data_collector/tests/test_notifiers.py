@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+
+from src.notifiers import PrintNotifier, WebhookNotifier, get_notifier
+
+
+ALERT = {
+    "ticker_id": "GME",
+    "hour": datetime(2021, 1, 28, 14, tzinfo=timezone.utc),
+    "mention_count": 120,
+    "baseline_mean": 10.5,
+    "baseline_std": 4.2,
+    "z_score": 26.19,
+    "trending_rank": 1,
+}
+
+
+def test_get_notifier():
+    assert isinstance(get_notifier(), PrintNotifier)
+    assert isinstance(get_notifier(""), PrintNotifier)
+    notifier = get_notifier("http://localhost/hook", timeout=2)
+    assert isinstance(notifier, WebhookNotifier)
+    assert notifier.timeout == 2
+
+
+def test_print_notifier(capsys):
+    PrintNotifier().notify([ALERT, dict(ALERT, trending_rank=None)])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == ("ALERT GME 2021-01-28 14:00 UTC: 120 mentions, baseline 10.5, "
+                        "z-score 26.2, trending #1 last hour")
+    assert lines[1].endswith("z-score 26.2")
+
+
+def test_webhook_delivery(http_stub):
+    WebhookNotifier(f"{http_stub.url}/hook").notify([ALERT, dict(ALERT, ticker_id="AMC")])
+    assert len(http_stub.requests) == 1
+    request = http_stub.requests[0]
+    assert (request["method"], request["path"]) == ("POST", "/hook")
+    alerts = request["body"]["alerts"]
+    assert [a["ticker_id"] for a in alerts] == ["GME", "AMC"]
+    assert alerts[0]["hour"] == "2021-01-28T14:00:00+00:00"
+    assert alerts[0]["z_score"] == 26.19
+
+
+def test_webhook_error_not_raised(http_stub, capsys):
+    http_stub.responses.append((500, {"error": "down"}))
+    WebhookNotifier(http_stub.url).notify([ALERT])
+    assert len(http_stub.requests) == 1
+    assert "Couldn't send 1 alerts to webhook" in capsys.readouterr().out
+
+
+def test_webhook_unreachable(capsys):
+    WebhookNotifier("http://127.0.0.1:9/hook", timeout=1).notify([ALERT])
+    assert "Couldn't send 1 alerts to webhook" in capsys.readouterr().out
@@ -0,0 +1,118 @@
+from datetime import date, datetime
+
+import pytest
+import pytz
+
+import src.price_collector
+from src.price_collector import PriceCollector, parse_bars
+
+
+TODAY = date(2021, 1, 28)
+PAST_DAY = date(2021, 1, 27)
+
+
+def bars_response(request):
+    """IEX batch response with two minute bars per symbol, second without trades."""
+    query = request["query"]
+    key = query["types"][0]
+    day = query.get("exactDate", ["20210128"])[0]
+    day = f"{day[:4]}-{day[4:6]}-{day[6:]}"
+    return {ticker: {key: [{"date": day, "minute": "09:30", "close": 10.5, "volume": 100},
+                           {"date": day, "minute": "09:31", "close": None, "volume": 0}]}
+            for ticker in query["symbols"][0].split(",")}
+
+
+@pytest.fixture
+def inserted(monkeypatch):
+    rows = []
+
+    def insert_closing_price(price_rows):
+        rows.extend(price_rows)
+        return len(price_rows)
+
+    monkeypatch.setattr(src.price_collector, "insert_closing_price", insert_closing_price)
+    return rows
+
+
+@pytest.fixture
+def collector(http_stub, inserted, monkeypatch):
+    collector = PriceCollector("token", base_url=f"{http_stub.url}/", batch_size=2,
+                               requests_per_minute=6000, timeout=2)
+    monkeypatch.setattr(collector, "get_days", lambda: (TODAY, [PAST_DAY]))
+    monkeypatch.setattr(src.price_collector, "get_mentioned_tickers",
+                        lambda since: ["AMC", "BB", "GME"])
+    return collector
+
+
+def symbols(request):
+    return request["query"]["symbols"][0]
+
+
+def test_parse_bars():
+    bars = [{"date": "2021-01-27", "minute": "09:30", "close": 10.5, "volume": 100},
+            {"date": "2021-01-27", "minute": "09:31", "close": None}]
+    assert parse_bars("GME", bars) == [
+        ("GME", datetime(2021, 1, 27, 14, 30, tzinfo=pytz.utc), 10.5, 100)]
+
+
+def test_batch_size_capped():
+    assert PriceCollector("token", batch_size=500).batch_size == 100
+
+
+def test_collect_day_in_batches(collector, http_stub, inserted):
+    http_stub.responses.extend([(200, bars_response)] * 3)
+    tickers = ["A", "B", "C", "D", "E"]
+    assert collector.collect_day(tickers, PAST_DAY) == 5
+    assert [symbols(r) for r in http_stub.requests] == ["A,B", "C,D", "E"]
+    query = http_stub.requests[0]["query"]
+    assert query["types"] == ["chart"] and query["exactDate"] == ["20210127"]
+    assert query["token"] == ["token"]
+    assert http_stub.requests[0]["path"] == "/stock/market/batch"
+    assert {row[0] for row in inserted} == set(tickers)
+    assert not collector.fetched_days.missing((ticker, PAST_DAY) for ticker in tickers)
+
+
+def test_collect_today_not_cached(collector, http_stub, inserted):
+    http_stub.responses.append((200, bars_response))
+    assert collector.collect_day(["GME"]) == 1
+    assert http_stub.requests[0]["query"]["types"] == ["intraday-prices"]
+    assert len(collector.fetched_days) == 0
+
+
+def test_failed_batch_fetched_next_run(collector, http_stub, inserted):
+    # first batch of past day fails, second batch and today succeed
+    http_stub.responses.extend([(500, {}), (200, bars_response), (200, bars_response),
+                                (200, bars_response)])
+    assert collector.collect_once() == 4
+    assert [symbols(r) for r in http_stub.requests] == ["AMC,BB", "GME", "AMC,BB", "GME"]
+    assert sorted(collector.fetched_days.missing(
+        (ticker, PAST_DAY) for ticker in ["AMC", "BB", "GME"])) == [("AMC", PAST_DAY),
+                                                                    ("BB", PAST_DAY)]
+
+    # only failed tickers of past day are asked for again, today always
+    http_stub.requests.clear()
+    http_stub.responses.extend([(200, bars_response)] * 3)
+    assert collector.collect_once() == 5
+    assert [(symbols(r), r["query"]["types"][0]) for r in http_stub.requests] == [
+        ("AMC,BB", "chart"), ("AMC,BB", "intraday-prices"), ("GME", "intraday-prices")]
+    assert len(collector.fetched_days) == 3
+
+
+def test_failed_insert_not_cached(collector, http_stub, monkeypatch):
+    monkeypatch.setattr(src.price_collector, "insert_closing_price", lambda rows: None)
+    http_stub.responses.append((200, bars_response))
+    assert collector.collect_day(["GME"], PAST_DAY) == 0
+    assert len(collector.fetched_days) == 0
+
+
+def test_invalid_json_skipped(collector, http_stub, monkeypatch):
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            raise ValueError("no json")
+
+    monkeypatch.setattr(collector.session, "get", lambda *args, **kwargs: Response())
+    assert collector.collect_day(["GME"], PAST_DAY) == 0
+    assert len(collector.fetched_days) == 0
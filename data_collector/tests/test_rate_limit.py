@@ -0,0 +1,62 @@
+import threading
+import time
+
+from src.rate_limit import TokenBucket
+
+
+def test_burst_up_to_capacity():
+    bucket = TokenBucket(60, capacity=3)
+    started = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - started < 0.1
+    assert bucket.tokens < 1
+
+
+def test_default_capacity():
+    assert TokenBucket(600).capacity == 100
+    assert TokenBucket(3).capacity == 1
+
+
+def test_blocks_until_refilled():
+    # 10 tokens per second
+    bucket = TokenBucket(600, capacity=1)
+    bucket.acquire()
+    started = time.monotonic()
+    bucket.acquire()
+    assert 0.08 <= time.monotonic() - started < 0.5
+
+
+def test_refill_capped_at_capacity():
+    bucket = TokenBucket(600, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    time.sleep(0.5)
+    started = time.monotonic()
+    bucket.acquire()
+    bucket.acquire()
+    assert time.monotonic() - started < 0.05
+    # 5 tokens worth of time passed but only 2 fit in the bucket
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.08
+
+
+def test_shared_between_threads():
+    bucket = TokenBucket(1200, capacity=2)
+    acquired = []
+
+    def take():
+        for _ in range(3):
+            bucket.acquire()
+            acquired.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=take) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 12 requests, 2 from the burst, 10 more at 20 per second
+    assert len(acquired) == 12
+    assert time.monotonic() - started >= 0.45
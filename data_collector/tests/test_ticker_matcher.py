@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from src.ticker_matcher import TickerMatcher
+
+
+TICKERS = ["GME", "AMC", "BB", "NOK", "A", "TSLA", "BRK.B"]
+
+COMMENTS = [
+    "GME to the moon, AMC too",
+    "$gme and $a are cashtags, bare A is not",
+    "(GME), AMC! BB? NOK... all of them",
+    "lower case gme amc bb is not a ticker",
+    "GME GME GME said three times",
+    "$$TSLA and ((($BB))) and BRK.B",
+    "GMEAMC glued, AAAAAAAAAAAAGME too long",
+    "",
+    "   ",
+    "no tickers here at all",
+]
+
+
+@pytest.fixture
+def matcher():
+    return TickerMatcher(TICKERS)
+
+
+def test_match_rules(matcher):
+    assert matcher.match(COMMENTS[0]) == ["GME", "AMC"]
+    assert matcher.match(COMMENTS[1]) == ["GME", "A"]
+    assert matcher.match(COMMENTS[3]) == []
+    assert matcher.match(COMMENTS[4]) == ["GME"]
+    assert matcher.match(COMMENTS[6]) == []
+
+
+@pytest.mark.parametrize("tickers", [TICKERS, ["GME", "Gme", "bb"], []])
+def test_match_frame_same_as_match(tickers):
+    matcher = TickerMatcher(tickers)
+    comments_df = pd.DataFrame({"comment_id": [f"c{i}" for i in range(len(COMMENTS))],
+                                "body": COMMENTS})
+    matches = matcher.match_frame(comments_df)
+    assert list(matches.columns) == ["comment_id", "ticker"]
+    for comment_id, body in zip(comments_df["comment_id"], comments_df["body"]):
+        found = matches.loc[matches["comment_id"] == comment_id, "ticker"].tolist()
+        assert found == matcher.match(body), body
+
+
+def test_match_frame_custom_columns(matcher):
+    comments_df = pd.DataFrame({"id": ["x"], "text": ["$nok and AMC"]})
+    matches = matcher.match_frame(comments_df, id_column="id", body_column="text")
+    assert matches.values.tolist() == [["x", "NOK"], ["x", "AMC"]]
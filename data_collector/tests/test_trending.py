@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import src.trending
+from src.trending import TrendingTracker
+
+
+START = datetime(2021, 1, 28, 12, 0, tzinfo=timezone.utc)
+
+
+class Clock(datetime):
+    current = START
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    Clock.current = START
+    monkeypatch.setattr(src.trending, "datetime", Clock)
+    return Clock
+
+
+@pytest.fixture
+def tracker(clock):
+    windows = {"10m": timedelta(minutes=10), "1h": timedelta(hours=1)}
+    return TrendingTracker(top_k=2, bucket_minutes=5, windows=windows)
+
+
+def test_top_and_rank(tracker):
+    tracker.add([(1, START)] * 3 + [(2, START)] * 5 + [(3, START)])
+    tracker.refresh()
+    assert tracker.top("10m") == [(2, 5), (1, 3)]
+    assert tracker.rank(2, "1h") == 1
+    assert tracker.rank(3, "1h") is None
+
+
+def test_window_expiry(tracker, clock):
+    tracker.add_counts([(1, START, 3), (2, START - timedelta(minutes=30), 4)])
+    tracker.refresh()
+    assert tracker.top("10m") == [(1, 3)]
+    assert tracker.top("1h") == [(2, 4), (1, 3)]
+
+    # 10 minute window holds the current and previous bucket only
+    clock.current = START + timedelta(minutes=11)
+    tracker.refresh()
+    assert tracker.top("10m") == []
+    assert tracker.top("1h") == [(2, 4), (1, 3)]
+
+    clock.current = START + timedelta(minutes=40)
+    tracker.refresh()
+    assert tracker.top("1h") == [(1, 3)]
+    assert min(tracker.buckets) >= tracker.window_start["1h"]
+
+    clock.current = START + timedelta(hours=2)
+    tracker.refresh()
+    assert tracker.top("1h") == []
+    assert not tracker.buckets
+
+
+def test_old_and_future_timestamps(tracker):
+    tracker.add_counts([(1, START - timedelta(hours=2), 10),
+                        (2, START + timedelta(hours=1), 1)])
+    tracker.refresh()
+    # too old for any window, future mentions count in current bucket
+    assert tracker.top("1h") == [(2, 1)]
+    assert tracker.top("10m") == [(2, 1)]